@@ -2,12 +2,17 @@ import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableView, 
                             QTabWidget, QToolBar, QStatusBar, QMenu,
                             QLineEdit, QLabel, QHBoxLayout, QWidget,
-                            QVBoxLayout, QFrame, QDockWidget)
-from PyQt6.QtGui import (QStandardItemModel, QStandardItem, QAction,
-                         QIcon, QColor, QFont)
+                            QVBoxLayout, QFrame, QDockWidget, QFileDialog)
+from PyQt6.QtGui import QAction, QIcon, QColor, QFont
 from PyQt6.QtCore import Qt, QSize
+from sheet_model import SparseTableModel, RowMappingProxyModel
+from workbook import Workbook
+from undo_journal import UndoJournal
+from workbook_io import open_workbook, save_workbook
+from progress_dialog import run_with_progress
+from sheet_actions import SheetActions
 
-class ModernSpreadsheetApp(QMainWindow):
+class ModernSpreadsheetApp(SheetActions, QMainWindow):
     def __init__(self):
         super().__init__()
         
@@ -56,20 +61,22 @@ class ModernSpreadsheetApp(QMainWindow):
     
     def _setup_data_model(self):
         """Initialise le modèle de données"""
-        self.model = QStandardItemModel(10000, 26)  # 10,000 lignes
-        for col in range(self.model.columnCount()):
-            # En-têtes de colonnes (A, B, ..., Z, AA, AB, ...)
-            if col < 26:
-                header = chr(65 + col)
-            else:
-                header = chr(64 + col//26) + chr(65 + col%26)
-            self.model.setHorizontalHeaderItem(col, QStandardItem(header))
+        # Un modèle creux par feuille (en-têtes A, B, ..., Z, AA, AB, ... calculés à la volée),
+        # créé à la première ouverture de son onglet
+        self.workbook = Workbook(self._create_model)
+        self.model = self.workbook.model("Feuille1")
+        self.file_path = None
+        self.search_text = ""
         
-        # Exemple de données
-        for row in range(10):
-            for col in range(5):
-                item = QStandardItem(f"Ex {row+1}-{col+1}")
-                self.model.setItem(row, col, item)
+        # Exemple de données (écrit en un seul bloc)
+        self.model.set_block(0, 0, [[f"Ex {row+1}-{col+1}" for col in range(5)]
+                                    for row in range(10)], undoable=False)
+    
+    def _create_model(self):
+        """Crée le modèle d'une feuille avec son historique d'annulation"""
+        model = SparseTableModel()
+        model.journal = UndoJournal()
+        return model
     
     def _setup_ui(self):
         """Configure l'interface utilisateur principale"""
@@ -119,6 +126,13 @@ class ModernSpreadsheetApp(QMainWindow):
             ("Annuler", "edit-undo", self._undo),
             ("Rétablir", "edit-redo", self._redo),
             None,
+            ("Rechercher", "edit-find", self._find),
+            ("Remplacer", "edit-find-replace", self._replace),
+            ("Filtrer", "view-filter", self._filter),
+            ("Effacer le filtre", "edit-clear", self._clear_filter),
+            ("Trier", "view-sort-ascending", self._sort),
+            ("Annuler le tri", "view-sort", self._clear_sort),
+            None,
             ("Graphique", "insert-chart", self._insert_chart),
             ("Fonctions", "math-function", self._show_functions)
         ]
@@ -238,8 +252,10 @@ class ModernSpreadsheetApp(QMainWindow):
     
     def _add_new_sheet(self, name):
         """Ajoute une nouvelle feuille avec une table moderne"""
+        # Le modèle de la feuille n'est associé qu'à l'affichage de l'onglet
         table = QTableView()
-        table.setModel(self.model)
+        table.setObjectName(name)
+        table.sort_keys = []  # tri affiché [(col, croissant)], les cellules ne bougent pas
         
         # Configuration avancée
         table.setAlternatingRowColors(True)
@@ -269,21 +285,83 @@ class ModernSpreadsheetApp(QMainWindow):
         """)
         
         self.tab_widget.addTab(table, name)
+        if self.tab_widget.currentWidget() is table:
+            self._show_sheet(self.tab_widget.currentIndex())
     
+    def _show_sheet(self, index):
+        """Matérialise la feuille d'un onglet lors de son affichage"""
+        table = self.tab_widget.widget(index)
+        if table is None:
+            return
+        self.model = self.workbook.model(table.objectName())
+        model = table.model()
+        if isinstance(model, RowMappingProxyModel):
+            model = model.sourceModel()
+        if model is not self.model:
+            table.sort_keys = []
+            table.setModel(self.model)
+
+    def _current_sheet(self):
+        return self.model
+
     def _connect_actions(self):
         """Connecte les signaux et slots"""
-        # À implémenter selon les besoins
-        pass
+        self.tab_widget.currentChanged.connect(self._show_sheet)
     
     # Méthodes des actions (à implémenter)
     def _new_file(self): ...
-    def _open_file(self): ...
-    def _save_file(self): ...
-    def _cut(self): ...
-    def _copy(self): ...
-    def _paste(self): ...
-    def _undo(self): ...
-    def _redo(self): ...
+    def _open_file(self):
+        """Ouvre un classeur (.nxs, .xlsx ou .csv) en le chargeant par blocs"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Ouvrir", "", "Classeurs (*.nxs *.xlsx *.xlsm *.csv);;Tous les fichiers (*)")
+        if not path:
+            return
+        self.tab_widget.blockSignals(True)
+        while self.tab_widget.count():
+            self.tab_widget.widget(0).deleteLater()
+            self.tab_widget.removeTab(0)
+        self.tab_widget.blockSignals(False)
+        self.workbook.clear()
+
+        def add_sheet(name):
+            self._add_new_sheet(name)
+            return self.workbook.model(name)
+
+        if run_with_progress(self, "NexusSheet", "Ouverture...", lambda progress: open_workbook(path, add_sheet, progress)):
+            self.file_path = path
+        if not self.tab_widget.count():
+            self._add_new_sheet("Feuille1")
+        self.tab_widget.setCurrentIndex(0)
+        self._show_sheet(0)
+
+    def _save_file(self):
+        """Enregistre le classeur ; le CSV ne contient que la feuille affichée"""
+        path = self.file_path
+        if path is None:
+            path, _ = QFileDialog.getSaveFileName(
+                self, "Enregistrer", "classeur.nxs",
+                "Classeur NexusSheet (*.nxs);;Classeur Excel (*.xlsx);;Fichier CSV (*.csv)")
+            if not path:
+                return
+        if path.lower().endswith(".csv"):
+            names = [self.tab_widget.currentWidget().objectName()]
+        else:
+            names = [self.tab_widget.widget(i).objectName() for i in range(self.tab_widget.count())]
+        if run_with_progress(self, "NexusSheet", "Enregistrement...",
+                             lambda progress: save_workbook(path, names, self.workbook.model, progress)):
+            self.file_path = path
+        self._show_sheet(self.tab_widget.currentIndex())
+
+    def _undo(self):
+        """Annule la dernière modification de la feuille affichée"""
+        if not self.model.undo():
+            self.status_bar.showMessage("Rien à annuler", 2000)
+
+    def _redo(self):
+        """Rétablit la dernière modification annulée"""
+        if not self.model.redo():
+            self.status_bar.showMessage("Rien à rétablir", 2000)
+
     def _insert_chart(self): ...
     def _show_functions(self): ...
 
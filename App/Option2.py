@@ -1,36 +1,107 @@
 import sys
+from collections import OrderedDict
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableView, QTabWidget, 
                             QToolBar, QStatusBar, QMenu, QLineEdit, QLabel, 
                             QHBoxLayout, QWidget, QVBoxLayout, QFrame, QDockWidget,
-                            QStyledItemDelegate, QStyleOptionViewItem, QStyle)
-from PyQt6.QtGui import (QStandardItemModel, QStandardItem, QAction, QIcon, 
-                         QColor, QFont, QPainter)
-from PyQt6.QtCore import Qt, QSize, pyqtSignal, QPoint
+                            QStyledItemDelegate, QStyleOptionViewItem, QStyle,
+                            QProgressBar, QPushButton, QFileDialog)
+from PyQt6.QtGui import (QAction, QIcon, QColor, QFont, QPainter, QBrush, QPen,
+                         QStaticText)
+from PyQt6.QtCore import Qt, QSize, pyqtSignal, QPoint, QPointF
 from PyQt6.QtCharts import QChart, QChartView, QLineSeries
 from PyQt6.QtWidgets import QComboBox
 import pandas as pd
 import numpy as np
+from sheet_model import SparseTableModel, RowMappingProxyModel, DISPLAY_ROLE
+from formula_engine import FormulaEngine
+from recalc_worker import RecalcScheduler
+from workbook import Workbook
+from undo_journal import UndoJournal
+from workbook_io import open_workbook, save_workbook
+from progress_dialog import run_with_progress
+from sheet_actions import SheetActions
+
+# Formats proposés dans les boîtes de dialogue Ouvrir / Enregistrer
+FILE_FILTERS = ("Classeur NexusSheet (*.nxs);;Classeur Excel (*.xlsx);;"
+                "Fichier CSV (*.csv);;Tous les fichiers (*)")
 
 class ModernSpreadsheetDelegate(QStyledItemDelegate):
+    """Délégué de cellule rapide : pinceaux et stylos préalloués, textes élidés en cache.
+
+    Le fond alterné des lignes est peint d'un seul coup par ModernTableView ;
+    le délégué ne dessine que la sélection et le texte.
+    """
+
+    TEXT_CACHE_SIZE = 8192
+    SELECTED = QStyle.StateFlag.State_Selected
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.selected_brush = QBrush(QColor("#5FC7E9FF"))
+        self.text_pen = QPen(Qt.GlobalColor.black)
+        self.selected_pen = QPen(Qt.GlobalColor.white)
+        self._text_cache = OrderedDict()  # (valeur, largeur) -> QStaticText élidé
+
     def paint(self, painter: QPainter, option: QStyleOptionViewItem, index):
         # Style personnalisé pour les cellules
-        if option.state & QStyle.StateFlag.State_Selected:
-            painter.fillRect(option.rect, QColor("#5FC7E9FF"))
-            painter.setPen(Qt.GlobalColor.white)
+        rect = option.rect
+        if option.state & self.SELECTED:
+            painter.fillRect(rect, self.selected_brush)
+            painter.setPen(self.selected_pen)
         else:
-            if index.row() % 2 == 0:
-                painter.fillRect(option.rect, QColor("#ffffff"))
-            else:
-                painter.fillRect(option.rect, QColor("#f8f9fa"))
-            painter.setPen(Qt.GlobalColor.black)
+            painter.setPen(self.text_pen)
         
         # Dessin du texte
-        text = index.data(Qt.ItemDataRole.DisplayRole)
-        painter.drawText(option.rect.adjusted(4, 0, -4, 0), 
-                        Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, 
-                        str(text if text else ""))
+        value = index.data(DISPLAY_ROLE)
+        if value is None or value == "":
+            return
+        width = rect.width() - 8
+        static_text, height = self._static_text(value, width, option.fontMetrics)
+        painter.drawStaticText(QPointF(rect.left() + 4, rect.top() + (rect.height() - height) / 2),
+                               static_text)
+
+    def _static_text(self, value, width, metrics):
+        """Renvoie (mise en page élidée, hauteur) pour (valeur, largeur), avec éviction LRU"""
+        key = (value, width)
+        entry = self._text_cache.get(key)
+        if entry is not None:
+            self._text_cache.move_to_end(key)
+            return entry
+        
+        elided = metrics.elidedText(str(value), Qt.TextElideMode.ElideRight, width)
+        static_text = QStaticText(elided)
+        static_text.setTextFormat(Qt.TextFormat.PlainText)
+        entry = (static_text, static_text.size().height())
+        self._text_cache[key] = entry
+        if len(self._text_cache) > self.TEXT_CACHE_SIZE:
+            self._text_cache.popitem(last=False)
+        return entry
+
+class ModernTableView(QTableView):
+    """Table qui peint les lignes alternées en une passe par viewport"""
 
-class ModernSpreadsheetApp(QMainWindow):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stripe_brush = QBrush(QColor("#f8f9fa"))
+        self.sort_keys = []  # tri affiché [(col, croissant)], les cellules ne bougent pas
+
+    def paintEvent(self, event):
+        viewport = self.viewport()
+        first = self.rowAt(event.rect().top())
+        last = self.rowAt(event.rect().bottom())
+        if first >= 0:
+            if last < 0:
+                last = self.model().rowCount() - 1
+            header = self.verticalHeader()
+            painter = QPainter(viewport)
+            width = viewport.width()
+            for row in range(first | 1, last + 1, 2):
+                painter.fillRect(0, header.sectionViewportPosition(row), width,
+                                 header.sectionSize(row), self.stripe_brush)
+            painter.end()
+        super().paintEvent(event)
+
+class ModernSpreadsheetApp(SheetActions, QMainWindow):
     formula_submitted = pyqtSignal(str, int, int)  # formule, row, col
 
     def __init__(self):
@@ -103,24 +174,25 @@ class ModernSpreadsheetApp(QMainWindow):
 
     def _setup_data_model(self):
         """Initialise le modèle de données"""
-        self.models = {}  # Dictionnaire pour stocker les modèles par feuille
-        self.current_model = QStandardItemModel(10000, 26)  # 10,000 lignes, 26 colonnes
-        self._setup_headers(self.current_model)
-        self.formulas = {}  # Pour stocker les formules
-
-    def _setup_headers(self, model):
-        """Configure les en-têtes de colonnes"""
-        for col in range(model.columnCount()):
-            # Convertit l'index de colonne en notation Excel (A, B, ..., Z, AA, AB, etc.)
-            if col < 26:
-                header = chr(65 + col)
-            else:
-                header = chr(64 + col//26) + chr(65 + col%26)
-            model.setHorizontalHeaderItem(col, QStandardItem(header))
-        
-        # En-têtes de lignes
-        for row in range(model.rowCount()):
-            model.setVerticalHeaderItem(row, QStandardItem(str(row + 1)))
+        # Un modèle par feuille, créé à la première ouverture de son onglet ; les
+        # feuilles masquées les moins récentes sont déchargées sur disque
+        self.workbook = Workbook(self._create_model)
+        self.current_model = None
+        self.file_path = None
+        self.search_text = ""
+
+    def _create_model(self):
+        """Crée un modèle creux (en-têtes calculés à la volée) avec son moteur de formules"""
+        model = SparseTableModel()
+        model.engine = FormulaEngine(model.store)
+        model.journal = UndoJournal()
+        
+        # Les recalculs tournent en arrière-plan et reviennent par lots
+        model.scheduler = RecalcScheduler(model.engine, model)
+        model.scheduler.batch_ready.connect(model.notify_changed)
+        model.scheduler.progress.connect(self._show_recalc_progress)
+        model.scheduler.idle.connect(self._hide_recalc_progress)
+        return model
 
     def _setup_ui(self):
         """Configure l'interface utilisateur principale"""
@@ -169,6 +241,13 @@ class ModernSpreadsheetApp(QMainWindow):
             ("Annuler", "edit-undo", self._undo, "Ctrl+Z"),
             ("Rétablir", "edit-redo", self._redo, "Ctrl+Y"),
             None,
+            ("Rechercher", "edit-find", self._find, "Ctrl+F"),
+            ("Remplacer", "edit-find-replace", self._replace, "Ctrl+H"),
+            ("Filtrer", "view-filter", self._filter, "Ctrl+Shift+L"),
+            ("Effacer le filtre", "edit-clear", self._clear_filter, None),
+            ("Trier", "view-sort-ascending", self._sort, None),
+            ("Annuler le tri", "view-sort", self._clear_sort, None),
+            None,
             ("Graphique", "insert-chart", self._insert_chart, None),
             ("Fonctions", "math-function", self._show_functions, None)
         ]
@@ -268,29 +347,37 @@ class ModernSpreadsheetApp(QMainWindow):
         self.cell_content = QLabel("")
         self.sheet_info = QLabel("Feuille1")
         
+        # Progression du recalcul (masquée au repos)
+        self.recalc_progress = QProgressBar()
+        self.recalc_progress.setMaximumWidth(200)
+        self.recalc_progress.setFormat("Recalcul %p%")
+        self.recalc_progress.hide()
+        self.recalc_cancel = QPushButton("Annuler le calcul")
+        self.recalc_cancel.clicked.connect(self._cancel_recalc)
+        self.recalc_cancel.hide()
+        
         self.status_bar.addPermanentWidget(self.cell_position)
         self.status_bar.addPermanentWidget(self.cell_content, 1)
+        self.status_bar.addPermanentWidget(self.recalc_progress)
+        self.status_bar.addPermanentWidget(self.recalc_cancel)
         self.status_bar.addPermanentWidget(self.sheet_info)
 
     def _add_new_sheet(self, name):
         """Ajoute une nouvelle feuille avec une table moderne"""
-        table = QTableView()
-        table.setModel(self.current_model)
+        # Le modèle de la feuille n'est associé qu'à l'affichage de l'onglet
+        table = ModernTableView()
+        table.setObjectName(name)
         
         # Configuration avancée
         table.setAlternatingRowColors(False)  # Nous gérons nous-mêmes les couleurs
-        table.setItemDelegate(ModernSpreadsheetDelegate())
+        table.setItemDelegate(ModernSpreadsheetDelegate(table))
         table.setSelectionBehavior(QTableView.SelectionBehavior.SelectItems)
         table.setSelectionMode(QTableView.SelectionMode.ContiguousSelection)
         
-        # Stocke le modèle
-        self.models[name] = self.current_model
-        
         # Ajoute l'onglet
         self.tab_widget.addTab(table, name)
-        
-        # Connecte les signaux
-        table.selectionModel().selectionChanged.connect(self._update_status_bar)
+        if self.tab_widget.currentWidget() is table:
+            self._tab_changed(self.tab_widget.currentIndex())
         
         return table
 
@@ -300,10 +387,10 @@ class ModernSpreadsheetApp(QMainWindow):
         if current_table and isinstance(current_table, QTableView):
             selection = current_table.selectionModel()
             if selection.hasSelection():
-                index = selection.currentIndex()
+                index = self._source_index(current_table, selection.currentIndex())
                 col_name = self.current_model.headerData(index.column(), Qt.Orientation.Horizontal)
                 self.cell_position.setText(f"{col_name}{index.row() + 1}")
-                self.cell_content.setText(str(self.current_model.data(index)))
+                self.cell_content.setText(str(self.current_model.data(index, Qt.ItemDataRole.EditRole)))
         
         current_tab = self.tab_widget.currentIndex()
         if current_tab >= 0:
@@ -322,70 +409,128 @@ class ModernSpreadsheetApp(QMainWindow):
         current_table = self.tab_widget.currentWidget()
         
         if current_table and isinstance(current_table, QTableView):
-            index = current_table.selectionModel().currentIndex()
+            index = self._source_index(current_table, current_table.selectionModel().currentIndex())
             if index.isValid():
                 self.formula_submitted.emit(formula, index.row(), index.column())
 
     def _handle_formula(self, formula, row, col):
         """Gère une formule soumise"""
-        # Ici vous implémenteriez votre moteur de formules
-        print(f"Formule '{formula}' appliquée à {row},{col}")
-        self.formulas[(row, col)] = formula
-        
-        # Pour l'exemple, nous affichons simplement la formule
-        self.current_model.setItem(row, col, QStandardItem(formula))
+        # Le moteur analyse la formule et recalcule uniquement les cellules en aval
+        self.current_model.set_value(row, col, formula)
+        self._update_status_bar()
+
+    def _show_recalc_progress(self, done, total):
+        """Affiche l'avancement du recalcul dans la barre d'état"""
+        self.recalc_progress.setMaximum(total)
+        self.recalc_progress.setValue(done)
+        self.recalc_progress.show()
+        self.recalc_cancel.show()
+
+    def _hide_recalc_progress(self):
+        self.recalc_progress.hide()
+        self.recalc_cancel.hide()
         self._update_status_bar()
 
+    def _cancel_recalc(self):
+        """Annule le recalcul de la feuille courante"""
+        if self.current_model.scheduler is not None:
+            self.current_model.scheduler.cancel()
+            self.status_bar.showMessage("Recalcul annulé", 3000)
+
     def _tab_changed(self, index):
-        """Gère le changement d'onglet"""
+        """Gère le changement d'onglet : la feuille est matérialisée à son affichage"""
         if index >= 0:
             table = self.tab_widget.widget(index)
             if table:
-                self.current_model = table.model()
+                self.current_model = self.workbook.model(table.objectName())
+                model = table.model()
+                if isinstance(model, RowMappingProxyModel):
+                    model = model.sourceModel()
+                if model is not self.current_model:
+                    self._set_view_model(table, self.current_model)
                 self._update_status_bar()
 
+    def _set_view_model(self, table, model):
+        """Affiche un modèle (feuille ou vue filtrée) dans une table"""
+        table.setModel(model)
+        table.selectionModel().selectionChanged.connect(self._update_status_bar)
+
+    def _current_sheet(self):
+        return self.current_model
+
     def _close_tab(self, index):
         """Ferme un onglet"""
         if self.tab_widget.count() > 1:
+            table = self.tab_widget.widget(index)
             self.tab_widget.removeTab(index)
+            self.workbook.remove(table.objectName())
+            table.deleteLater()
         else:
             print("Impossible de fermer le dernier onglet")
 
     # Méthodes des actions (à implémenter complètement)
+    def _remove_all_sheets(self):
+        """Ferme toutes les feuilles"""
+        # Les anciennes feuilles sont simplement libérées, sans reconstruire de grille
+        self.tab_widget.blockSignals(True)
+        while self.tab_widget.count():
+            table = self.tab_widget.widget(0)
+            self.tab_widget.removeTab(0)
+            table.deleteLater()
+        self.tab_widget.blockSignals(False)
+        self.workbook.clear()
+        self.current_model = None
+
     def _new_file(self):
         """Crée un nouveau classeur"""
-        self.current_model = QStandardItemModel(10000, 26)
-        self._setup_headers(self.current_model)
+        self._remove_all_sheets()
+        self.file_path = None
         self._add_new_sheet("Feuille1")
-        self.formulas.clear()
 
     def _open_file(self):
-        """Ouvre un fichier existant"""
-        print("Ouverture de fichier - À implémenter")
+        """Ouvre un classeur : les données sont chargées par blocs"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Ouvrir", "", "Classeurs (*.nxs *.xlsx *.xlsm *.csv);;" + FILE_FILTERS)
+        if not path:
+            return
+        self._remove_all_sheets()
 
-    def _save_file(self):
-        """Enregistre le fichier actuel"""
-        print("Enregistrement - À implémenter")
-
-    def _cut(self):
-        """Coupe la sélection"""
-        print("Couper - À implémenter")
+        def add_sheet(name):
+            self._add_new_sheet(name)
+            return self.workbook.model(name)
 
-    def _copy(self):
-        """Copie la sélection"""
-        print("Copier - À implémenter")
+        if run_with_progress(self, "NexusSheet Pro", "Ouverture...", lambda progress: open_workbook(path, add_sheet, progress)):
+            self.file_path = path
+        if not self.tab_widget.count():
+            self._add_new_sheet("Feuille1")
+        self.tab_widget.setCurrentIndex(0)
+        self._tab_changed(0)
 
-    def _paste(self):
-        """Colle la sélection"""
-        print("Coller - À implémenter")
+    def _save_file(self):
+        """Enregistre le classeur (les formats .xlsx et .nxs gardent toutes les feuilles)"""
+        path = self.file_path
+        if path is None:
+            path, _ = QFileDialog.getSaveFileName(self, "Enregistrer", "classeur.nxs", FILE_FILTERS)
+            if not path:
+                return
+        names = [self.tab_widget.widget(i).objectName() for i in range(self.tab_widget.count())]
+        if path.lower().endswith(".csv"):
+            names = [self.tab_widget.currentWidget().objectName()]
+        if run_with_progress(self, "NexusSheet Pro", "Enregistrement...",
+                             lambda progress: save_workbook(path, names, self.workbook.model, progress)):
+            self.file_path = path
+        # Parcourir les feuilles a pu décharger celle affichée
+        self._tab_changed(self.tab_widget.currentIndex())
 
     def _undo(self):
-        """Annule la dernière action"""
-        print("Annuler - À implémenter")
+        """Annule la dernière action de la feuille affichée"""
+        if self.current_model is None or not self.current_model.undo():
+            self.status_bar.showMessage("Rien à annuler", 2000)
 
     def _redo(self):
         """Rétablit la dernière action annulée"""
-        print("Rétablir - À implémenter")
+        if self.current_model is None or not self.current_model.redo():
+            self.status_bar.showMessage("Rien à rétablir", 2000)
 
     def _insert_chart(self):
         """Insère un graphique"""
@@ -2,6 +2,19 @@ import flet as ft
 import pandas as pd
 import numpy as np
 from math import isnan
+from sheet_sort import dense_keys, sort_permutation
+from column_store import ColumnStore
+from sheet_store import column_letter
+
+# Géométrie de la grille virtualisée
+ROW_HEIGHT = 32
+COLUMN_WIDTH = 100
+HEADER_WIDTH = 60
+# Lignes préparées au-dessus et au-dessous de la zone visible
+OVERSCAN_ROWS = 10
+# Colonnes préparées à gauche et à droite de la zone visible
+OVERSCAN_COLUMNS = 2
+SELECTED_COLOR = ft.colors.BLUE_100
 
 class SpreadsheetApp:
     def __init__(self, page: ft.Page):
@@ -20,17 +33,16 @@ class SpreadsheetApp:
         self.page.padding = 10
 
     def _init_data(self):
-        """Initialise les données avec 10 colonnes et 100 lignes"""
-        self.data = pd.DataFrame(
-            np.nan, 
-            index=range(100), 
-            columns=[self._col_to_letter(i) for i in range(10)]
-        )
+        """Initialise les données avec 10 colonnes et 100 000 lignes"""
+        # Colonnes typées (float64, int64, textes en réservoir) plutôt qu'un
+        # DataFrame de NaN qu'une saisie de texte fait passer en objets
+        self.data = ColumnStore(100_000, 10)
         self.current_cell = (0, 0)  # (row, col)
-
-    def _col_to_letter(self, col_idx: int) -> str:
-        """Convertit l'index de colonne en lettre Excel (0->A, 1->B...)"""
-        return chr(65 + col_idx)
+        # Tri affiché [(col, croissant)] : seul l'ordre d'affichage change,
+        # self.order donne la ligne de données de chaque ligne affichée
+        self.sort_keys = []
+        self.order = None
+        self.positions = None  # inverse de self.order
 
     def _build_ui(self):
         """Construit l'interface utilisateur"""
@@ -39,6 +51,11 @@ class SpreadsheetApp:
             controls=[
                 ft.IconButton(ft.icons.SAVE, on_click=self._save_data),
                 ft.IconButton(ft.icons.ADD, on_click=self._add_column),
+                ft.IconButton(ft.icons.ARROW_UPWARD, tooltip="Tri croissant",
+                              on_click=lambda e: self._sort_by(self.current_cell[1], True)),
+                ft.IconButton(ft.icons.ARROW_DOWNWARD, tooltip="Tri décroissant",
+                              on_click=lambda e: self._sort_by(self.current_cell[1], False)),
+                ft.IconButton(ft.icons.CLEAR, tooltip="Annuler le tri", on_click=self._clear_sort),
             ]
         )
 
@@ -49,25 +66,51 @@ class SpreadsheetApp:
             expand=True
         )
 
-        # Grille de données
-        self.data_table = ft.DataTable(
-            columns=[ft.DataColumn(ft.Text(col)) for col in self.data.columns],
-            rows=self._create_data_rows(),
-            border=ft.border.all(1),
-            vertical_lines=ft.border.BorderSide(1),
-            horizontal_lines=ft.border.BorderSide(1),
+        # Grille virtualisée dans les deux sens : un nombre fixe de lignes de
+        # contrôles, chacune avec un nombre fixe de cellules, recyclées au
+        # défilement et positionnées dans un canevas de la taille de la feuille
+        self.column_pool = int((self.page.window_width or 1200) // COLUMN_WIDTH) + 2 * OVERSCAN_COLUMNS
+        self.first_col = 0
+        self.header_row = ft.Stack(
+            controls=[self._header_cell(width=HEADER_WIDTH)] +
+                     [self._header_cell(cell) for cell in range(self.column_pool)],
+            height=ROW_HEIGHT,
         )
+        pool_size = int((self.page.window_height or 800) // ROW_HEIGHT) + 2 * OVERSCAN_ROWS
+        self.slots = [self._create_slot(slot) for slot in range(pool_size)]
+        self.first_row = 0
+        for col in self._shown_columns():
+            self._fill_header(col)
+        self.canvas = ft.Stack(controls=self.slots, height=self.data.rows * ROW_HEIGHT)
+        self.viewport = ft.Column(
+            controls=[self.canvas],
+            scroll=ft.ScrollMode.ALWAYS,
+            on_scroll=self._grid_scrolled,
+            on_scroll_interval=20,
+            expand=True,
+        )
+        # La largeur de la grille est portée par un contrôle vide, sans enfants :
+        # l'élargir après un ajout de colonne ne compare pas toute la grille.
+        # L'en-tête et le canevas, qui n'ont que des enfants positionnés,
+        # prennent la largeur disponible.
+        self.sizer = ft.Container(width=self._grid_width(), height=0)
+        self.grid = ft.Stack(controls=[
+            self.sizer,
+            ft.Column(controls=[self.header_row, self.viewport], spacing=0,
+                      left=0, top=0, right=0, bottom=0),
+        ])
 
         # Conteneur principal
         self.main_container = ft.Column(
             controls=[
                 self.toolbar,
                 self.formula_bar,
-                ft.Container(
-                    content=ft.ListView(
-                        controls=[self.data_table],
-                        expand=True,
-                    ),
+                ft.Row(
+                    controls=[self.grid],
+                    scroll=ft.ScrollMode.AUTO,
+                    on_scroll=self._grid_scrolled_horizontally,
+                    on_scroll_interval=20,
+                    vertical_alignment=ft.CrossAxisAlignment.STRETCH,
                     expand=True,
                 ),
             ],
@@ -76,60 +119,265 @@ class SpreadsheetApp:
 
         self.page.add(self.main_container)
 
-    def _create_data_rows(self):
-        """Crée les lignes de données pour la table"""
-        rows = []
-        for row_idx in range(len(self.data)):
-            cells = []
-            for col_idx in range(len(self.data.columns)):
-                value = self.data.iat[row_idx, col_idx]
-                cells.append(
-                    ft.DataCell(
-                        ft.Text("" if pd.isna(value) else str(value)),
-                        on_tap=lambda e, r=row_idx, c=col_idx: self._cell_selected(r, c),
-                    )
-                )
-            rows.append(ft.DataRow(cells=cells))
-        return rows
+    def _grid_width(self):
+        return HEADER_WIDTH + COLUMN_WIDTH * len(self.data.columns)
+
+    def _header_cell(self, cell=None, width=COLUMN_WIDTH):
+        """En-tête de colonne du réservoir (coin si `cell` est None) ; un clic trie selon sa colonne"""
+        return ft.Container(
+            content=ft.Text("", weight=ft.FontWeight.BOLD),
+            width=width,
+            height=ROW_HEIGHT,
+            left=0,
+            visible=cell is None,
+            alignment=ft.alignment.center,
+            bgcolor=ft.colors.SURFACE_VARIANT,
+            border=ft.border.all(0.5, ft.colors.OUTLINE_VARIANT),
+            on_click=self._header_clicked if cell is not None else None,
+            data=cell,
+        )
+
+    def _create_slot(self, slot):
+        """Crée une ligne de contrôles réutilisable (numéro de ligne puis cellules)"""
+        controls = [ft.Container(content=ft.Text(""), width=HEADER_WIDTH, height=ROW_HEIGHT, left=0,
+                                 alignment=ft.alignment.center, bgcolor=ft.colors.SURFACE_VARIANT)]
+        controls.extend(self._create_cell(slot, cell) for cell in range(self.column_pool))
+        # data : position affichée par la ligne, -1 si elle n'affiche rien ;
+        # left et right à 0 : la ligne prend la largeur du canevas
+        return ft.Stack(controls=controls, top=0, left=0, right=0, height=ROW_HEIGHT,
+                        visible=False, data=-1)
+
+    def _create_cell(self, slot, cell):
+        return ft.Container(
+            content=ft.Text("", no_wrap=True),
+            width=COLUMN_WIDTH,
+            height=ROW_HEIGHT,
+            padding=ft.padding.symmetric(horizontal=5),
+            alignment=ft.alignment.center_left,
+            border=ft.border.all(0.5, ft.colors.OUTLINE_VARIANT),
+            left=0,
+            visible=False,
+            on_click=self._cell_clicked,
+            data=(slot, cell),
+        )
+
+    def _display(self, row, col):
+        value = self.data.get(row, col)
+        return "" if value is None else str(value)
+
+    def _data_row(self, position):
+        """Ligne de données affichée à une position (selon le tri)"""
+        return int(self.order[position]) if self.order is not None else position
+
+    def _position(self, row):
+        """Position affichée d'une ligne de données"""
+        return int(self.positions[row]) if self.order is not None else row
+
+    def _shown_columns(self):
+        """Colonnes affectées aux cellules du réservoir"""
+        return range(self.first_col, min(self.first_col + self.column_pool, len(self.data.columns)))
+
+    def _pool_column(self, cell):
+        """Colonne affichée par la cellule `cell` du réservoir de chaque ligne"""
+        return self.first_col + (cell - self.first_col) % self.column_pool
+
+    def _fill_header(self, col):
+        """Affiche le nom de la colonne (et le sens du tri) dans son en-tête recyclé"""
+        header = self.header_row.controls[1 + col % self.column_pool]
+        arrow = ""
+        if self.sort_keys and self.sort_keys[0][0] == col:
+            arrow = " ▲" if self.sort_keys[0][1] else " ▼"
+        header.content.value = column_letter(col) + arrow
+        header.left = HEADER_WIDTH + col * COLUMN_WIDTH
+        header.visible = True
+
+    def _fill_cell(self, slot, row, col):
+        """Recycle la cellule de `slot` qui affiche la colonne `col`.
+
+        Comme pour les lignes, la colonne c est toujours affichée par la
+        cellule c % taille du réservoir : un défilement horizontal de k
+        colonnes ne remplit que k cellules par ligne.
+        """
+        cell = slot.controls[1 + col % self.column_pool]
+        cell.left = HEADER_WIDTH + col * COLUMN_WIDTH
+        cell.visible = True
+        cell.content.value = self._display(row, col)
+        cell.bgcolor = SELECTED_COLOR if (row, col) == self.current_cell else None
+        return cell
+
+    def _fill_slot(self, slot, position):
+        """Recycle une ligne de contrôles pour afficher la position donnée"""
+        row = self._data_row(position)
+        slot.data = position
+        slot.top = position * ROW_HEIGHT
+        slot.visible = True
+        slot.controls[0].content.value = str(row + 1)
+        for col in self._shown_columns():
+            self._fill_cell(slot, row, col)
+
+    def _show_columns(self, columns):
+        """Affiche des colonnes (nouvellement affectées au réservoir) dans l'en-tête
+        et les lignes visibles ; renvoie les contrôles modifiés, à envoyer au client"""
+        for col in columns:
+            self._fill_header(col)
+        changed = [self.header_row] if columns else []
+        for slot in self.slots:
+            if slot.data >= 0:
+                row = self._data_row(slot.data)
+                changed.extend(self._fill_cell(slot, row, col) for col in columns)
+        return changed
+
+    def _show_rows(self):
+        """Affecte les positions visibles (plus la marge) aux lignes de contrôles.
+
+        La position p est toujours affichée par la ligne p % taille du
+        réservoir : un défilement de k lignes ne remplit que k lignes.
+        """
+        count = len(self.slots)
+        last = min(self.first_row + count, self.data.rows)
+        for position in range(self.first_row, last):
+            slot = self.slots[position % count]
+            if slot.data != position:
+                self._fill_slot(slot, position)
+        for slot in self.slots:
+            if slot.visible and not self.first_row <= slot.data < last:
+                slot.visible = False
+                slot.data = -1
+
+    def _grid_scrolled(self, e):
+        first = max(0, int(e.pixels // ROW_HEIGHT) - OVERSCAN_ROWS)
+        if first != self.first_row:
+            self.first_row = first
+            self._show_rows()
+            self.canvas.update()
+
+    def _grid_scrolled_horizontally(self, e):
+        first = max(0, min(int(e.pixels // COLUMN_WIDTH) - OVERSCAN_COLUMNS,
+                           len(self.data.columns) - self.column_pool))
+        if first != self.first_col:
+            previous = self._shown_columns()
+            self.first_col = first
+            self.page.update(*self._show_columns([col for col in self._shown_columns()
+                                                  if col not in previous]))
+
+    def _cell_clicked(self, e):
+        slot, cell = e.control.data
+        position = self.slots[slot].data
+        if position >= 0:
+            self._cell_selected(self._data_row(position), self._pool_column(cell))
+
+    def _cell_control(self, row, col):
+        """Contrôle affichant une cellule, ou None si elle n'est pas dans le réservoir"""
+        if col not in self._shown_columns():
+            return None
+        position = self._position(row)
+        slot = self.slots[position % len(self.slots)]
+        return slot.controls[1 + col % self.column_pool] if slot.data == position else None
 
     def _cell_selected(self, row: int, col: int):
         """Gère la sélection d'une cellule"""
+        # Seuls les contrôles concernés sont comparés et envoyés au client
+        changed = [self.formula_bar]
+        previous = self._cell_control(*self.current_cell)
+        if previous is not None:
+            previous.bgcolor = None
+            changed.append(previous)
         self.current_cell = (row, col)
-        value = self.data.iat[row, col]
-        self.formula_bar.value = "" if pd.isna(value) else str(value)
-        self.page.update()
+        current = self._cell_control(row, col)
+        if current is not None:
+            current.bgcolor = SELECTED_COLOR
+            changed.append(current)
+        self.formula_bar.value = self._display(row, col)
+        self.page.update(*changed)
 
     def _update_cell_value(self, e):
         """Met à jour la valeur d'une cellule"""
         row, col = self.current_cell
         new_value = self.formula_bar.value
         
-        try:
-            # Essaye de convertir en nombre si possible
-            num_value = float(new_value)
-            self.data.iat[row, col] = num_value
-        except ValueError:
+        # Essaye de convertir en nombre (entier puis décimal) si possible
+        for convert in (int, float):
+            try:
+                value = convert(new_value)
+                break
+            except ValueError:
+                pass
+        else:
             # Garde comme texte si ce n'est pas un nombre
-            self.data.iat[row, col] = new_value if new_value else np.nan
+            value = new_value if new_value else None
+        self.data.set(row, col, value)
         
-        self._update_grid()
+        self._refresh_cell(row, col)
+
+    def _refresh_cell(self, row: int, col: int):
+        """Met à jour le seul contrôle de la cellule, s'il est affiché.
+
+        page.update(texte) ne compare que ce contrôle : le client ne reçoit
+        qu'une commande "set" de sa valeur, quelle que soit la taille de la
+        feuille.
+        """
+        cell = self._cell_control(row, col)
+        if cell is not None:
+            cell.content.value = self._display(row, col)
+            self.page.update(cell.content)
 
     def _update_grid(self):
-        """Met à jour toute la grille"""
-        self.data_table.rows = self._create_data_rows()
+        """Réaffiche les lignes visibles (après un tri)"""
+        for slot in self.slots:
+            slot.data = -1
+        self.canvas.height = self.data.rows * ROW_HEIGHT
+        self._show_rows()
         self.page.update()
 
     def _add_column(self, e):
-        """Ajoute une nouvelle colonne"""
-        new_col = self._col_to_letter(len(self.data.columns))
-        self.data[new_col] = np.nan
-        self.data_table.columns.append(ft.DataColumn(ft.Text(new_col)))
+        """Ajoute une nouvelle colonne.
+
+        La colonne typée n'alloue son tableau qu'à la première saisie ; la
+        grille ne fait qu'élargir le canevas et, si la colonne tombe dans le
+        réservoir, afficher ses cellules (vides) dans les lignes visibles.
+        """
+        col = self.data.add_column()
+        self.sizer.width = self._grid_width()
+        changed = [self.sizer]
+        if col in self._shown_columns():
+            changed.extend(self._show_columns([col]))
+        self.page.update(*changed)
+
+    def _header_clicked(self, e):
+        # Un second clic sur la colonne du tri principal inverse son sens
+        col = self._pool_column(e.control.data)
+        ascending = not (self.sort_keys and self.sort_keys[0] == (col, True))
+        self._sort_by(col, ascending)
+
+    def _sort_by(self, col: int, ascending: bool):
+        """Trie l'affichage par une colonne ; le tri précédent départage les égalités"""
+        self.sort_keys = [(col, ascending)] + [key for key in self.sort_keys if key[0] != col]
+        self._apply_sort()
+
+    def _apply_sort(self):
+        # Permutation calculée sur les colonnes, sans déplacer les données
+        if self.sort_keys:
+            self.order = sort_permutation([dense_keys(self.data.columns[col].dense(), ascending)
+                                           for col, ascending in self.sort_keys])
+            self.positions = np.empty_like(self.order)
+            self.positions[self.order] = np.arange(len(self.order))
+        else:
+            self.order = None
+        # Sens du tri principal indiqué dans les en-têtes
+        for col in self._shown_columns():
+            self._fill_header(col)
         self._update_grid()
 
+    def _clear_sort(self, e):
+        """Rétablit l'ordre des lignes"""
+        self.sort_keys = []
+        self._apply_sort()
+
     def _save_data(self, e):
         """Sauvegarde les données (exemple)"""
         print("Données actuelles:")
-        print(self.data.head())
+        print(pd.DataFrame(self.data.head(5), columns=[column_letter(col) for col in range(len(self.data.columns))]))
+        print(f"Mémoire des colonnes : {self.data.nbytes() / 1e6:.1f} Mo")
         self.page.snack_bar = ft.SnackBar(ft.Text("Données sauvegardées (voir console)"))
         self.page.snack_bar.open = True
         self.page.update()
@@ -137,5 +385,78 @@ class SpreadsheetApp:
 def main(page: ft.Page):
     app = SpreadsheetApp(page)
 
+
+def benchmark_edit_payload(edits=1000):
+    """Mesure le volume envoyé au client et la durée par saisie, sans client réel.
+
+    La connexion traite les commandes comme le serveur Flet et compte les
+    octets du message JSON qui partirait sur la websocket.
+    """
+    import asyncio
+    import json
+    import time
+    from types import SimpleNamespace
+    from flet_core.local_connection import LocalConnection
+    from flet_core.protocol import (ClientActions, ClientMessage, CommandEncoder,
+                                    PageCommandsBatchResponsePayload)
+
+    class MeasuringConnection(LocalConnection):
+        def __init__(self):
+            super().__init__()
+            self.sent = 0
+
+        def send_commands(self, session_id, commands):
+            results, messages = [], []
+            for command in commands:
+                result, message = self._process_command(command)
+                if command.name in ["add", "get"]:
+                    results.append(result)
+                if message:
+                    messages.append(message)
+            if messages:
+                payload = json.dumps(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages),
+                                     cls=CommandEncoder, separators=(",", ":"))
+                self.sent += len(payload.encode("utf-8"))
+            return PageCommandsBatchResponsePayload(results=results, error="")
+
+    connection = MeasuringConnection()
+    page = ft.Page(connection, "benchmark", asyncio.new_event_loop())
+    app = SpreadsheetApp(page)
+    print(f"Affichage initial : {connection.sent / 1024:.0f} Kio")
+
+    def measure(label, action, count):
+        connection.sent = 0
+        start = time.perf_counter()
+        for n in range(count):
+            action(n)
+        elapsed = (time.perf_counter() - start) / count
+        print(f"{label} : {connection.sent / count:.0f} octets, {elapsed * 1000:.2f} ms")
+
+    def edit(n):
+        app.current_cell = (n % 20, n % len(app.data.columns))
+        app.formula_bar.value = str(n)
+        app._update_cell_value(None)
+
+    def scroll(n):
+        # Seule la position est lue dans l'événement de défilement
+        app._grid_scrolled(SimpleNamespace(pixels=(n + 1) * 25 * ROW_HEIGHT))
+
+    measure("Saisie d'une cellule", edit, edits)
+    measure("Sélection d'une cellule", lambda n: app._cell_selected(n % 20, n % 5), edits)
+    # Pour comparaison : saisie suivie d'une comparaison de toute la page,
+    # puis défilement d'un écran (25 lignes remplies à nouveau)
+    measure("Saisie puis page.update()", lambda n: (edit(n), page.update()), 50)
+    measure("Défilement d'un écran", scroll, 20)
+    # Feuille large : ajout de colonnes jusqu'à 2000, puis défilement
+    # horizontal d'une colonne (une cellule remplie par ligne)
+    measure("Ajout d'une colonne", lambda n: app._add_column(None), 2000 - len(app.data.columns))
+    measure("Défilement d'une colonne", lambda n: app._grid_scrolled_horizontally(
+        SimpleNamespace(pixels=(n + 1000) * COLUMN_WIDTH)), 100)
+
+
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    import sys
+    if "--benchmark" in sys.argv:
+        benchmark_edit_payload()
+    else:
+        ft.app(target=main)
\ No newline at end of file
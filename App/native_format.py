@@ -0,0 +1,502 @@
+import json
+import mmap
+from bisect import bisect_left
+import os
+import struct
+import zlib
+from contextlib import ExitStack, nullcontext
+import numpy as np
+from sheet_store import SparseCellStore, ErrorValue, CHUNK_SHIFT, CHUNK_ROWS
+
+# Format natif (.nxs) : colonnes typées découpées en blocs, index JSON en fin
+# de fichier. Les blocs bruts sont lus directement dans le fichier projeté.
+NATIVE_MAGIC = b"NXS1"
+NATIVE_VERSION = 2
+NATIVE_CHUNK_SHIFT = 16
+_TRAILER = struct.Struct("<Q4s")  # position de l'index, signature
+_ALIGNMENT = 8  # les tableaux float64 d'un bloc restent alignés dans le fichier
+
+# Types de cellule ; les entiers sont stockés dans le tableau float64 des nombres
+_NUMBER, _TEXT, _ERROR, _INTEGER = 0, 1, 2, 3
+_KINDS = {float: _NUMBER, int: _INTEGER, str: _TEXT, ErrorValue: _ERROR}
+
+class WorkbookFormatError(Exception):
+    """Fichier de classeur illisible"""
+
+
+def sheet_lock(model):
+    """Empêche le recalcul en arrière-plan de modifier la feuille pendant l'écriture"""
+    return model.engine.lock if model.engine is not None else nullcontext()
+
+
+def _kind(value):
+    """Type d'une valeur dont la classe n'est pas directement dans _KINDS"""
+    if isinstance(value, bool):
+        return _TEXT
+    if isinstance(value, int):
+        return _INTEGER
+    if isinstance(value, float):
+        return _NUMBER
+    return _ERROR if isinstance(value, ErrorValue) else _TEXT
+
+
+# Blocs de cellules
+
+def encode_cells(rows, values):
+    """Encode un bloc de colonne : nombres, lignes, fins de textes, types puis textes"""
+    kinds = [_KINDS.get(value.__class__) for value in values]
+    if None in kinds:
+        kinds = [_kind(value) if kind is None else kind for kind, value in zip(kinds, values)]
+    textual = [position for position, kind in enumerate(kinds) if kind == _TEXT or kind == _ERROR]
+    if not textual:
+        # Colonne purement numérique : conversion en un seul appel
+        numbers = np.asarray(values, dtype=np.float64)
+        ends = np.zeros(len(values), dtype=np.int32)
+        texts = []
+    else:
+        numbers = np.full(len(values), np.nan)
+        numeric = [position for position, kind in enumerate(kinds) if kind == _NUMBER or kind == _INTEGER]
+        if numeric:
+            numbers[numeric] = [values[position] for position in numeric]
+        texts = [str(values[position]).encode("utf-8") for position in textual]
+        lengths = np.zeros(len(values), dtype=np.int32)
+        lengths[textual] = [len(text) for text in texts]
+        ends = np.cumsum(lengths, dtype=np.int32)
+    return b"".join((numbers.tobytes(),
+                     np.asarray(rows, dtype=np.int32).tobytes(),
+                     ends.tobytes(),
+                     np.asarray(kinds, dtype=np.uint8).tobytes(),
+                     *texts))
+
+
+def _cell_arrays(buffer, count):
+    """Vues NumPy (lignes, types, nombres, fins de textes, textes) sur un bloc, sans copie"""
+    numbers = np.frombuffer(buffer, dtype=np.float64, count=count)
+    rows = np.frombuffer(buffer, dtype=np.int32, count=count, offset=8 * count)
+    ends = np.frombuffer(buffer, dtype=np.int32, count=count, offset=12 * count)
+    tags = np.frombuffer(buffer, dtype=np.uint8, count=count, offset=16 * count)
+    return rows, tags, numbers, ends, buffer[17 * count:]
+
+
+class _MappedBlock:
+    """Accès direct aux cellules d'un bloc : vues typées sur le fichier, sans copie"""
+
+    __slots__ = ("count", "rows", "tags", "numbers", "ends", "texts", "first", "dense")
+
+    def __init__(self, buffer, count):
+        buffer = memoryview(buffer)
+        self.count = count
+        # Vues memoryview : l'accès à un élément y est plus rapide qu'avec NumPy
+        self.numbers = buffer[:8 * count].cast("d")
+        self.rows = buffer[8 * count:12 * count].cast("i")
+        self.ends = buffer[12 * count:16 * count].cast("i")
+        self.tags = buffer[16 * count:17 * count]
+        self.texts = buffer[17 * count:]
+        self.first = self.rows[0]
+        # Lignes consécutives : la position se calcule sans recherche
+        self.dense = self.rows[count - 1] - self.first == count - 1
+
+    def position(self, offset):
+        """Renvoie la position d'une ligne dans le bloc, ou -1"""
+        if self.dense:
+            position = offset - self.first
+            return position if 0 <= position < self.count else -1
+        position = bisect_left(self.rows, offset)
+        return position if position < self.count and self.rows[position] == offset else -1
+
+    def value(self, position):
+        tag = self.tags[position]
+        if tag == _NUMBER:
+            return self.numbers[position]
+        if tag == _INTEGER:
+            return int(self.numbers[position])
+        start = self.ends[position - 1] if position else 0
+        text = bytes(self.texts[start:self.ends[position]]).decode("utf-8")
+        return ErrorValue(text) if tag == _ERROR else text
+
+    def arrays(self):
+        """Vues NumPy (lignes, types, nombres) pour les calculs vectorisés"""
+        return (np.frombuffer(self.rows, dtype=np.int32),
+                np.frombuffer(self.tags, dtype=np.uint8),
+                np.frombuffer(self.numbers, dtype=np.float64))
+
+
+def decode_cells(buffer, count):
+    """Décode un bloc produit par encode_cells en (lignes, valeurs)"""
+    rows, tags, numbers, ends, texts = _cell_arrays(buffer, count)
+    values = numbers.tolist()
+    for position in np.flatnonzero(tags == _INTEGER).tolist():
+        values[position] = int(values[position])
+    positions = np.flatnonzero((tags == _TEXT) | (tags == _ERROR)).tolist()
+    ends = ends.tolist()
+    for position in positions:
+        start = ends[position - 1] if position else 0
+        text = bytes(texts[start:ends[position]]).decode("utf-8")
+        values[position] = ErrorValue(text) if tags[position] == _ERROR else text
+    return rows.tolist(), values
+
+
+# Écriture
+
+def _align(handle):
+    """Complète le fichier jusqu'à la prochaine position alignée et la renvoie"""
+    padding = -handle.tell() % _ALIGNMENT
+    handle.write(b"\0" * padding)
+    return handle.tell()
+
+
+def _write_block(handle, payload, compress=False):
+    """Écrit un bloc aligné ; compressé seulement si demandé et rentable"""
+    offset = _align(handle)
+    if compress:
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload):
+            handle.write(compressed)
+            return {"offset": offset, "length": len(compressed), "codec": "zlib"}
+    handle.write(payload)
+    return {"offset": offset, "length": len(payload), "codec": "raw"}
+
+
+def write_native(path, names, model_for, progress=None, compress=False):
+    """Écrit les feuilles au format natif.
+
+    Les blocs de colonnes sont bruts par défaut pour pouvoir être lus sans
+    copie une fois le fichier projeté en mémoire ; `compress=True` les
+    compresse au prix d'une décompression à la lecture. Le fichier est écrit
+    à côté puis renommé : une feuille projetée sur l'ancien fichier reste lisible.
+    """
+    index = {"version": NATIVE_VERSION, "sheets": []}
+    mapped = []  # feuilles encore lues dans le fichier remplacé
+    temporary = path + ".tmp"
+    replaced = False
+    with ExitStack() as held:
+        try:
+            with open(temporary, "wb") as handle:
+                handle.write(NATIVE_MAGIC)
+                for position, name in enumerate(names):
+                    model = model_for(name)
+                    if isinstance(model.store, MappedCellStore) and model.store.maps(path):
+                        # Verrou gardé jusqu'au rattachement : une modification faite
+                        # entre l'écriture et remap() serait perdue
+                        held.enter_context(sheet_lock(model))
+                        mapped.append((name, model.store))
+                    with sheet_lock(model):
+                        entry = _write_sheet(handle, name, model, compress,
+                                             lambda fraction: progress is None or
+                                             progress((position + fraction) / len(names)) is not False)
+                    if entry is None:
+                        return False
+                    index["sheets"].append(entry)
+
+                index_offset = handle.tell()
+                handle.write(zlib.compress(json.dumps(index).encode("utf-8")))
+                handle.write(_TRAILER.pack(index_offset, NATIVE_MAGIC))
+
+            if os.name == "nt":
+                # Windows refuse de remplacer un fichier encore projeté en mémoire
+                for _, store in mapped:
+                    store.detach()
+                mapped = []
+            os.replace(temporary, path)
+            replaced = True
+        finally:
+            if not replaced and os.path.exists(temporary):
+                os.remove(temporary)
+        if mapped:
+            # Le fichier enregistré contient exactement ces feuilles : on s'y rattache
+            reader = NativeReader(path)
+            sheets = {sheet["name"]: sheet for sheet in reader.sheets}
+            for name, store in mapped:
+                store.remap(reader, sheets[name])
+    return True
+
+
+def _write_sheet(handle, name, model, compress, progress):
+    """Écrit les blocs d'une feuille et renvoie son entrée d'index (None si annulé)"""
+    store = model.store
+    rows, columns = store.extent()
+    entry = {"name": name, "rows": rows, "columns": columns, "data": {}}
+    used = store.columns()
+    for done, col in enumerate(used):
+        blocks = []
+        mapped = store.mapped_blocks(col) if isinstance(store, MappedCellStore) else None
+        if mapped is not None:
+            # Colonne non modifiée : ses blocs sont recopiés tels quels
+            for block, payload in mapped:
+                offset = _align(handle)
+                handle.write(payload)
+                blocks.append(dict(block, offset=offset))
+        else:
+            column = store.column(col)
+            chunks = {}
+            for row in sorted(column):
+                chunks.setdefault(row >> NATIVE_CHUNK_SHIFT, []).append(row)
+            for chunk, chunk_rows in chunks.items():
+                base = chunk << NATIVE_CHUNK_SHIFT
+                payload = encode_cells([row - base for row in chunk_rows],
+                                        [column[row] for row in chunk_rows])
+                block = _write_block(handle, payload, compress)
+                block.update(start=base, count=len(chunk_rows))
+                blocks.append(block)
+        entry["data"][str(col)] = blocks
+        if not progress((done + 1) / len(used)):
+            return None
+
+    formulas = model.engine.formulas() if model.engine is not None else {}
+    if formulas:
+        cells = list(formulas)
+        texts = [formulas[cell].encode("utf-8") for cell in cells]
+        payload = b"".join((np.asarray([row for row, _ in cells], dtype=np.int32).tobytes(),
+                            np.asarray([col for _, col in cells], dtype=np.int32).tobytes(),
+                            np.asarray([len(text) for text in texts], dtype=np.int32).tobytes(),
+                            *texts))
+        entry["formulas"] = _write_block(handle, payload, compress=True)
+        entry["formulas"]["count"] = len(cells)
+    return entry
+
+
+# Lecture
+
+class NativeReader:
+    """Lecteur du format natif : le fichier est projeté en mémoire et chaque
+    bloc n'est lu (ou décompressé) qu'au moment où il est demandé."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(path, "rb") as handle:
+            try:
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise WorkbookFormatError("Fichier vide")
+        if len(self._map) < len(NATIVE_MAGIC) + _TRAILER.size or self._map[:4] != NATIVE_MAGIC:
+            raise WorkbookFormatError("Ce fichier n'est pas un classeur NexusSheet")
+        index_offset, magic = _TRAILER.unpack_from(self._map, len(self._map) - _TRAILER.size)
+        if magic != NATIVE_MAGIC:
+            raise WorkbookFormatError("Classeur NexusSheet tronqué")
+        self.index = json.loads(zlib.decompress(self._map[index_offset:len(self._map) - _TRAILER.size]))
+        self.version = self.index["version"]
+        if self.version != NATIVE_VERSION:
+            raise WorkbookFormatError(f"Version de classeur non prise en charge : {self.version}")
+        self.sheets = self.index["sheets"]
+
+    def raw(self, entry):
+        """Renvoie le contenu d'un bloc tel qu'il est stocké (vue sur le fichier)"""
+        return memoryview(self._map)[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def block(self, entry):
+        """Renvoie le contenu décodé d'un bloc : une vue sans copie s'il est brut"""
+        if entry["codec"] == "raw":
+            return self.raw(entry)
+        return zlib.decompress(self.raw(entry))
+
+    def formulas(self, sheet):
+        """Renvoie les formules d'une feuille sous forme [(row, col, texte)]"""
+        entry = sheet.get("formulas")
+        if entry is None:
+            return []
+        count = entry["count"]
+        buffer = bytes(self.block(entry))
+        rows = np.frombuffer(buffer, dtype=np.int32, count=count).tolist()
+        cols = np.frombuffer(buffer, dtype=np.int32, count=count, offset=4 * count).tolist()
+        lengths = np.frombuffer(buffer, dtype=np.int32, count=count, offset=8 * count)
+        ends = (12 * count + np.cumsum(lengths)).tolist()
+        starts = [end - length for end, length in zip(ends, lengths.tolist())]
+        return [(row, col, buffer[start:end].decode("utf-8"))
+                for row, col, start, end in zip(rows, cols, starts, ends)]
+
+
+class MappedCellStore(SparseCellStore):
+    """Stockage d'une feuille lue directement dans un fichier natif projeté.
+
+    Les cellules sont lues à la demande dans les blocs du fichier, sans les
+    charger : l'ouverture ne coûte que la lecture de l'index et c'est le cache
+    de pages du système qui gère la mémoire. Une colonne n'est copiée en
+    mémoire (dans le stockage creux hérité) qu'à sa première modification.
+    """
+
+    def __init__(self, reader, sheet):
+        super().__init__()
+        self.remap(reader, sheet)
+
+    def remap(self, reader, sheet):
+        """Rattache le stockage à une feuille d'un fichier ; les modifications en mémoire sont oubliées"""
+        self._reader = reader
+        # col -> {bloc: entrée d'index}
+        self._mapped = {int(col): {entry["start"] >> NATIVE_CHUNK_SHIFT: entry for entry in entries}
+                        for col, entries in sheet["data"].items() if entries}
+        self._blocks = {}  # (col, bloc) -> _MappedBlock
+        self._columns = {}
+        self._numeric_chunks.clear()
+        self._indexes.clear()
+        self._count = sum(entry["count"] for blocks in self._mapped.values()
+                          for entry in blocks.values())
+
+    def maps(self, path):
+        """Indique si des colonnes sont encore lues dans le fichier donné"""
+        return bool(self._mapped) and self._reader.path == os.path.abspath(path)
+
+    def detach(self):
+        """Copie en mémoire toutes les colonnes encore projetées et libère le fichier"""
+        for col in list(self._mapped):
+            self._fault(col)
+        self._reader = None
+
+    def mapped_blocks(self, col):
+        """Renvoie [(entrée, contenu stocké)] d'une colonne non modifiée, sinon None"""
+        blocks = self._mapped.get(col)
+        if blocks is None:
+            return None
+        return [(entry, self._reader.raw(entry)) for _, entry in sorted(blocks.items())]
+
+    def _block(self, col, chunk):
+        key = (col, chunk)
+        block = self._blocks.get(key)
+        if block is None:
+            entry = self._mapped[col].get(chunk)
+            if entry is None:
+                return None
+            block = self._blocks[key] = _MappedBlock(self._reader.block(entry), entry["count"])
+        return block
+
+    def _fault(self, col):
+        """Copie une colonne projetée dans le stockage creux avant une modification"""
+        blocks = self._mapped.get(col)
+        if blocks is None:
+            return
+        # Les blocs numériques sont construits tant que la colonne est projetée
+        # (vectorisé) : une saisie n'invalidera ensuite que le sien
+        step = 1 << (NATIVE_CHUNK_SHIFT - CHUNK_SHIFT)
+        self._build_chunks(col, [chunk for block in blocks
+                                 for chunk in range(block * step, (block + 1) * step)
+                                 if (col, chunk) not in self._numeric_chunks])
+        # La colonne est complète avant d'être retirée du fichier projeté
+        column = {}
+        for entry in blocks.values():
+            rows, values = decode_cells(self._reader.block(entry), entry["count"])
+            base = entry["start"]
+            column.update(zip((base + row for row in rows), values))
+        self._columns[col] = column
+        del self._mapped[col]
+        for chunk in blocks:
+            self._blocks.pop((col, chunk), None)
+
+    # Lecture
+
+    def get(self, row, col, default=None):
+        if col not in self._mapped:
+            return super().get(row, col, default)
+        block = self._block(col, row >> NATIVE_CHUNK_SHIFT)
+        if block is None:
+            return default
+        position = block.position(row & ((1 << NATIVE_CHUNK_SHIFT) - 1))
+        return default if position < 0 else block.value(position)
+
+    def column(self, col):
+        self._fault(col)
+        return super().column(col)
+
+    def column_items(self, col):
+        if col not in self._mapped:
+            return super().column_items(col)
+        return self._iter_mapped(col)
+
+    def column_cells(self, col):
+        if col not in self._mapped:
+            return super().column_cells(col)
+        rows = []
+        values = []
+        for chunk in sorted(self._mapped[col]):
+            entry = self._mapped[col][chunk]
+            block_rows, block_values = decode_cells(self._reader.block(entry), entry["count"])
+            rows.append(np.asarray(block_rows, dtype=np.int64) + entry["start"])
+            values.extend(block_values)
+        return np.concatenate(rows), values
+
+    def _iter_mapped(self, col):
+        for chunk in sorted(self._mapped[col]):
+            entry = self._mapped[col][chunk]
+            rows, values = decode_cells(self._reader.block(entry), entry["count"])
+            base = entry["start"]
+            yield from zip((base + row for row in rows), values)
+
+    def columns(self):
+        return sorted(set(self._columns) | set(self._mapped))
+
+    def items(self):
+        yield from super().items()
+        for col in list(self._mapped):
+            for row, value in self._iter_mapped(col):
+                yield row, col, value
+
+    def extent(self):
+        rows, columns = super().extent()
+        for col, blocks in self._mapped.items():
+            last = max(blocks)
+            block = self._block(col, last)
+            rows = max(rows, (last << NATIVE_CHUNK_SHIFT) + block.rows[block.count - 1] + 1)
+            columns = max(columns, col + 1)
+        return rows, columns
+
+    def snapshot(self):
+        self.detach()
+        return super().snapshot()
+
+    def _build_chunks(self, col, chunks):
+        if col not in self._mapped:
+            return super()._build_chunks(col, chunks)
+        # Les blocs natifs contiennent les blocs numériques : tout est vectorisé
+        for chunk in chunks:
+            top = chunk << CHUNK_SHIFT
+            array = None
+            has_error = False
+            block = self._block(col, top >> NATIVE_CHUNK_SHIFT)
+            if block is not None:
+                rows, tags, numbers = block.arrays()
+                offset = top & ((1 << NATIVE_CHUNK_SHIFT) - 1)
+                first, last = rows.searchsorted(np.array([offset, offset + CHUNK_ROWS], dtype=np.int32))
+                if last > first:
+                    chunk_tags = tags[first:last]
+                    numeric = (chunk_tags == _NUMBER) | (chunk_tags == _INTEGER)
+                    if numeric.any():
+                        array = np.full(CHUNK_ROWS, np.nan)
+                        array[rows[first:last][numeric] - offset] = numbers[first:last][numeric]
+                    has_error = bool((chunk_tags == _ERROR).any())
+            self._numeric_chunks[(col, chunk)] = (array, has_error)
+
+    def _first_error(self, col, top, bottom):
+        if col not in self._mapped:
+            return super()._first_error(col, top, bottom)
+        for row in range(top, bottom + 1):
+            value = self.get(row, col)
+            if isinstance(value, ErrorValue):
+                return value
+        return None
+
+    # Écriture : la colonne concernée quitte le fichier projeté
+
+    def set(self, row, col, value):
+        self._fault(col)
+        super().set(row, col, value)
+
+    def set_block(self, top, left, values):
+        width = max((len(row_values) for row_values in values), default=0)
+        for col in range(left, left + width):
+            self._fault(col)
+        super().set_block(top, left, values)
+
+    def update_column(self, col, cells):
+        self._fault(col)
+        super().update_column(col, cells)
+
+    def clear(self):
+        self._mapped.clear()
+        self._blocks.clear()
+        super().clear()
+
+    def restore(self, columns):
+        self._mapped.clear()
+        self._blocks.clear()
+        super().restore(columns)
+
+    def resident_count(self):
+        return sum(len(column) for column in self._columns.values())
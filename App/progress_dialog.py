@@ -0,0 +1,26 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication, QMessageBox, QProgressDialog
+
+
+def run_with_progress(parent, title, label, task):
+    """Exécute task(progress) avec une fenêtre de progression annulable.
+
+    `progress(fraction)` renvoie False une fois l'opération annulée ; une
+    exception de la tâche est affichée dans une boîte `title` et donne False.
+    """
+    dialog = QProgressDialog(label, "Annuler", 0, 1000, parent)
+    dialog.setWindowModality(Qt.WindowModality.WindowModal)
+    dialog.setMinimumDuration(300)
+
+    def progress(fraction):
+        dialog.setValue(int(fraction * 1000))
+        QApplication.processEvents()
+        return not dialog.wasCanceled()
+
+    try:
+        return task(progress)
+    except Exception as error:
+        QMessageBox.critical(parent, title, f"{label.rstrip('.')} impossible :\n{error}")
+        return False
+    finally:
+        dialog.close()
@@ -0,0 +1,104 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class RecalcSignals(QObject):
+    """Signaux émis par un recalcul depuis le thread de travail"""
+    batch_ready = pyqtSignal(list)  # cellules recalculées
+    progress = pyqtSignal(int, int)  # cellules traitées, total
+    finished = pyqtSignal(list)  # cellules restantes si le calcul a été annulé
+
+
+class RecalcJob(QRunnable):
+    """Recalcule un sous-graphe de formules hors du thread de l'interface"""
+
+    BATCH_SIZE = 2000
+
+    def __init__(self, engine, roots):
+        super().__init__()
+        self.setAutoDelete(False)  # Le planificateur garde la référence
+        self.engine = engine
+        self.roots = roots
+        self.signals = RecalcSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        # La planification relâche le verrou du moteur par étapes ; annulée,
+        # elle laisse toutes les cellules de départ à replanifier
+        plan = self.engine.plan(self.roots, cancelled=lambda: self._cancelled)
+        if plan is None:
+            self.signals.finished.emit(list(self.roots))
+            return
+        order, cyclic = plan
+        total = len(order) + len(cyclic)
+        for start in range(0, len(order), self.BATCH_SIZE):
+            if self._cancelled:
+                self.signals.finished.emit(order[start:])
+                return
+            # Le verrou du moteur n'est tenu que le temps d'un lot
+            batch = order[start:start + self.BATCH_SIZE]
+            self.engine.evaluate(batch)
+            self.signals.batch_ready.emit(batch)
+            self.signals.progress.emit(start + len(batch), total)
+        if cyclic:
+            self.engine.mark_cyclic(cyclic)
+            self.signals.batch_ready.emit(cyclic)
+            self.signals.progress.emit(total, total)
+        self.signals.finished.emit([])
+
+
+class RecalcScheduler(QObject):
+    """Planifie les recalculs d'une feuille sur le QThreadPool.
+
+    Une nouvelle saisie annule le calcul en cours : les cellules qui n'ont pas
+    encore été évaluées sont replanifiées avec la nouvelle saisie.
+    """
+
+    batch_ready = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    idle = pyqtSignal()
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self._pool = QThreadPool.globalInstance()
+        self._pending = set()
+        self._job = None
+        self._stopped = False
+
+    def is_running(self):
+        return self._job is not None
+
+    def submit(self, cells):
+        """Demande le recalcul des cellules données et de leurs dépendants"""
+        self._pending.update(cells)
+        self._stopped = False
+        if self._job is not None:
+            self._job.cancel()
+        else:
+            self._start()
+
+    def cancel(self):
+        """Arrête le calcul ; le reste sera recalculé à la prochaine saisie"""
+        if self._job is not None:
+            self._stopped = True
+            self._job.cancel()
+
+    def _start(self):
+        job = RecalcJob(self.engine, list(self._pending))
+        self._pending.clear()
+        job.signals.batch_ready.connect(self.batch_ready)
+        job.signals.progress.connect(self.progress)
+        job.signals.finished.connect(self._job_finished)
+        self._job = job
+        self._pool.start(job)
+
+    def _job_finished(self, remaining):
+        self._job = None
+        self._pending.update(remaining)
+        if self._pending and not self._stopped:
+            self._start()
+        else:
+            self.idle.emit()
@@ -0,0 +1,178 @@
+import numpy as np
+from PyQt6.QtCore import Qt, QItemSelection, QItemSelectionModel
+from PyQt6.QtWidgets import QApplication, QInputDialog, QMessageBox
+from sheet_model import RowMappingProxyModel
+from sheet_clipboard import copy_range, paste, clear_range, selected_rows
+from sheet_index import find_cells, replace_all, filter_rows, parse_criterion
+from sheet_sort import sort_rows, parse_sort_keys, format_sort_keys
+
+
+class SheetActions:
+    """Actions d'édition communes aux fenêtres de tableur (mixin de QMainWindow).
+
+    La fenêtre fournit `tab_widget` (une table par onglet, avec `sort_keys`),
+    `status_bar`, `search_text` et _current_sheet() ; elle peut redéfinir
+    _set_view_model() pour réagir au changement de modèle d'une table.
+    """
+
+    def _current_sheet(self):
+        """Modèle de la feuille affichée"""
+        raise NotImplementedError
+
+    def _set_view_model(self, table, model):
+        """Affiche un modèle (feuille ou vue filtrée) dans une table"""
+        table.setModel(model)
+
+    def _source_index(self, table, index):
+        """Indice dans la feuille d'un indice de la table, qui peut être filtrée ou triée"""
+        model = table.model()
+        if isinstance(model, RowMappingProxyModel) and index.isValid():
+            return model.mapToSource(index)
+        return index
+
+    def _copy(self):
+        """Copie la sélection (texte et HTML produits seulement à la demande)"""
+        selection = selected_rows(self.tab_widget.currentWidget())
+        if selection is not None:
+            QApplication.clipboard().setMimeData(copy_range(self._current_sheet(), *selection))
+        return selection
+
+    def _cut(self):
+        """Coupe la sélection"""
+        selection = self._copy()
+        if selection is not None:
+            clear_range(self._current_sheet(), *selection)
+
+    def _paste(self):
+        """Colle le presse-papiers à partir de la cellule courante"""
+        model = self._current_sheet()
+        table = self.tab_widget.currentWidget()
+        index = self._source_index(table, table.currentIndex())
+        if not index.isValid():
+            return
+        size = paste(model, index.row(), index.column(), QApplication.clipboard().mimeData())
+        if size is not None and table.model() is model:
+            # La zone collée devient la sélection
+            table.selectionModel().select(
+                QItemSelection(model.index(index.row(), index.column()),
+                               model.index(index.row() + size[0] - 1, index.column() + size[1] - 1)),
+                QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+    def _find(self):
+        """Sélectionne la prochaine cellule contenant le texte recherché"""
+        model = self._current_sheet()
+        table = self.tab_widget.currentWidget()
+        text, ok = QInputDialog.getText(self, "Rechercher", "Rechercher :", text=self.search_text)
+        if not ok or not text:
+            return
+        self.search_text = text
+        rows, cols = find_cells(model, text)
+        view_model = table.model()
+        if isinstance(view_model, RowMappingProxyModel) and len(rows):
+            # Les lignes masquées par le filtre sont ignorées
+            visible = np.isin(rows, view_model.rows)
+            rows, cols = rows[visible], cols[visible]
+        if not len(rows):
+            self.status_bar.showMessage(f"« {text} » introuvable", 3000)
+            return
+        # Première occurrence après la cellule courante, en reprenant au début
+        current = self._source_index(table, table.currentIndex())
+        row, col = (current.row(), current.column()) if current.isValid() else (-1, -1)
+        after = np.flatnonzero((rows > row) | ((rows == row) & (cols > col)))
+        position = int(after[0]) if len(after) else 0
+        index = model.index(int(rows[position]), int(cols[position]))
+        if isinstance(view_model, RowMappingProxyModel):
+            index = view_model.mapFromSource(index)
+        table.setCurrentIndex(index)
+        table.scrollTo(index)
+        self.status_bar.showMessage(f"Occurrence {position + 1} sur {len(rows)}", 3000)
+
+    def _replace(self):
+        """Remplace le texte recherché dans toute la feuille (une seule annulation)"""
+        text, ok = QInputDialog.getText(self, "Remplacer", "Rechercher :", text=self.search_text)
+        if not ok or not text:
+            return
+        replacement, ok = QInputDialog.getText(self, "Remplacer", f"Remplacer « {text} » par :")
+        if not ok:
+            return
+        self.search_text = text
+        count = replace_all(self._current_sheet(), text, replacement)
+        self.status_bar.showMessage(f"{count} cellule(s) remplacée(s)", 3000)
+
+    def _filter(self):
+        """Filtre les lignes selon la colonne de la cellule courante"""
+        model = self._current_sheet()
+        table = self.tab_widget.currentWidget()
+        index = self._source_index(table, table.currentIndex())
+        if not index.isValid():
+            return
+        value = model.data(index)
+        text, ok = QInputDialog.getText(
+            self, "Filtrer", f"Colonne {model.headerData(index.column(), Qt.Orientation.Horizontal)} "
+            "(valeur, a..b, >=a, <=b, *texte*) :", text="" if value is None else str(value))
+        if not ok or not text.strip():
+            return
+        rows = filter_rows(model, index.column(), parse_criterion(text))
+        view_model = table.model()
+        if isinstance(view_model, RowMappingProxyModel):
+            # Les filtres successifs se cumulent, dans l'ordre déjà affiché
+            rows = view_model.rows[np.isin(view_model.rows, rows)]
+        self._show_rows(table, rows)
+        self.status_bar.showMessage(f"{table.model().rowCount()} ligne(s) affichée(s)", 3000)
+
+    def _clear_filter(self):
+        """Réaffiche toutes les lignes de la feuille (le tri éventuel est conservé)"""
+        table = self.tab_widget.currentWidget()
+        view_model = table.model() if table is not None else None
+        if not isinstance(view_model, RowMappingProxyModel):
+            return
+        if table.sort_keys:
+            view_model.set_rows(sort_rows(self._current_sheet(), table.sort_keys))
+        else:
+            self._show_rows(table, None)
+
+    def _show_rows(self, table, rows):
+        """Affiche des lignes de la feuille dans l'ordre donné (None : toutes, dans l'ordre)"""
+        model = self._current_sheet()
+        view_model = table.model()
+        if not isinstance(view_model, RowMappingProxyModel):
+            if rows is not None:
+                self._set_view_model(table, RowMappingProxyModel(model, rows, table))
+        elif rows is None:
+            self._set_view_model(table, model)
+            view_model.deleteLater()
+        else:
+            view_model.set_rows(rows)
+
+    def _sort(self):
+        """Trie l'affichage selon une ou plusieurs colonnes, sans déplacer les cellules"""
+        table = self.tab_widget.currentWidget()
+        index = self._source_index(table, table.currentIndex())
+        default = format_sort_keys(table.sort_keys or [(max(index.column(), 0), True)])
+        text, ok = QInputDialog.getText(
+            self, "Trier", "Colonnes par priorité, « - » pour décroissant (ex. B, -A) :", text=default)
+        if not ok:
+            return
+        try:
+            keys = parse_sort_keys(text)
+        except ValueError as error:
+            QMessageBox.warning(self, "Trier", str(error))
+            return
+        if not keys:
+            self._clear_sort()
+            return
+        view_model = table.model()
+        # Un filtre actif est conservé : seules ses lignes sont triées
+        rows = view_model.rows if isinstance(view_model, RowMappingProxyModel) else None
+        table.sort_keys = keys
+        self._show_rows(table, sort_rows(self._current_sheet(), keys, rows))
+        self.status_bar.showMessage(f"Tri : {format_sort_keys(keys)}", 3000)
+
+    def _clear_sort(self):
+        """Rétablit l'ordre des lignes de la feuille"""
+        table = self.tab_widget.currentWidget()
+        if table is None or not table.sort_keys:
+            return
+        table.sort_keys = []
+        rows = np.sort(table.model().rows)
+        self._show_rows(table, None if len(rows) == self._current_sheet().rowCount() else rows)
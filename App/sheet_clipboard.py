@@ -0,0 +1,193 @@
+import csv
+import html
+import io
+import json
+from PyQt6.QtCore import QMimeData, QByteArray, QAbstractProxyModel
+from formula_engine import translate_formula
+
+# Format interne : contenu brut (formules comprises) d'une plage copiée
+INTERNAL_MIME = "application/x-nexussheet-range"
+TEXT_MIME = "text/plain"
+HTML_MIME = "text/html"
+
+
+def _display(value):
+    """Texte affiché d'une valeur, comme dans la grille"""
+    if value is None:
+        return ""
+    if value.__class__ is float and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class RangeSnapshot:
+    """Contenu d'une plage au moment de la copie.
+
+    Les valeurs sont gardées telles quelles (liste de lignes) : un collage dans
+    le même processus les écrit directement, sans passer par du texte.
+    `rows` est un range pour une plage continue, sinon la liste des lignes
+    source copiées (vue filtrée ou triée), dans l'ordre d'affichage.
+    """
+
+    def __init__(self, model, rows, left, right):
+        self.rows = rows
+        self.top = rows[0]
+        self.left = left
+        columns = [model.store.column(col) for col in range(left, right + 1)]
+        self.values = [[column.get(row) for column in columns] for row in rows]
+        # Formules par position relative : elles seront décalées au collage
+        self.formulas = {}
+        if model.engine is not None and model.engine.has_formulas():
+            positions = {row: r for r, row in enumerate(rows)}
+            self.formulas = {(positions[row], col - left): text for (row, col), text in
+                             model.engine.formulas_in(min(rows), left, max(rows), right).items()
+                             if row in positions}
+
+    def block(self, row, col):
+        """Renvoie le bloc à écrire en (row, col), formules décalées"""
+        if not self.formulas:
+            return self.values
+        # Seules les lignes contenant des formules sont copiées
+        values = list(self.values)
+        for (r, c), text in self.formulas.items():
+            if values[r] is self.values[r]:
+                values[r] = list(values[r])
+            values[r][c] = translate_formula(text, row + r - self.rows[r], col - self.left)
+        return values
+
+
+class SheetMimeData(QMimeData):
+    """Données du presse-papiers produites à la demande.
+
+    Le texte (TSV) et le HTML ne sont générés que si une application les
+    demande, ligne par ligne dans un tampon d'octets.
+    """
+
+    def __init__(self, snapshot):
+        super().__init__()
+        self.snapshot = snapshot
+
+    def formats(self):
+        return [INTERNAL_MIME, TEXT_MIME, HTML_MIME]
+
+    def hasFormat(self, mime_type):
+        return mime_type in (INTERNAL_MIME, TEXT_MIME, HTML_MIME)
+
+    def retrieveData(self, mime_type, preferred_type):
+        if mime_type == TEXT_MIME:
+            return self._render_tsv()
+        if mime_type == HTML_MIME:
+            return self._render_html()
+        if mime_type == INTERNAL_MIME:
+            return self._render_internal()
+        return super().retrieveData(mime_type, preferred_type)
+
+    def _render_tsv(self):
+        buffer = io.BytesIO()
+        text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+        writer = csv.writer(text, delimiter="\t", lineterminator="\n")
+        for row_values in self.snapshot.values:
+            writer.writerow([_display(value) for value in row_values])
+        text.flush()
+        return QByteArray(buffer.getvalue())
+
+    def _render_html(self):
+        buffer = io.BytesIO()
+        text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+        text.write("<table>")
+        for row_values in self.snapshot.values:
+            text.write("<tr>")
+            text.write("".join(f"<td>{html.escape(_display(value))}</td>" for value in row_values))
+            text.write("</tr>")
+        text.write("</table>")
+        text.flush()
+        return QByteArray(buffer.getvalue())
+
+    def _render_internal(self):
+        # Pour une autre instance de l'application : JSON, jamais de pickle
+        snapshot = self.snapshot
+        content = {"origin": [snapshot.top, snapshot.left],
+                   "values": [[value if value is None or isinstance(value, (int, float)) else str(value)
+                               for value in row_values] for row_values in snapshot.values],
+                   "formulas": [[r, c, text] for (r, c), text in snapshot.formulas.items()]}
+        if not isinstance(snapshot.rows, range):
+            content["rows"] = list(snapshot.rows)
+        return QByteArray(json.dumps(content).encode("utf-8"))
+
+
+def copy_range(model, rows, left, right):
+    """Renvoie les données de presse-papiers des lignes `rows` entre les colonnes left et right"""
+    return SheetMimeData(RangeSnapshot(model, rows, left, right))
+
+
+def _external_block(mime, row, col):
+    """Bloc à coller depuis un presse-papiers venu d'un autre processus"""
+    if mime.hasFormat(INTERNAL_MIME):
+        content = json.loads(bytes(mime.data(INTERNAL_MIME)).decode("utf-8"))
+        values = content["values"]
+        top, left = content["origin"]
+        rows = content.get("rows")
+        for r, c, text in content["formulas"]:
+            origin = rows[r] if rows is not None else top + r
+            values[r][c] = translate_formula(text, row + r - origin, col - left)
+        return values
+    if mime.hasText():
+        text = mime.text()
+        if text.endswith("\n"):
+            text = text[:-1]
+        return list(csv.reader(io.StringIO(text), delimiter="\t"))
+    return None
+
+
+def paste(model, row, col, mime):
+    """Colle le presse-papiers en (row, col) ; renvoie (hauteur, largeur) ou None.
+
+    Une copie faite dans ce processus est écrite directement depuis son
+    instantané ; sinon le format interne puis le texte sont décodés. Le bloc
+    passe dans tous les cas par model.set_block (une seule opération).
+    """
+    if isinstance(mime, SheetMimeData):
+        block = mime.snapshot.block(row, col)
+    else:
+        block = _external_block(mime, row, col)
+    if not block:
+        return None
+    model.set_block(row, col, block)
+    return len(block), max(len(row_values) for row_values in block)
+
+
+def clear_range(model, rows, left, right):
+    """Vide les lignes `rows` entre les colonnes left et right en une seule opération (couper)"""
+    if isinstance(rows, range):
+        empty = [None] * (right - left + 1)
+        model.set_block(rows.start, left, [empty] * len(rows))
+    else:
+        # Lignes éparses : seules les cellules copiées sont vidées
+        model.set_cells((row, col, None) for row in rows for col in range(left, right + 1))
+
+
+def selected_rows(view):
+    """Renvoie (lignes source, left, right) de la sélection d'une vue, ou None.
+
+    Les lignes forment un range dans une vue directe. Dans une vue filtrée ou
+    triée, ce sont les lignes source des seules lignes sélectionnées, dans
+    l'ordre d'affichage : les lignes masquées n'en font jamais partie.
+    """
+    selection_model = view.selectionModel()
+    if selection_model is None:
+        return None
+    ranges = selection_model.selection()
+    if ranges.isEmpty():
+        index = view.currentIndex()
+        if not index.isValid():
+            return None
+        spans = [(index.row(), index.row())]
+        left = right = index.column()
+    else:
+        spans = [(item.top(), item.bottom()) for item in ranges]
+        left, right = min(item.left() for item in ranges), max(item.right() for item in ranges)
+    model = view.model()
+    if isinstance(model, QAbstractProxyModel):
+        view_rows = sorted({row for top, bottom in spans for row in range(top, bottom + 1)})
+        return [model.mapToSource(model.index(row, left)).row() for row in view_rows], left, right
+    return range(min(top for top, _ in spans), max(bottom for _, bottom in spans) + 1), left, right
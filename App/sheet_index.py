@@ -0,0 +1,311 @@
+import re
+import numpy as np
+from native_format import sheet_lock
+
+# En dessous de ce nombre de valeurs distinctes, une recherche de sous-chaîne
+# parcourt directement les clés plutôt que le texte concaténé
+JOINED_MIN_KEYS = 20_000
+
+# Valeurs nouvelles tolérées hors du texte concaténé avant sa reconstruction
+JOINED_STALE_KEYS = 1024
+
+# Modifications accumulées depuis la construction du tableau trié au-delà
+# desquelles il est reconstruit (en proportion de sa taille, avec un minimum)
+SORTED_REBUILD_MIN = 1024
+SORTED_REBUILD_RATIO = 16
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+def _key(value):
+    """Clé d'index d'une valeur : texte sans casse, ou nombre tel quel"""
+    if isinstance(value, str):
+        return value.casefold()
+    return value
+
+
+def _is_number(key):
+    """Vrai pour les clés rangées dans le tableau trié des nombres"""
+    return isinstance(key, (int, float, np.number))
+
+
+def _text(key):
+    """Texte affiché d'une clé, tel que recherché par sous-chaîne"""
+    if key.__class__ is float and key.is_integer():
+        return str(int(key))
+    return key if isinstance(key, str) else str(key)
+
+
+def _as_rows(rows):
+    """Tableau trié (int64) d'un ensemble de lignes"""
+    if not rows:
+        return _NO_ROWS
+    array = np.fromiter(rows, dtype=np.int64, count=len(rows))
+    array.sort()
+    return array
+
+
+class ColumnIndex:
+    """Index des valeurs d'une colonne, tenu à jour à chaque écriture.
+
+    - hachage valeur -> lignes pour l'égalité (textes comparés sans casse) ;
+    - tableau NumPy trié des nombres (ni textes ni dates) pour les
+      intervalles, construit à la demande ; les écritures suivantes sont
+      notées à part et fusionnées à la requête jusqu'à la prochaine
+      reconstruction ;
+    - pour les sous-chaînes, textes des valeurs distinctes concaténés en une
+      seule chaîne parcourue par str.find (vitesse de memchr), seulement sur
+      les colonnes à beaucoup de valeurs distinctes.
+
+    Les requêtes renvoient des tableaux triés de numéros de ligne.
+    """
+
+    def __init__(self, cells):
+        # clé -> ligne, ou ensemble de lignes si la valeur se répète
+        self._exact = {}
+        self._sorted = None  # (valeurs triées, lignes correspondantes)
+        self._added = {}  # ligne -> nombre écrit depuis la construction du tableau
+        self._removed = set()  # lignes dont l'entrée du tableau n'est plus valable
+        self._joined = None  # (texte concaténé, débuts des clés, clés)
+        self._fresh = []  # clés apparues depuis la construction du texte concaténé
+        # Construction en une passe, sans appel de méthode par cellule
+        exact = self._exact
+        for row, value in cells:
+            key = value.casefold() if isinstance(value, str) else value
+            rows = exact.get(key)
+            if rows is None:
+                exact[key] = row
+            elif rows.__class__ is set:
+                rows.add(row)
+            else:
+                exact[key] = {rows, row}
+
+    def __len__(self):
+        return len(self._exact)
+
+    def _add(self, key, row):
+        rows = self._exact.get(key)
+        if rows is None:
+            self._exact[key] = row
+            if self._joined is not None:
+                self._fresh.append(key)
+                if len(self._fresh) > JOINED_STALE_KEYS:
+                    self._joined = None
+        elif rows.__class__ is set:
+            rows.add(row)
+        else:
+            self._exact[key] = {rows, row}
+
+    def _discard(self, key, row):
+        rows = self._exact.get(key)
+        if rows.__class__ is set:
+            rows.discard(row)
+            if len(rows) == 1:
+                self._exact[key] = rows.pop()
+        elif rows == row:
+            # La clé reste dans le texte concaténé : elle est vérifiée à la requête
+            del self._exact[key]
+
+    def update(self, row, old, new):
+        """Reporte le remplacement de `old` par `new` (None : cellule vide) en `row`"""
+        if old is not None:
+            self._discard(_key(old), row)
+        if new is not None:
+            self._add(_key(new), row)
+        if self._sorted is None:
+            return
+        self._added.pop(row, None)
+        self._removed.add(row)
+        if _is_number(new):
+            self._added[row] = new
+        if len(self._removed) > max(SORTED_REBUILD_MIN, len(self._sorted[0]) // SORTED_REBUILD_RATIO):
+            self._sorted = None
+
+    def rows_of(self, keys):
+        """Lignes (tableau trié) portant l'une des clés données"""
+        rows = set()
+        for key in keys:
+            found = self._exact[key]
+            if found.__class__ is set:
+                rows.update(found)
+            else:
+                rows.add(found)
+        return _as_rows(rows)
+
+    def equal(self, value):
+        """Lignes dont la valeur est égale à `value` (texte sans casse)"""
+        key = _key(value)
+        if key not in self._exact:
+            return _NO_ROWS
+        return self.rows_of([key])
+
+    def between(self, low=None, high=None):
+        """Lignes dont la valeur numérique est dans [low, high] (bornes None : ouvertes)"""
+        if self._sorted is None:
+            self._build_sorted()
+        values, rows = self._sorted
+        start = 0 if low is None else values.searchsorted(low, "left")
+        stop = len(values) if high is None else values.searchsorted(high, "right")
+        result = rows[start:stop]
+        if self._removed:
+            stale = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+            result = result[~np.isin(result, stale)]
+        extra = [row for row, value in self._added.items()
+                 if (low is None or value >= low) and (high is None or value <= high)]
+        if extra:
+            result = np.concatenate([result, np.array(extra, dtype=np.int64)])
+        return np.sort(result)
+
+    def _build_sorted(self):
+        rows = []
+        values = []
+        # Valeurs répétées : une conversion NumPy par valeur plutôt que par ligne
+        repeated_rows = []
+        repeated_values = []
+        for key, found in self._exact.items():
+            # Textes, dates... : trouvés par égalité ou sous-chaîne seulement
+            if not _is_number(key):
+                continue
+            if found.__class__ is set:
+                repeated_rows.append(np.fromiter(found, dtype=np.int64, count=len(found)))
+                repeated_values.append(np.full(len(found), key, dtype=np.float64))
+            else:
+                rows.append(found)
+                values.append(key)
+        values = np.concatenate([np.array(values, dtype=np.float64), *repeated_values])
+        rows = np.concatenate([np.array(rows, dtype=np.int64), *repeated_rows])
+        order = values.argsort(kind="stable")
+        self._sorted = (values[order], rows[order])
+        self._added.clear()
+        self._removed.clear()
+
+    def matching_keys(self, text):
+        """Valeurs distinctes (clés) dont le texte affiché contient `text`, sans casse"""
+        needle = text.casefold()
+        if len(self._exact) < JOINED_MIN_KEYS or "\n" in needle:
+            return [key for key in self._exact if needle in _text(key)]
+        if self._joined is None:
+            keys = list(self._exact)
+            texts = [_text(key) for key in keys]
+            starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+            self._joined = ("\n".join(texts), starts, keys)
+            self._fresh = []
+        joined, starts, keys = self._joined
+        found = []
+        position = joined.find(needle)
+        while position >= 0:
+            key = int(starts.searchsorted(position, "right")) - 1
+            found.append(keys[key])
+            # Une seule occurrence par clé : reprise au début de la suivante
+            if key + 1 == len(keys):
+                break
+            position = joined.find(needle, int(starts[key + 1]))
+        found = [key for key in found if key in self._exact]
+        found.extend(key for key in self._fresh if key in self._exact and needle in _text(key))
+        return found
+
+    def contains(self, text):
+        """Lignes dont le texte affiché contient `text`, sans casse"""
+        return self.rows_of(self.matching_keys(text))
+
+
+def column_index(store, col):
+    """Renvoie l'index d'une colonne, construit et attaché au stockage si besoin"""
+    index = store.index(col)
+    if index is None:
+        index = ColumnIndex(store.column_items(col))
+        store.attach_index(col, index)
+    return index
+
+
+def _number(text):
+    """Nombre saisi (virgule décimale acceptée), ou None"""
+    try:
+        return float(text.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _entered(text):
+    """Valeur d'une saisie comparée aux cellules : nombre si possible, sinon texte"""
+    number = _number(text)
+    return text if number is None else number
+
+
+def parse_criterion(text):
+    """Interprète un critère de filtre saisi : renvoie (type, opérande).
+
+    "a..b" : intervalle ; ">=a" / "<=b" : borne ; "*texte*" : contient ;
+    sinon égalité (nombre si la saisie en est un).
+    """
+    text = text.strip()
+    if text.startswith("*") and text.endswith("*") and len(text) > 2:
+        return "contains", text[1:-1]
+    if ".." in text:
+        low, high = (part.strip() for part in text.split("..", 1))
+        bounds = (_number(low) if low else None, _number(high) if high else None)
+        if (not low or bounds[0] is not None) and (not high or bounds[1] is not None):
+            return "between", bounds
+    if text[:2] in (">=", "<=") and _number(text[2:]) is not None:
+        bound = _number(text[2:])
+        return "between", (bound, None) if text[0] == ">" else (None, bound)
+    return "equal", _entered(text)
+
+
+def filter_rows(model, col, criterion):
+    """Lignes (tableau trié) de la colonne `col` qui satisfont un critère (voir parse_criterion)"""
+    kind, operand = criterion
+    with sheet_lock(model):
+        index = column_index(model.store, col)
+        if kind == "contains":
+            return index.contains(operand)
+        if kind == "between":
+            return index.between(*operand)
+        return index.equal(operand)
+
+
+def find_cells(model, text, whole_cell=False):
+    """Cellules dont le texte contient (ou vaut) `text`, triées par ligne puis colonne.
+
+    Renvoie deux tableaux (lignes, colonnes).
+    """
+    found_rows = []
+    found_cols = []
+    with sheet_lock(model):
+        for col in model.store.columns():
+            index = column_index(model.store, col)
+            rows = index.equal(_entered(text)) if whole_cell else index.contains(text)
+            found_rows.append(rows)
+            found_cols.append(np.full(len(rows), col, dtype=np.int64))
+    if not found_rows:
+        return _NO_ROWS, _NO_ROWS
+    rows = np.concatenate(found_rows)
+    cols = np.concatenate(found_cols)
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order]
+
+
+def replace_all(model, text, replacement, whole_cell=False):
+    """Remplace `text` (sans casse) dans toutes les cellules ; renvoie le nombre de cellules.
+
+    Les formules ne sont pas modifiées. Le remplacement forme une seule
+    opération de l'historique d'annulation.
+    """
+    pattern = re.compile(re.escape(text), re.IGNORECASE)
+    entries = []
+    with sheet_lock(model):
+        engine = model.engine
+        for col in model.store.columns():
+            index = column_index(model.store, col)
+            rows = index.equal(_entered(text)) if whole_cell else index.contains(text)
+            for row in rows.tolist():
+                if engine is not None and engine.formula_text(row, col) is not None:
+                    continue
+                if whole_cell:
+                    entries.append((row, col, replacement))
+                else:
+                    entries.append((row, col, pattern.sub(lambda _: replacement,
+                                                          _text(model.store.get(row, col)))))
+    if entries:
+        model.set_cells(entries)
+    return len(entries)
@@ -0,0 +1,399 @@
+from contextlib import contextmanager
+import numpy as np
+from PyQt6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex
+from sheet_store import (SparseCellStore, column_letter,
+                         DEFAULT_ROW_COUNT, DEFAULT_COLUMN_COUNT)
+from undo_journal import RangeEdit, CellsEdit
+
+
+# Constantes précalculées : data() et flags() sont appelés pour chaque cellule peinte
+DISPLAY_ROLE = Qt.ItemDataRole.DisplayRole
+EDIT_ROLE = Qt.ItemDataRole.EditRole
+CELL_FLAGS = (Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled |
+              Qt.ItemFlag.ItemIsEditable)
+
+# Au-delà, les régions modifiées sont fusionnées en un seul rectangle englobant
+MAX_CHANGED_REGIONS = 64
+
+
+def changed_regions(cells):
+    """Regroupe des cellules en rectangles (top, left, bottom, right).
+
+    Les lignes contiguës d'une colonne forment des segments ; les colonnes
+    voisines qui ont les mêmes segments sont fusionnées.
+    """
+    rows_by_col = {}
+    for row, col in cells:
+        rows_by_col.setdefault(col, set()).add(row)
+
+    regions = []
+    open_runs = {}  # (top, bottom) -> (left, dernière colonne)
+    for col in sorted(rows_by_col):
+        rows = sorted(rows_by_col[col])
+        runs = []
+        start = previous = rows[0]
+        for row in rows[1:]:
+            if row != previous + 1:
+                runs.append((start, previous))
+                start = row
+            previous = row
+        runs.append((start, previous))
+
+        still_open = {}
+        for run in runs:
+            left, last = open_runs.pop(run, (col, col - 1))
+            if last != col - 1:
+                regions.append((run[0], left, run[1], last))
+                left = col
+            still_open[run] = (left, col)
+        for (top, bottom), (left, last) in open_runs.items():
+            regions.append((top, left, bottom, last))
+        open_runs = still_open
+    for (top, bottom), (left, last) in open_runs.items():
+        regions.append((top, left, bottom, last))
+    return regions
+
+
+class SparseTableModel(QAbstractTableModel):
+    """Modèle de tableur creux : seules les cellules renseignées occupent de la mémoire"""
+
+    def __init__(self, rows=DEFAULT_ROW_COUNT, columns=DEFAULT_COLUMN_COUNT,
+                 store=None, parent=None):
+        super().__init__(parent)
+        self._rows = rows
+        self._columns = columns
+        self.store = store if store is not None else SparseCellStore()
+        self.engine = None  # Moteur de formules optionnel (FormulaEngine)
+        self.scheduler = None  # Recalcul en arrière-plan optionnel (RecalcScheduler)
+        self.journal = None  # Historique d'annulation optionnel (UndoJournal)
+        self._bulk_depth = 0
+        self._bulk_cells = set()
+        self._bulk_regions = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._columns
+
+    def data(self, index, role=DISPLAY_ROLE):
+        if role == DISPLAY_ROLE:
+            value = self.store.get(index.row(), index.column())
+            if value.__class__ is float and value.is_integer():
+                return int(value)
+            return value
+        if not index.isValid():
+            return None
+        if role == EDIT_ROLE:
+            if self.engine is not None:
+                formula = self.engine.formula_text(index.row(), index.column())
+                if formula is not None:
+                    return formula
+            return self.store.get(index.row(), index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        # Les en-têtes sont calculés à la demande plutôt que stockés
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return column_letter(section)
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return CELL_FLAGS
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != EDIT_ROLE:
+            return False
+        if self.journal is not None:
+            self.journal.record(RangeEdit.capture(self, index.row(), index.column(), [[value]]))
+        if self.engine is None:
+            self.store.set(index.row(), index.column(), value)
+            self.notify_changed([(index.row(), index.column())])
+        elif self.scheduler is not None:
+            # Seule la saisie est appliquée ici ; le recalcul part en arrière-plan
+            cell = (index.row(), index.column())
+            self.notify_changed(self.engine.set_cell(*cell, value, recalculate=False))
+            self.scheduler.submit([cell])
+        else:
+            # Le moteur recalcule les cellules en aval et renvoie celles modifiées
+            self.notify_changed(self.engine.set_cell(index.row(), index.column(), value))
+        return True
+
+    def notify_changed(self, cells, regions=()):
+        """Signale des cellules modifiées : un dataChanged par région rectangulaire"""
+        if self._bulk_depth:
+            self._bulk_cells.update(cells)
+            self._bulk_regions.extend(regions)
+            return
+        regions = list(regions)
+        if cells:
+            regions.extend(changed_regions(cells))
+        if not regions:
+            return
+        if len(regions) > MAX_CHANGED_REGIONS:
+            regions = [(min(region[0] for region in regions),
+                        min(region[1] for region in regions),
+                        max(region[2] for region in regions),
+                        max(region[3] for region in regions))]
+        roles = [DISPLAY_ROLE, EDIT_ROLE]
+        for top, left, bottom, right in regions:
+            self.dataChanged.emit(self.index(top, left), self.index(bottom, right), roles)
+
+    @contextmanager
+    def bulk_update(self):
+        """Regroupe les notifications émises dans le bloc `with`"""
+        self._bulk_depth += 1
+        try:
+            yield
+        finally:
+            self._bulk_depth -= 1
+            if not self._bulk_depth:
+                cells, self._bulk_cells = self._bulk_cells, set()
+                regions, self._bulk_regions = self._bulk_regions, []
+                self.notify_changed(cells, regions)
+
+    def set_block(self, top, left, values, recalculate=True, undoable=True):
+        """Écrit un bloc 2D de valeurs (liste de lignes) en une seule opération.
+
+        Avec `recalculate=False` (chargement de fichier), les formules ne sont
+        recalculées qu'à l'appel de recalculate_all(). Le bloc entier forme une
+        seule opération de l'historique d'annulation.
+        """
+        if not values:
+            return
+        if undoable and self.journal is not None:
+            self.journal.record(RangeEdit.capture(self, top, left, values))
+        width = max(len(row_values) for row_values in values)
+        self.ensure_size(top + len(values), left + width)
+        block = (top, left, top + len(values) - 1, left + width - 1)
+        if self.engine is None:
+            self.store.set_block(top, left, values)
+            self.notify_changed((), [block])
+            return
+
+        with self.bulk_update():
+            self._bulk_regions.append(block)
+            self.engine.set_block(top, left, values)
+            if not recalculate or not self.engine.has_formulas():
+                return
+            cells = [(top + r, left + c)
+                     for r, row_values in enumerate(values) for c in range(len(row_values))]
+            if self.scheduler is not None:
+                self.scheduler.submit(cells)
+            else:
+                # Seules les cellules en aval du bloc sont à signaler en plus
+                self._bulk_cells.update(cell for cell in self.engine.recalculate(cells)
+                                        if not (block[0] <= cell[0] <= block[2] and
+                                                block[1] <= cell[1] <= block[3]))
+
+    def set_cells(self, entries, recalculate=True, undoable=True):
+        """Écrit des cellules éparses [(row, col, valeur)] en une seule opération"""
+        entries = list(entries)
+        if not entries:
+            return
+        if undoable and self.journal is not None:
+            self.journal.record(CellsEdit.capture(self, entries))
+        self.ensure_size(max(row for row, _, _ in entries) + 1,
+                         max(col for _, col, _ in entries) + 1)
+        if self.engine is None:
+            for row, col, value in entries:
+                self.store.set(row, col, value)
+            self.notify_changed([(row, col) for row, col, _ in entries])
+            return
+
+        with self.bulk_update():
+            cells = self.engine.set_cells(entries, recalculate=False)
+            self._bulk_cells.update(cells)
+            if not recalculate or not self.engine.has_formulas():
+                return
+            if self.scheduler is not None:
+                self.scheduler.submit(cells)
+            else:
+                self._bulk_cells.update(self.engine.recalculate(cells))
+
+    def undo(self):
+        """Annule la dernière opération ; renvoie False s'il n'y en a pas"""
+        edit = self.journal.undo() if self.journal is not None else None
+        if edit is None:
+            return False
+        edit.apply(self, after=False)
+        return True
+
+    def redo(self):
+        """Rétablit la dernière opération annulée ; renvoie False s'il n'y en a pas"""
+        edit = self.journal.redo() if self.journal is not None else None
+        if edit is None:
+            return False
+        edit.apply(self, after=True)
+        return True
+
+    def recalculate_all(self):
+        """Recalcule toutes les formules (après un chargement par exemple)"""
+        if self.engine is None or not self.engine.has_formulas():
+            return
+        cells = list(self.engine.formulas())
+        if self.scheduler is not None:
+            self.scheduler.submit(cells)
+        else:
+            self.notify_changed(self.engine.recalculate(cells))
+
+    @contextmanager
+    def loading(self, store=None):
+        """Remplit directement le stockage : une seule réinitialisation des vues à la fin.
+
+        Un `store` fourni (feuille projetée depuis un fichier par exemple)
+        remplace le stockage courant, y compris pour le moteur de formules.
+        """
+        self.beginResetModel()
+        if store is not None:
+            self.store = store
+            if self.engine is not None:
+                self.engine.clear()
+                self.engine.store = store
+        try:
+            yield self.store
+        finally:
+            self.endResetModel()
+
+    def value(self, row, col):
+        """Renvoie la valeur brute d'une cellule"""
+        return self.store.get(row, col)
+
+    def set_value(self, row, col, value):
+        """Écrit une valeur en agrandissant la feuille si nécessaire"""
+        self.ensure_size(row + 1, col + 1)
+        self.setData(self.index(row, col), value)
+
+    def ensure_size(self, rows, columns):
+        """Agrandit les dimensions logiques de la feuille"""
+        if rows > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, rows - 1)
+            self._rows = rows
+            self.endInsertRows()
+        if columns > self._columns:
+            self.beginInsertColumns(QModelIndex(), self._columns, columns - 1)
+            self._columns = columns
+            self.endInsertColumns()
+
+    def clear(self):
+        """Vide toutes les cellules"""
+        self.beginResetModel()
+        self.store.clear()
+        if self.engine is not None:
+            self.engine.clear()
+        self.endResetModel()
+
+
+class RowMappingProxyModel(QAbstractProxyModel):
+    """Vue d'un modèle de feuille restreinte à certaines lignes, dans un ordre donné.
+
+    `rows` est un tableau NumPy des lignes source affichées (résultat d'un
+    filtre ou permutation d'un tri) : aucune cellule n'est copiée, chaque
+    accès est redirigé vers la ligne source correspondante.
+    """
+
+    def __init__(self, source, rows, parent=None):
+        super().__init__(parent)
+        self._rows = np.asarray(rows, dtype=np.int64)
+        self._ascending = True
+        self._inverse = None
+        self._update_order()
+        self.setSourceModel(source)
+        source.dataChanged.connect(self._source_data_changed)
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self.endResetModel)
+        source.columnsAboutToBeInserted.connect(
+            lambda parent, first, last: self.beginInsertColumns(QModelIndex(), first, last))
+        source.columnsInserted.connect(self.endInsertColumns)
+
+    @property
+    def rows(self):
+        """Lignes source affichées, dans l'ordre d'affichage"""
+        return self._rows
+
+    def set_rows(self, rows):
+        """Change les lignes affichées (nouveau filtre ou nouvel ordre)"""
+        self.beginResetModel()
+        self._rows = np.asarray(rows, dtype=np.int64)
+        self._update_order()
+        self.endResetModel()
+
+    def _update_order(self):
+        self._ascending = bool(np.all(self._rows[1:] > self._rows[:-1]))
+        self._inverse = None
+
+    def _position(self, source_row):
+        """Position d'affichage d'une ligne source, ou -1 si elle est masquée"""
+        if self._ascending:
+            rows, order = self._rows, None
+        else:
+            # Ordre quelconque : lignes triées une fois, avec leur position
+            if self._inverse is None:
+                order = self._rows.argsort(kind="stable")
+                self._inverse = (self._rows[order], order)
+            rows, order = self._inverse
+        position = int(rows.searchsorted(source_row))
+        if position == len(rows) or rows[position] != source_row:
+            return -1
+        return position if order is None else int(order[position])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._rows)) or column < 0:
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(int(self._rows[proxy_index.row()]), proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        position = self._position(source_index.row())
+        return QModelIndex() if position < 0 else self.createIndex(position, source_index.column())
+
+    def data(self, index, role=DISPLAY_ROLE):
+        if not index.isValid():
+            return None
+        source = self.sourceModel()
+        return source.data(source.index(int(self._rows[index.row()]), index.column()), role)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        # Les lignes gardent leur numéro d'origine
+        if orientation == Qt.Orientation.Vertical and role == DISPLAY_ROLE:
+            return str(int(self._rows[section]) + 1) if section < len(self._rows) else None
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def flags(self, index):
+        return self.sourceModel().flags(self.mapToSource(index))
+
+    def setData(self, index, value, role=EDIT_ROLE):
+        return self.sourceModel().setData(self.mapToSource(index), value, role)
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        if not len(self._rows):
+            return
+        if self._ascending:
+            first, last = self._rows.searchsorted([top_left.row(), bottom_right.row() + 1])
+            if first == last:
+                return
+            first, last = int(first), int(last) - 1
+        else:
+            # Lignes dispersées : la vue ne repeint de toute façon que le visible
+            first, last = 0, len(self._rows) - 1
+        self.dataChanged.emit(self.index(first, top_left.column()),
+                              self.index(last, bottom_right.column()), roles)
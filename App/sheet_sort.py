@@ -0,0 +1,115 @@
+import numpy as np
+from native_format import sheet_lock
+from sheet_store import ErrorValue, column_letter
+from formula_engine import letter_to_column
+
+# Rang des types de valeur dans un tri, comme dans un tableur : les cellules
+# vides sont toujours en dernier, même en ordre décroissant
+_ASCENDING_GROUPS = {"number": 0, "text": 1, "error": 2, "blank": 3}
+_DESCENDING_GROUPS = {"text": 0, "number": 1, "error": 2, "blank": 3}
+
+
+def column_keys(positions, values, size, ascending=True):
+    """Clés de tri d'une colonne : (rang du type, valeur) en tableaux de `size` éléments.
+
+    `positions` et `values` (liste, ou tableau float64) décrivent les cellules
+    renseignées ; les autres positions sont vides. Les textes sont comparés sans casse, par leur rang
+    dans la liste triée des textes distincts.
+    """
+    groups = _ASCENDING_GROUPS if ascending else _DESCENDING_GROUPS
+    group = np.full(size, groups["blank"], dtype=np.int8)
+    key = np.zeros(size, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.int64)
+    if not len(positions):
+        return group, key
+    if isinstance(values, np.ndarray) or set(map(type, values)) <= {int, float}:
+        # Colonne numérique : conversion en un seul appel
+        numbers = np.asarray(values, dtype=np.float64)
+        filled = ~np.isnan(numbers)
+        group[positions[filled]] = groups["number"]
+        key[positions[filled]] = numbers[filled]
+    else:
+        numeric = [p for p, value in enumerate(values)
+                   if value.__class__ is int or value.__class__ is float and value == value]
+        textual = [p for p, value in enumerate(values)
+                   if isinstance(value, str) and not isinstance(value, ErrorValue)]
+        errors = [p for p, value in enumerate(values) if isinstance(value, ErrorValue)]
+        if numeric:
+            group[positions[numeric]] = groups["number"]
+            key[positions[numeric]] = [values[p] for p in numeric]
+        if textual:
+            texts = [values[p].casefold() for p in textual]
+            rank = {text: r for r, text in enumerate(sorted(set(texts)))}
+            group[positions[textual]] = groups["text"]
+            key[positions[textual]] = [rank[text] for text in texts]
+        if errors:
+            group[positions[errors]] = groups["error"]
+    if not ascending:
+        key = -key
+    return group, key
+
+
+def dense_keys(values, ascending=True):
+    """Clés de tri d'une colonne complète (tableau NumPy, NaN ou None pour les vides)"""
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        numbers = values.astype(np.float64, copy=False)
+        positions = np.flatnonzero(~np.isnan(numbers))
+        return column_keys(positions, numbers[positions], len(values), ascending)
+    return column_keys(np.arange(len(values)), values.tolist(), len(values), ascending)
+
+
+def sort_permutation(keys):
+    """Ordre stable des positions selon des clés [(rang du type, valeur)], la première primaire"""
+    sequence = []
+    # np.lexsort trie selon la dernière clé d'abord
+    for group, key in reversed(keys):
+        sequence.append(key)
+        # Un seul type de valeur : le rang du type ne départage rien
+        if len(group) and group.min() != group.max():
+            sequence.append(group)
+    return np.lexsort(sequence)
+
+
+def parse_sort_keys(text):
+    """Interprète une saisie "B, -A" : [(col, croissant)], "-" pour décroissant"""
+    keys = []
+    for part in text.split(","):
+        part = part.strip().upper()
+        if not part:
+            continue
+        ascending = not part.startswith("-")
+        letters = part.lstrip("+-").strip()
+        if not letters.isalpha() or not letters.isascii():
+            raise ValueError(f"Colonne invalide : {part}")
+        keys.append((letter_to_column(letters), ascending))
+    return keys
+
+
+def format_sort_keys(keys):
+    """Inverse de parse_sort_keys"""
+    return ", ".join(("" if ascending else "-") + column_letter(col) for col, ascending in keys)
+
+
+def sort_rows(model, keys, rows=None):
+    """Lignes de la feuille dans l'ordre du tri `keys` [(col, croissant)].
+
+    Seules les lignes `rows` (toutes par défaut) sont triées ; les lignes
+    au-delà de la zone utilisée restent à la fin, dans leur ordre. Les
+    cellules ne sont pas déplacées : le résultat est une permutation à
+    afficher par RowMappingProxyModel.
+    """
+    with sheet_lock(model):
+        used = model.store.extent()[0]
+        if rows is None:
+            rows = np.arange(model.rowCount(), dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        inside = rows < used
+        subset = rows[inside]
+        sort_keys = []
+        for col, ascending in keys:
+            positions, values = model.store.column_cells(col)
+            group, key = column_keys(positions, values, used, ascending)
+            sort_keys.append((group[subset], key[subset]))
+    order = sort_permutation(sort_keys) if sort_keys else np.arange(len(subset))
+    return np.concatenate([subset[order], rows[~inside]])
@@ -0,0 +1,241 @@
+from functools import lru_cache
+import numpy as np
+
+# Dimensions logiques par défaut d'une feuille (comme un classeur Excel)
+DEFAULT_ROW_COUNT = 1_048_576
+DEFAULT_COLUMN_COUNT = 26
+
+# Taille des blocs numériques mis en cache pour les calculs vectorisés
+CHUNK_SHIFT = 12
+CHUNK_ROWS = 1 << CHUNK_SHIFT
+
+# Au-delà de ce nombre de lignes écrites d'un coup, l'index d'une colonne est
+# abandonné puis reconstruit à la prochaine recherche plutôt que mis à jour
+INDEX_UPDATE_LIMIT = 1024
+
+
+class ErrorValue(str):
+    """Valeur d'erreur affichée dans une cellule (#DIV/0!, #VALEUR!...)"""
+    __slots__ = ()
+
+
+@lru_cache(maxsize=16384)
+def column_letter(col: int) -> str:
+    """Convertit un index de colonne en notation Excel (0->A, 25->Z, 26->AA...)"""
+    letters = ""
+    col += 1
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class SparseCellStore:
+    """Stocke uniquement les cellules renseignées, rangées par colonne"""
+
+    def __init__(self):
+        self._columns = {}  # col -> {row: valeur}
+        self._count = 0
+        # (col, bloc) -> (tableau float64 ou None si vide, présence d'erreurs)
+        self._numeric_chunks = {}
+        # col -> index de recherche tenu à jour à chaque écriture (voir sheet_index)
+        self._indexes = {}
+
+    def __len__(self):
+        return self._count
+
+    def get(self, row: int, col: int, default=None):
+        """Renvoie la valeur d'une cellule, ou `default` si elle est vide"""
+        column = self._columns.get(col)
+        if column is None:
+            return default
+        return column.get(row, default)
+
+    def set(self, row: int, col: int, value):
+        """Écrit une valeur ; None ou "" vident la cellule"""
+        self._numeric_chunks.pop((col, row >> CHUNK_SHIFT), None)
+        if self._indexes and col in self._indexes:
+            self._indexes[col].update(row, self.get(row, col),
+                                      None if value == "" else value)
+        if value is None or value == "":
+            column = self._columns.get(col)
+            if column is not None and column.pop(row, None) is not None:
+                self._count -= 1
+                if not column:
+                    del self._columns[col]
+            return
+
+        column = self._columns.setdefault(col, {})
+        if row not in column:
+            self._count += 1
+        column[row] = value
+
+    def set_block(self, top: int, left: int, values):
+        """Écrit un bloc 2D de valeurs (liste de lignes), colonne par colonne"""
+        width = max((len(row_values) for row_values in values), default=0)
+        rows = range(top, top + len(values))
+        for c in range(width):
+            col = left + c
+            if self._indexes and col in self._indexes:
+                self._update_index(col, top, [row_values[c] if c < len(row_values) else None
+                                              for row_values in values])
+            column = self._columns.setdefault(col, {})
+            before = len(column)
+            cells = [row_values[c] if c < len(row_values) else None for row_values in values]
+            if None not in cells and "" not in cells:
+                # Colonne pleine : une seule mise à jour du dictionnaire
+                column.update(zip(rows, cells))
+            else:
+                for row, value in zip(rows, cells):
+                    if value is None or value == "":
+                        column.pop(row, None)
+                    else:
+                        column[row] = value
+            self._count += len(column) - before
+            if not column:
+                del self._columns[col]
+            for chunk in range(top >> CHUNK_SHIFT, ((top + len(values) - 1) >> CHUNK_SHIFT) + 1):
+                self._numeric_chunks.pop((col, chunk), None)
+
+    def update_column(self, col: int, cells: dict):
+        """Fusionne des cellules ({row: valeur}, sans vides) dans une colonne"""
+        if not cells:
+            return
+        self._indexes.pop(col, None)
+        column = self._columns.setdefault(col, {})
+        before = len(column)
+        column.update(cells)
+        self._count += len(column) - before
+        for chunk in {row >> CHUNK_SHIFT for row in cells}:
+            self._numeric_chunks.pop((col, chunk), None)
+
+    def resident_count(self) -> int:
+        """Nombre de cellules réellement chargées en mémoire"""
+        return self._count
+
+    def attach_index(self, col: int, index):
+        """Associe à une colonne un index à tenir à jour (méthode update(row, ancienne, nouvelle))"""
+        self._indexes[col] = index
+
+    def index(self, col: int):
+        """Renvoie l'index de recherche d'une colonne, ou None s'il est à (re)construire"""
+        return self._indexes.get(col)
+
+    def _update_index(self, col, top, cells):
+        if len(cells) > INDEX_UPDATE_LIMIT:
+            del self._indexes[col]
+            return
+        index = self._indexes[col]
+        for row, value in enumerate(cells, top):
+            index.update(row, self.get(row, col), None if value == "" else value)
+
+    def clear(self):
+        """Vide toutes les cellules"""
+        self._columns.clear()
+        self._count = 0
+        self._numeric_chunks.clear()
+        self._indexes.clear()
+
+    def snapshot(self) -> dict:
+        """Renvoie le contenu brut ({col: {row: valeur}}) pour la sérialisation"""
+        return self._columns
+
+    def restore(self, columns: dict):
+        """Remplace le contenu par un instantané produit par snapshot()"""
+        self._columns = columns
+        self._count = sum(len(column) for column in columns.values())
+        self._numeric_chunks.clear()
+        self._indexes.clear()
+
+    def column(self, col: int) -> dict:
+        """Renvoie les cellules renseignées d'une colonne ({row: valeur}), à ne pas modifier"""
+        return self._columns.get(col, {})
+
+    def column_items(self, col: int):
+        """Parcourt les cellules d'une colonne sous la forme (row, valeur), sans la copier"""
+        return self._columns.get(col, {}).items()
+
+    def column_cells(self, col: int):
+        """Renvoie (lignes en tableau NumPy, valeurs en liste) des cellules d'une colonne"""
+        column = self._columns.get(col, {})
+        return np.fromiter(column, dtype=np.int64, count=len(column)), list(column.values())
+
+    def numeric_blocks(self, col: int, top: int, bottom: int):
+        """Renvoie les valeurs numériques d'une plage de colonne en blocs NumPy.
+
+        Chaque bloc est une vue float64 (NaN pour les cellules vides ou non
+        numériques) ; les blocs entièrement vides sont omis. Renvoie aussi la
+        première valeur d'erreur trouvée dans la plage, ou None.
+        """
+        first, last = top >> CHUNK_SHIFT, bottom >> CHUNK_SHIFT
+        missing = [chunk for chunk in range(first, last + 1)
+                   if (col, chunk) not in self._numeric_chunks]
+        if missing:
+            self._build_chunks(col, missing)
+
+        blocks = []
+        error = None
+        for chunk in range(first, last + 1):
+            array, has_error = self._numeric_chunks[(col, chunk)]
+            if has_error and error is None:
+                error = self._first_error(col, max(top, chunk << CHUNK_SHIFT),
+                                          min(bottom, ((chunk + 1) << CHUNK_SHIFT) - 1))
+            if array is not None:
+                start = max(top - (chunk << CHUNK_SHIFT), 0)
+                stop = min(bottom - (chunk << CHUNK_SHIFT) + 1, CHUNK_ROWS)
+                blocks.append(array[start:stop])
+        return blocks, error
+
+    def _build_chunks(self, col, chunks):
+        column = self._columns.get(col, {})
+        offsets = {chunk: [] for chunk in chunks}
+        numbers = {chunk: [] for chunk in chunks}
+        errors = set()
+        if len(chunks) * CHUNK_ROWS > len(column):
+            # Plus rapide de parcourir toute la colonne une seule fois
+            cells = column.items()
+        else:
+            cells = ((row, column[row]) for chunk in chunks
+                     for row in range(chunk << CHUNK_SHIFT, (chunk + 1) << CHUNK_SHIFT)
+                     if row in column)
+        for row, value in cells:
+            chunk = row >> CHUNK_SHIFT
+            if chunk not in offsets:
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                offsets[chunk].append(row & (CHUNK_ROWS - 1))
+                numbers[chunk].append(value)
+            elif isinstance(value, ErrorValue):
+                errors.add(chunk)
+
+        for chunk in chunks:
+            array = None
+            if offsets[chunk]:
+                array = np.full(CHUNK_ROWS, np.nan)
+                array[offsets[chunk]] = numbers[chunk]
+            self._numeric_chunks[(col, chunk)] = (array, chunk in errors)
+
+    def _first_error(self, col, top, bottom):
+        column = self._columns.get(col, {})
+        for row in range(top, bottom + 1):
+            value = column.get(row)
+            if isinstance(value, ErrorValue):
+                return value
+        return None
+
+    def columns(self):
+        """Renvoie les index des colonnes contenant au moins une valeur, triés"""
+        return sorted(self._columns)
+
+    def items(self):
+        """Parcourt les cellules renseignées sous la forme (row, col, valeur)"""
+        for col, column in self._columns.items():
+            for row, value in column.items():
+                yield row, col, value
+
+    def extent(self):
+        """Renvoie (nombre de lignes, nombre de colonnes) de la zone utilisée"""
+        if not self._columns:
+            return 0, 0
+        rows = max(max(column) for column in self._columns.values()) + 1
+        return rows, max(self._columns) + 1
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Les modules de l'application sont à plat dans App/ et s'importent entre eux
+# par leur nom (from sheet_store import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
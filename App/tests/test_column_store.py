@@ -0,0 +1,25 @@
+import numpy as np
+from column_store import TypedColumn
+
+
+def test_huge_int_in_empty_column_is_an_override():
+    column = TypedColumn(10)
+    column.set(0, 10 ** 20)
+    assert column.get(0) == 10 ** 20
+    assert column.kind is None
+    assert column.numbers()[0] == 1e20
+    column.set(1, 5)
+    assert column.kind == "int"
+    assert column.get(0) == 10 ** 20 and column.get(1) == 5
+    assert column.numbers()[:2].tolist() == [1e20, 5.0]
+
+
+def test_bool_in_empty_column_is_an_override():
+    column = TypedColumn(4)
+    column.set(2, True)
+    assert column.get(2) is True
+    assert column.kind is None
+    assert np.isnan(column.numbers()).all()
+    column.set(2, None)
+    assert column.get(2) is None
+    assert column.overrides == {}
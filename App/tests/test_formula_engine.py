@@ -0,0 +1,128 @@
+import pytest
+from formula_engine import FormulaEngine, translate_formula
+from sheet_store import ErrorValue, SparseCellStore
+
+
+@pytest.fixture
+def engine():
+    return FormulaEngine(SparseCellStore())
+
+
+def evaluate(engine, formula, row=0, col=5):
+    engine.set_cell(row, col, formula)
+    return engine.store.get(row, col)
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=1+2*3", 7),
+    ("=(1+2)*3", 9),
+    ("=2^3", 8),
+    ("=-2^2", 4),
+    ("=2^3^2", 64),
+    ("=2^-1", 0.5),
+    ("=10-2-3", 5),
+    ("=\"a\"&1", "a1"),
+])
+def test_arithmetic(engine, formula, expected):
+    assert evaluate(engine, formula) == expected
+
+
+@pytest.mark.parametrize("formula, error", [
+    ("=(0-8)^0.5", "#NOMBRE!"),
+    ("=10^400", "#NOMBRE!"),
+    ("=0^-1", "#DIV/0!"),
+    ("=1/0", "#DIV/0!"),
+    ("=INCONNUE(1)", "#NOM?"),
+    ("=#REF!+1", "#REF!"),
+    ("=SOMME(#REF!:B2)", "#REF!"),
+])
+def test_errors(engine, formula, error):
+    value = evaluate(engine, formula)
+    assert isinstance(value, ErrorValue) and value == error
+
+
+def test_reference_moved_off_sheet(engine):
+    formula = translate_formula("=A2+SOMME(B2:C3)", -2, 0)
+    assert formula == "=#REF!+SOMME(#REF!:C1)"
+    # La formule collée garde son texte et s'évalue en #REF!
+    assert evaluate(engine, formula) == "#REF!"
+    assert engine.formula_text(0, 5) == formula
+    assert translate_formula(formula, 1, 1) == "=#REF!+SOMME(#REF!:D2)"
+
+
+def test_large_power_is_computed_as_float(engine):
+    engine.set_cell(0, 0, "1000000000")
+    value = evaluate(engine, "=A1^A1", 0, 1)
+    assert value == "#NOMBRE!"
+    assert evaluate(engine, "=A1^2", 0, 2) == 1e18
+
+
+def test_range_functions(engine):
+    for row in range(10):
+        engine.set_cell(row, 0, str(row + 1))
+    assert evaluate(engine, "=SOMME(A1:A10)", 0, 1) == 55
+    assert evaluate(engine, "=MOYENNE(A1:A10)", 1, 1) == 5.5
+    assert evaluate(engine, "=MAX(A1:A10;20)", 2, 1) == 20
+    assert evaluate(engine, "=NB(A1:A10)", 3, 1) == 10
+
+
+def test_aggregates_ignore_text_cells(engine):
+    engine.set_cell(0, 0, "abc")
+    engine.set_cell(1, 0, "4")
+    assert evaluate(engine, "=SOMME(A1)", 0, 1) == 0
+    assert evaluate(engine, "=NB(A1)", 1, 1) == 0
+    assert evaluate(engine, "=NB(A3)", 2, 1) == 0
+    assert evaluate(engine, "=SOMME(A1;A2;1)", 3, 1) == 5
+    assert evaluate(engine, "=A1+1", 4, 1) == "#VALEUR!"
+
+
+@pytest.mark.parametrize("text", ["nan", "inf", "-Infinity"])
+def test_non_finite_text_stays_text(engine, text):
+    engine.set_cell(0, 0, text)
+    assert engine.store.get(0, 0) == text
+    assert evaluate(engine, "=A1+1", 0, 1) == "#VALEUR!"
+    assert evaluate(engine, "=SOMME(A1)", 1, 1) == 0
+
+
+def test_incremental_recalculation(engine):
+    engine.set_cell(0, 0, "2")
+    engine.set_cell(0, 1, "=A1*10")
+    engine.set_cell(0, 2, "=B1+1")
+    changed = engine.set_cell(0, 0, "3")
+    assert engine.store.get(0, 2) == 31
+    assert set(changed) == {(0, 0), (0, 1), (0, 2)}
+
+
+def test_cycle(engine):
+    engine.set_cell(0, 0, "=B1")
+    engine.set_cell(0, 1, "=A1")
+    assert engine.store.get(0, 0) == "#CYCLE!"
+    assert engine.store.get(0, 1) == "#CYCLE!"
+
+
+def _chain(engine, length):
+    engine.set_cell(0, 0, "1")
+    engine.set_cells([(row, 0, f"=A{row}+1") for row in range(1, length)], recalculate=False)
+
+
+def test_plan_releases_lock_between_steps(engine, monkeypatch):
+    import threading
+    monkeypatch.setattr(FormulaEngine, "PLAN_STEP", 100)
+    _chain(engine, 1000)
+    acquired = []
+
+    def probe():
+        # Le verrou doit être libre pour un autre thread entre deux étapes
+        def other():
+            if engine.lock.acquire(timeout=1):
+                acquired.append(True)
+                engine.lock.release()
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join()
+        return False
+
+    order, cyclic = engine.plan([(0, 0)], cancelled=probe)
+    assert len(order) == 999 and not cyclic
+    assert len(acquired) >= 9
+    assert engine.plan([(0, 0)], cancelled=lambda: True) is None
@@ -0,0 +1,71 @@
+import os
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt6.QtCore import QItemSelection, QItemSelectionModel
+from PyQt6.QtWidgets import QApplication, QTableView
+from formula_engine import FormulaEngine
+from sheet_clipboard import clear_range, copy_range, paste, selected_rows
+from sheet_model import RowMappingProxyModel, SparseTableModel
+from undo_journal import UndoJournal
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def model():
+    model = SparseTableModel(rows=20, columns=5)
+    model.engine = FormulaEngine(model.store)
+    model.journal = UndoJournal()
+    model.set_block(0, 0, [[row, f"=A{row + 1}*10"] for row in range(6)], undoable=False)
+    return model
+
+
+def select(view, top, bottom, left=0, right=1):
+    model = view.model()
+    view.selectionModel().select(QItemSelection(model.index(top, left), model.index(bottom, right)),
+                                 QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+
+def test_selected_rows_in_filtered_view(app, model):
+    view = QTableView()
+    # Vue filtrée puis triée : lignes source 5, 3 et 1 seulement
+    view.setModel(RowMappingProxyModel(model, [5, 3, 1]))
+    select(view, 0, 1)
+    assert selected_rows(view) == ([5, 3], 0, 1)
+
+    view.setModel(model)
+    select(view, 1, 3)
+    assert selected_rows(view) == (range(1, 4), 0, 1)
+
+
+def test_copy_skips_hidden_rows(model):
+    mime = copy_range(model, [5, 3], 0, 1)
+    assert mime.snapshot.values == [[5, 50.0], [3, 30.0]]
+    assert bytes(mime.data("text/plain")).decode() == "5\t50\n3\t30\n"
+
+    assert paste(model, 10, 0, mime) == (2, 2)
+    # Chaque formule est décalée depuis sa propre ligne source
+    assert model.engine.formula_text(10, 1) == "=A11*10"
+    assert model.engine.formula_text(11, 1) == "=A12*10"
+    assert model.value(11, 1) == 30
+
+
+def test_cut_clears_only_selected_rows(model):
+    clear_range(model, [5, 3], 0, 1)
+    assert [model.value(row, 0) for row in range(6)] == [0, 1, 2, None, 4, None]
+    assert model.engine.formula_text(4, 1) == "=A5*10"
+    assert model.undo()
+    assert [model.value(row, 0) for row in range(6)] == [0, 1, 2, 3, 4, 5]
+    assert model.value(3, 1) == 30
+
+
+def test_contiguous_copy_and_cut(model):
+    mime = copy_range(model, range(1, 3), 0, 1)
+    clear_range(model, range(1, 3), 0, 1)
+    assert model.value(1, 0) is None and model.value(2, 1) is None
+    paste(model, 1, 0, mime)
+    assert model.value(2, 1) == 20
@@ -0,0 +1,19 @@
+from datetime import datetime
+from sheet_index import ColumnIndex
+
+
+def test_between_skips_dates():
+    day = datetime(2024, 1, 2)
+    index = ColumnIndex([(0, 5.0), (1, day), (2, "abc"), (3, 12), (4, day)])
+    assert index.between(1, 10).tolist() == [0]
+    assert index.between(None, None).tolist() == [0, 3]
+    assert index.equal(day).tolist() == [1, 4]
+    assert index.contains("2024-01").tolist() == [1, 4]
+
+
+def test_dates_written_after_build_stay_out_of_intervals():
+    index = ColumnIndex([(0, 1.0), (1, 2.0)])
+    assert index.between(0, 5).tolist() == [0, 1]
+    index.update(1, 2.0, datetime(2024, 1, 2))
+    index.update(2, None, 3)
+    assert index.between(0, 5).tolist() == [0, 2]
@@ -0,0 +1,100 @@
+import os
+import openpyxl
+import pytest
+from formula_engine import FormulaEngine, from_excel_formula, to_excel_formula
+from sheet_model import SparseTableModel
+from workbook_io import open_workbook, save_workbook
+
+
+def make_model():
+    model = SparseTableModel(rows=100, columns=10)
+    model.engine = FormulaEngine(model.store)
+    return model
+
+
+@pytest.mark.parametrize("local, excel", [
+    ("=SOMME(A1:A3)", "=SUM(A1:A3)"),
+    ("=MOYENNE(A1;B1)+NB(C1:C9)", "=AVERAGE(A1,B1)+COUNT(C1:C9)"),
+    ("=MAX(A1;2)&\"SOMME(;)\"", "=MAX(A1,2)&\"SOMME(;)\""),
+])
+def test_excel_formula_names(local, excel):
+    assert to_excel_formula(local) == excel
+    assert from_excel_formula(excel) == local
+
+
+def test_xlsx_round_trip_translates_functions(tmp_path):
+    path = str(tmp_path / "classeur.xlsx")
+    model = make_model()
+    model.set_block(0, 0, [[1], [2], [3], ["=SOMME(A1:A3)"]], undoable=False)
+    assert save_workbook(path, ["Feuille"], lambda name: model)
+
+    sheet = openpyxl.load_workbook(path).active
+    assert sheet["A4"].value == "=SUM(A1:A3)"
+
+    loaded = {}
+    assert open_workbook(path, lambda name: loaded.setdefault(name, make_model()))
+    model = loaded["Feuille"]
+    assert model.engine.formula_text(3, 0) == "=SOMME(A1:A3)"
+    assert model.value(3, 0) == 6
+
+
+def fill(model):
+    model.set_block(0, 0, [[1, "texte", 2.5], [2, None, "=1/0"], [3, "é", None],
+                           ["=SOMME(A1:A3)", None, None]], undoable=False)
+    model.set_value(70_000, 1, "loin")
+
+
+def test_native_round_trip(tmp_path):
+    path = str(tmp_path / "classeur.nxs")
+    model = make_model()
+    fill(model)
+    assert save_workbook(path, ["Feuille"], lambda name: model)
+
+    loaded = {}
+    assert open_workbook(path, lambda name: loaded.setdefault(name, make_model()))
+    model = loaded["Feuille"]
+    assert [model.value(row, 0) for row in range(4)] == [1, 2, 3, 6]
+    assert model.value(0, 1) == "texte" and model.value(2, 1) == "é"
+    assert model.value(0, 2) == 2.5
+    assert model.value(1, 2) == "#DIV/0!"
+    assert model.value(70_000, 1) == "loin"
+    assert model.engine.formula_text(3, 0) == "=SOMME(A1:A3)"
+
+    # Enregistrement par-dessus le fichier encore projeté
+    model.set_value(0, 0, 10)
+    assert save_workbook(path, ["Feuille"], lambda name: model)
+    assert model.value(0, 0) == 10 and model.value(70_000, 1) == "loin"
+    loaded.clear()
+    assert open_workbook(path, lambda name: loaded.setdefault(name, make_model()))
+    assert loaded["Feuille"].value(3, 0) == 15
+
+
+def test_native_write_failure_removes_temporary(tmp_path):
+    path = str(tmp_path / "classeur.nxs")
+    model = make_model()
+    fill(model)
+
+    def model_for(name):
+        if name == "Erreur":
+            raise RuntimeError(name)
+        return model
+
+    with pytest.raises(RuntimeError):
+        save_workbook(path, ["Feuille", "Erreur"], model_for)
+    assert not os.path.exists(path + ".tmp")
+    assert not os.path.exists(path)
+
+
+def test_export_keeps_mapped_columns_on_disk(tmp_path):
+    native = str(tmp_path / "classeur.nxs")
+    model = make_model()
+    fill(model)
+    save_workbook(native, ["Feuille"], lambda name: model)
+    loaded = {}
+    open_workbook(native, lambda name: loaded.setdefault(name, make_model()))
+    model = loaded["Feuille"]
+
+    assert save_workbook(str(tmp_path / "classeur.csv"), ["Feuille"], lambda name: model)
+    assert model.store.resident_count() == 0
+    with open(tmp_path / "classeur.csv", encoding="utf-8") as handle:
+        assert handle.readline().strip() == "1,texte,2.5"
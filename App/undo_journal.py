@@ -0,0 +1,189 @@
+from array import array
+from collections import deque
+from native_format import encode_cells, decode_cells
+
+# Mémoire maximale de l'historique d'annulation (par feuille)
+DEFAULT_MAX_BYTES = 64 << 20
+
+# Coût fixe estimé d'une opération (objets Python), ajouté à ses tampons
+_EDIT_OVERHEAD = 256
+
+
+def _encode_columns(columns):
+    """Encode des colonnes [(lignes, valeurs)] en tampons [(nombre, octets) ou None]"""
+    return [(len(rows), encode_cells(rows, values)) if rows else None
+            for rows, values in columns]
+
+
+def _block_columns(values, width):
+    """Découpe un bloc (liste de lignes) en colonnes des cellules non vides"""
+    padded = (row_values if len(row_values) == width else
+              list(row_values) + [None] * (width - len(row_values)) for row_values in values)
+    columns = []
+    for cells in zip(*padded):
+        rows = [r for r, value in enumerate(cells) if value is not None and value != ""]
+        if len(rows) == len(cells):
+            columns.append((rows, cells))
+        else:
+            columns.append((rows, [cells[r] for r in rows]))
+    return columns
+
+
+def _encode_contents(values):
+    """Encode une liste de contenus (vides compris) en (nombre de non vides, octets)"""
+    positions = [p for p, value in enumerate(values) if value is not None and value != ""]
+    return len(positions), encode_cells(positions, [values[p] for p in positions])
+
+
+class RangeEdit:
+    """Modification d'une plage : contenus avant/après stockés par colonne.
+
+    Chaque colonne est un tampon compact (nombres, lignes, textes) plutôt
+    qu'une liste d'objets par cellule ; les cellules vides ne sont pas stockées.
+    """
+
+    __slots__ = ("top", "left", "height", "width", "before", "after", "nbytes")
+
+    def __init__(self, top, left, height, width, before, after):
+        self.top = top
+        self.left = left
+        self.height = height
+        self.width = width
+        self.before = before
+        self.after = after
+        self.nbytes = _EDIT_OVERHEAD + sum(len(column[1]) for column in before + after
+                                           if column is not None)
+
+    @classmethod
+    def capture(cls, model, top, left, values):
+        """Enregistre le contenu actuel de la plage que `values` va remplacer"""
+        height = len(values)
+        width = max((len(row_values) for row_values in values), default=0)
+        # Une formule est restaurée par son texte, pas par sa valeur calculée
+        engine = model.engine
+        texts = {}
+        if engine is not None and engine.has_formulas():
+            texts = engine.formulas_in(top, left, top + height - 1, left + width - 1)
+        before = []
+        for col in range(left, left + width):
+            column = model.store.column(col)
+            merged = {}
+            if column:
+                # On parcourt le plus petit des deux : la plage ou la colonne
+                if len(column) < height:
+                    merged = {row - top: value for row, value in column.items()
+                              if top <= row < top + height}
+                else:
+                    merged = {row - top: column[row] for row in range(top, top + height)
+                              if row in column}
+            for (row, cell_col), text in texts.items():
+                if cell_col == col:
+                    merged[row - top] = text
+            rows = sorted(merged)
+            contents = [merged[row] for row in rows]
+            before.append((rows, contents))
+        return cls(top, left, height, width, _encode_columns(before),
+                   _encode_columns(_block_columns(values, width)))
+
+    def apply(self, model, after):
+        """Réécrit la plage dans son état d'après (rétablir) ou d'avant (annuler)"""
+        model.set_block(self.top, self.left, self.block(after), undoable=False)
+
+    def block(self, after):
+        """Reconstruit le bloc (liste de lignes) à écrire pour rétablir ou annuler"""
+        values = [[None] * self.width for _ in range(self.height)]
+        for c, column in enumerate(self.after if after else self.before):
+            if column is not None:
+                rows, contents = decode_cells(column[1], column[0])
+                for row, value in zip(rows, contents):
+                    values[row][c] = value
+        return values
+
+
+class CellsEdit:
+    """Modification de cellules éparses (remplacer tout par exemple).
+
+    Les positions sont gardées dans deux tableaux compacts et les contenus
+    avant/après dans des tampons encode_cells, dans l'ordre des positions.
+    """
+
+    __slots__ = ("rows", "cols", "before", "after", "nbytes")
+
+    def __init__(self, rows, cols, before, after):
+        self.rows = rows
+        self.cols = cols
+        self.before = before
+        self.after = after
+        self.nbytes = (_EDIT_OVERHEAD + len(rows) * rows.itemsize * 2 +
+                       sum(len(contents[1]) for contents in (before, after)))
+
+    @classmethod
+    def capture(cls, model, entries):
+        """Enregistre le contenu actuel des cellules de `entries` [(row, col, valeur)]"""
+        engine = model.engine
+        before = []
+        for row, col, _ in entries:
+            text = engine.formula_text(row, col) if engine is not None else None
+            before.append(text if text is not None else model.store.get(row, col))
+        after = [value for _, _, value in entries]
+        return cls(array("i", (row for row, _, _ in entries)),
+                   array("i", (col for _, col, _ in entries)),
+                   _encode_contents(before), _encode_contents(after))
+
+    def apply(self, model, after):
+        count, buffer = self.after if after else self.before
+        positions, values = decode_cells(buffer, count)
+        contents = [None] * len(self.rows)
+        for position, value in zip(positions, values):
+            contents[position] = value
+        model.set_cells(zip(self.rows, self.cols, contents), undoable=False)
+
+
+class UndoJournal:
+    """Historique d'annulation d'une feuille, borné en mémoire.
+
+    Quand la taille totale dépasse `max_bytes`, les opérations les plus
+    anciennes sont oubliées en premier.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._undo = deque()
+        self._redo = []
+        self.nbytes = 0
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def record(self, edit):
+        """Ajoute une opération ; l'historique de rétablissement est abandonné"""
+        self.nbytes -= sum(item.nbytes for item in self._redo)
+        self._redo.clear()
+        self._undo.append(edit)
+        self.nbytes += edit.nbytes
+        while self.nbytes > self.max_bytes and self._undo:
+            self.nbytes -= self._undo.popleft().nbytes
+
+    def undo(self):
+        """Renvoie l'opération à annuler (passée dans l'historique de rétablissement)"""
+        if not self._undo:
+            return None
+        edit = self._undo.pop()
+        self._redo.append(edit)
+        return edit
+
+    def redo(self):
+        """Renvoie l'opération à rétablir"""
+        if not self._redo:
+            return None
+        edit = self._redo.pop()
+        self._undo.append(edit)
+        return edit
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.nbytes = 0
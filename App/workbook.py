@@ -0,0 +1,91 @@
+import os
+import pickle
+import tempfile
+import zlib
+
+
+class Workbook:
+    """Feuilles d'un classeur, chacune avec son propre modèle.
+
+    Le modèle d'une feuille n'est créé qu'à sa première ouverture. Au-delà de
+    `max_resident` feuilles en mémoire, les moins récemment consultées sont
+    écrites sur disque sous forme compressée et rechargées à la demande.
+    """
+
+    # Les petites feuilles ne valent pas un aller-retour disque
+    PAGE_OUT_MIN_CELLS = 10_000
+
+    def __init__(self, model_factory, max_resident=3):
+        self._factory = model_factory
+        self.max_resident = max_resident
+        self._models = {}  # nom -> modèle
+        self._paged = {}  # nom -> fichier temporaire du contenu
+        self._recent = []  # feuilles en mémoire, la plus récente en dernier
+
+    def __contains__(self, name):
+        return name in self._models
+
+    def model(self, name):
+        """Renvoie le modèle de la feuille, en le créant ou en le rechargeant si besoin"""
+        model = self._models.get(name)
+        if model is None:
+            model = self._models[name] = self._factory()
+        elif name in self._paged:
+            self._page_in(name)
+
+        if name in self._recent:
+            self._recent.remove(name)
+        self._recent.append(name)
+        for other in self._recent[:-self.max_resident]:
+            self.page_out(other)
+        return model
+
+    def remove(self, name):
+        """Oublie une feuille et son éventuel fichier temporaire"""
+        self._models.pop(name, None)
+        if name in self._recent:
+            self._recent.remove(name)
+        path = self._paged.pop(name, None)
+        if path is not None:
+            os.remove(path)
+
+    def clear(self):
+        for name in list(self._models):
+            self.remove(name)
+
+    def page_out(self, name):
+        """Écrit le contenu d'une feuille sur disque et libère sa mémoire"""
+        model = self._models.get(name)
+        if model is None or name in self._paged or model.store.resident_count() < self.PAGE_OUT_MIN_CELLS:
+            return False
+        scheduler = getattr(model, "scheduler", None)
+        if scheduler is not None and scheduler.is_running():
+            return False
+
+        engine = getattr(model, "engine", None)
+        formulas = engine.formulas() if engine is not None else {}
+        payload = pickle.dumps((model.store.snapshot(), formulas), protocol=pickle.HIGHEST_PROTOCOL)
+        fd, path = tempfile.mkstemp(prefix="nexussheet-", suffix=".sheet")
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(zlib.compress(payload, 1))
+
+        model.clear()
+        self._paged[name] = path
+        if name in self._recent:
+            self._recent.remove(name)
+        return True
+
+    def _page_in(self, name):
+        path = self._paged.pop(name)
+        with open(path, "rb") as handle:
+            columns, formulas = pickle.loads(zlib.decompress(handle.read()))
+        os.remove(path)
+
+        model = self._models[name]
+        model.beginResetModel()
+        model.store.restore(columns)
+        if formulas:
+            # Les valeurs calculées sont déjà dans le contenu : pas de recalcul
+            model.engine.set_cells(((row, col, text) for (row, col), text in formulas.items()),
+                                   recalculate=False)
+        model.endResetModel()
@@ -0,0 +1,211 @@
+import csv
+import os
+import numpy as np
+import openpyxl
+from sheet_store import ErrorValue
+from formula_engine import from_excel_formula, to_excel_formula
+from native_format import (NativeReader, MappedCellStore, WorkbookFormatError,
+                           write_native, sheet_lock)
+
+# Nombre de lignes lues ou écrites par bloc (CSV et XLSX)
+CHUNK_ROWS = 10_000
+
+
+def _cell_output(model, row, col):
+    """Renvoie le contenu à enregistrer : la formule si elle existe, sinon la valeur"""
+    if model.engine is not None:
+        formula = model.engine.formula_text(row, col)
+        if formula is not None:
+            return formula
+    return model.store.get(row, col)
+
+
+def _iter_row_chunks(model, values_only, chunk_rows=CHUNK_ROWS):
+    """Parcourt la zone utilisée par blocs de lignes, sans copier toute la feuille"""
+    store = model.store
+    rows, columns = store.extent()
+    # Lignes de chaque colonne triées une seule fois (tableaux NumPy) ; les
+    # valeurs sont lues bloc par bloc avec get(), sans charger les colonnes
+    # d'un stockage projeté
+    ordered = {col: store.column_cells(col)[0] for col in store.columns()}
+    if not values_only and model.engine is not None:
+        # Une formule au résultat vide doit tout de même être enregistrée
+        extra = {}
+        for row, col in model.engine.formulas():
+            extra.setdefault(col, []).append(row)
+            rows, columns = max(rows, row + 1), max(columns, col + 1)
+        for col, keys in extra.items():
+            ordered[col] = np.union1d(ordered.get(col, keys), keys)
+    ordered = {col: np.unique(keys) for col, keys in ordered.items()}
+    positions = dict.fromkeys(ordered, 0)
+    for start in range(0, rows, chunk_rows):
+        stop = min(start + chunk_rows, rows)
+        block = [[None] * columns for _ in range(stop - start)]
+        for col, keys in ordered.items():
+            position = positions[col]
+            end = int(keys.searchsorted(stop))
+            for row in keys[position:end].tolist():
+                block[row - start][col] = store.get(row, col) if values_only else _cell_output(model, row, col)
+            positions[col] = end
+        yield start, block, stop / rows
+
+
+# CSV
+
+def iter_csv(path, chunk_rows=CHUNK_ROWS):
+    """Lit un CSV par blocs de lignes : produit (première ligne, lignes, fraction lue)"""
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as raw:
+        # Lecture binaire : la position reste disponible pour la progression
+        lines = (line.decode("utf-8-sig" if number == 0 else "utf-8", errors="replace")
+                 for number, line in enumerate(raw))
+        reader = csv.reader(lines)
+        top = 0
+        block = []
+        for row in reader:
+            block.append(row)
+            if len(block) >= chunk_rows:
+                yield top, block, raw.tell() / size
+                top += len(block)
+                block = []
+        if block:
+            yield top, block, 1.0
+
+
+def write_csv(path, model, progress=None):
+    """Écrit les valeurs d'une feuille en CSV, bloc par bloc"""
+    with sheet_lock(model), open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        for _, block, fraction in _iter_row_chunks(model, values_only=True):
+            writer.writerows([_format_csv(value) for value in row] for row in block)
+            if progress is not None and progress(fraction) is False:
+                return False
+    return True
+
+
+def _format_csv(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value
+
+
+# XLSX
+
+def iter_xlsx(path, chunk_rows=CHUNK_ROWS):
+    """Lit un classeur XLSX en flux : produit (feuille, première ligne, lignes, fraction)"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        sheets = workbook.worksheets
+        for position, sheet in enumerate(sheets):
+            total = sheet.max_row or 0
+            top = 0
+            block = []
+            for row in sheet.iter_rows(values_only=True):
+                block.append([from_excel_formula(value) if isinstance(value, str) and value.startswith("=")
+                              else value for value in row])
+                if len(block) >= chunk_rows:
+                    done = min(top + len(block), total) / total if total else 0
+                    yield sheet.title, top, block, (position + done) / len(sheets)
+                    top += len(block)
+                    block = []
+            yield sheet.title, top, block, (position + 1) / len(sheets)
+    finally:
+        workbook.close()
+
+
+def write_xlsx(path, names, model_for, progress=None):
+    """Écrit les feuilles en XLSX (mode écriture seule, en flux).
+
+    `model_for(nom)` n'est appelé qu'au moment d'écrire la feuille, pour ne
+    garder en mémoire que celle en cours d'écriture.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    for position, name in enumerate(names):
+        model = model_for(name)
+        sheet = workbook.create_sheet(title=name)
+        with sheet_lock(model):
+            for _, block, fraction in _iter_row_chunks(model, values_only=False):
+                for row in block:
+                    sheet.append([_xlsx_output(value) for value in row])
+                if progress is not None and progress((position + fraction) / len(names)) is False:
+                    return False
+    workbook.save(path)
+    return True
+
+
+def _xlsx_output(value):
+    if isinstance(value, ErrorValue):
+        return str(value)
+    if isinstance(value, str) and value.startswith("=") and len(value) > 1:
+        # Excel ne lit que les noms de fonctions anglais
+        return to_excel_formula(value)
+    return value
+
+
+# Point d'entrée commun aux applications
+
+def open_workbook(path, add_sheet, progress=None):
+    """Charge un classeur (.csv, .xlsx ou .nxs) dans des modèles de feuilles.
+
+    `add_sheet(nom)` crée la feuille et renvoie son modèle ; `progress(fraction)`
+    peut renvoyer False pour interrompre le chargement. Les données sont
+    versées bloc par bloc dans les modèles, sans seconde copie en mémoire.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".nxs":
+        return _open_native(path, add_sheet, progress)
+    if extension == ".csv":
+        sheet = os.path.splitext(os.path.basename(path))[0]
+        chunks = ((sheet, top, block, fraction) for top, block, fraction in iter_csv(path))
+    elif extension in (".xlsx", ".xlsm"):
+        chunks = iter_xlsx(path)
+    else:
+        raise WorkbookFormatError(f"Format non pris en charge : {extension}")
+
+    name = model = None
+    try:
+        for sheet_name, top, block, fraction in chunks:
+            if sheet_name != name:
+                # Feuille précédente complète : ses formules peuvent être calculées
+                if model is not None:
+                    model.recalculate_all()
+                name, model = sheet_name, add_sheet(sheet_name)
+            model.set_block(top, 0, block, recalculate=False, undoable=False)
+            if progress is not None and progress(fraction) is False:
+                return False
+    finally:
+        if model is not None:
+            model.recalculate_all()
+    return True
+
+
+def _open_native(path, add_sheet, progress):
+    reader = NativeReader(path)
+    # Les feuilles restent dans le fichier projeté : seul l'index est lu
+    for done, sheet in enumerate(reader.sheets):
+        model = add_sheet(sheet["name"])
+        model.ensure_size(sheet["rows"], sheet["columns"])
+        with model.loading(MappedCellStore(reader, sheet)):
+            if model.engine is not None:
+                # Les valeurs calculées sont enregistrées : pas de recalcul
+                model.engine.set_cells(reader.formulas(sheet), recalculate=False)
+        if progress is not None and progress((done + 1) / len(reader.sheets)) is False:
+            return False
+    return True
+
+
+def save_workbook(path, names, model_for, progress=None):
+    """Enregistre les feuilles `names` selon l'extension du fichier.
+
+    Le CSV ne contient que la première feuille et ses valeurs calculées.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return write_csv(path, model_for(names[0]), progress)
+    if extension in (".xlsx", ".xlsm"):
+        return write_xlsx(path, names, model_for, progress)
+    if extension == ".nxs":
+        return write_native(path, names, model_for, progress)
+    raise WorkbookFormatError(f"Format non pris en charge : {extension}")
@@ -1,20 +1,19 @@
 import flet as ft
 import pandas as pd
 import numpy as np
-from components.data_view import DataView
-from components.visualization import VisualizationView
-from components.map_view import MapView
-from components.statistics import StatisticsView
 from components.sidebar import Sidebar
 from components.content import Content
 from components.header import Header
 from utils.data_loader import load_csv, load_excel
+from utils.dataset_store import DatasetStore
 
 class App(ft.Control):
     def __init__(self):
         super().__init__()
-        self.current_data = None
+        # Single copy of the loaded data, shared by every view
+        self.store = DatasetStore()
         self.current_view = None
+        # Views by name, built and registered once by main()
         self.views = {}
         self.sidebar = Sidebar()
         self.content = Content()
@@ -24,14 +23,6 @@ class App(ft.Control):
         return "App"
 
     def build(self):
-        # Créer les vues
-        self.views = {
-            "data": DataView(self),
-            "visualization": VisualizationView(self),
-            "map": MapView(self),
-            "statistics": StatisticsView(self)
-        }
-
         # Créer la mise en page principale
         return ft.Container(
             content=ft.Column(
@@ -50,6 +41,11 @@ class App(ft.Control):
             expand=True,
         )
 
+    @property
+    def current_data(self):
+        """Vue en lecture seule du jeu de données courant (voir DatasetStore)"""
+        return self.store.view()
+
     def switch_view(self, view_name: str):
         """Change la vue actuelle"""
         if view_name in self.views:
@@ -9,8 +9,14 @@ class Content(ft.Control):
         return "Content"
 
     def update_content(self, new_content):
+        previous = self.current_content
+        if previous is not new_content and hasattr(previous, "hide"):
+            previous.hide()
         self.current_content = new_content
         self.update()
+        # Views fed by the dataset store catch up once they are on screen
+        if hasattr(new_content, "show"):
+            new_content.show()
 
     def build(self):
         return ft.Container(
@@ -1,12 +1,24 @@
 import flet as ft
-import pandas as pd
 import openpyxl
+from utils.data_loader import (ARROW_FORMATS, arrow_dataset, excel_sheet_names, filter_expression,
+                               is_arrow_file, parse_filters)
+from utils.ingestion import IngestionJob
+from utils.ingestion_cache import IngestionCache
 
 class DataImportView(ft.Control):
-    def __init__(self):
+    def __init__(self, store):
         super().__init__()
+        self.store = store
         self.file_picker = ft.FilePicker()
         self.data = None
+        self.job = None
+        # Parsed CSV/Excel files are kept on disk: re-importing one is a Feather read
+        self.cache = IngestionCache()
+        self.progress_bar = ft.ProgressBar(value=0, width=400, visible=False)
+        self.progress_text = ft.Text("", color=ft.colors.GREY_700)
+        self.cancel_button = ft.TextButton(
+            "Cancel", icon=ft.icons.CANCEL, on_click=self._cancel_import, visible=False
+        )
         self.preview_table = ft.DataTable(
             columns=[],
             rows=[],
@@ -41,9 +53,21 @@ class DataImportView(ft.Control):
                                 on_result=self._handle_file_pick,
                             ),
                         ),
+                        ft.ElevatedButton(
+                            "Import Parquet / Arrow",
+                            icon=ft.icons.UPLOAD_FILE,
+                            on_click=lambda _: self.file_picker.pick_files(
+                                allowed_extensions=list(ARROW_FORMATS),
+                                on_result=self._handle_file_pick,
+                            ),
+                        ),
                     ],
                     alignment=ft.MainAxisAlignment.CENTER,
                 ),
+                ft.Row(
+                    controls=[self.progress_bar, self.progress_text, self.cancel_button],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                ),
                 ft.Container(
                     content=self.preview_table,
                     padding=10,
@@ -60,24 +84,215 @@ class DataImportView(ft.Control):
             return
 
         file_path = e.files[0].path
-        file_extension = file_path.split(".")[-1].lower()
+        if is_arrow_file(file_path):
+            # Columnar files: ask which columns and rows to read first
+            self._show_arrow_options(file_path)
+        elif file_path.split(".")[-1].lower() in ["xlsx", "xls"]:
+            # Workbooks: ask which sheet and which rows to read first
+            self._show_excel_options(file_path)
+        elif file_path.split(".")[-1].lower() == "csv":
+            self._start_import(file_path)
 
+    def _show_arrow_options(self, file_path):
         try:
-            if file_extension == "csv":
-                self.data = pd.read_csv(file_path)
-            elif file_extension in ["xlsx", "xls"]:
-                self.data = pd.read_excel(file_path)
+            schema = arrow_dataset(file_path).schema
+        except Exception as e:
+            self.page.show_snack_bar(
+                ft.SnackBar(content=ft.Text(f"Error loading file: {str(e)}"))
+            )
+            return
 
-            # Update preview table
-            self._update_preview_table()
-            
-            # Dispatch event to update other views
-            self.page.dispatch("data_update", {"data": self.data})
+        names = schema.names
+        checkboxes = [ft.Checkbox(label=name, value=True) for name in names]
+        filters = ft.TextField(
+            label="Row filters",
+            hint_text="year >= 2020, country == FR",
+        )
+
+        def load(_):
+            try:
+                row_filters = parse_filters(filters.value or "")
+                # Unknown columns and values of the wrong type are reported here
+                filter_expression(row_filters, schema)
+            except (ValueError, NotImplementedError) as error:
+                filters.error_text = str(error)
+                filters.update()
+                return
+            selected = [box.label for box in checkboxes if box.value]
+            dialog.open = False
+            self.page.update()
+            self._start_import(
+                file_path,
+                columns=selected if len(selected) < len(names) else None,
+                filters=row_filters,
+            )
 
+        def close(_):
+            dialog.open = False
+            self.page.update()
+
+        dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(f"Import {file_path.split('/')[-1]}"),
+            content=ft.Column(
+                controls=[
+                    ft.Text("Columns to load"),
+                    ft.Column(controls=checkboxes, scroll=ft.ScrollMode.AUTO, height=300),
+                    filters,
+                ],
+                tight=True,
+                width=400,
+            ),
+            actions=[
+                ft.TextButton("Cancel", on_click=close),
+                ft.ElevatedButton("Load", on_click=load),
+            ],
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+
+    def _show_excel_options(self, file_path):
+        try:
+            sheets = excel_sheet_names(file_path)
         except Exception as e:
             self.page.show_snack_bar(
                 ft.SnackBar(content=ft.Text(f"Error loading file: {str(e)}"))
             )
+            return
+
+        sheet = ft.Dropdown(
+            label="Sheet",
+            options=[ft.dropdown.Option(name) for name in sheets],
+            value=sheets[0] if sheets else None,
+        )
+        start_row = ft.TextField(label="First row", hint_text="2", keyboard_type=ft.KeyboardType.NUMBER)
+        end_row = ft.TextField(label="Last row", hint_text="end of sheet", keyboard_type=ft.KeyboardType.NUMBER)
+
+        def row_number(field):
+            # Excel row numbers; row 1 holds the column names
+            text = (field.value or "").strip()
+            if not text:
+                return None
+            if not text.isdigit() or int(text) < 2:
+                raise ValueError("Enter a row number of 2 or more")
+            return int(text)
+
+        def load(_):
+            rows = []
+            for field in (start_row, end_row):
+                try:
+                    rows.append(row_number(field))
+                    field.error_text = None
+                except ValueError as error:
+                    field.error_text = str(error)
+            if None not in rows and rows[1] < rows[0]:
+                end_row.error_text = "Last row is before first row"
+            if start_row.error_text or end_row.error_text:
+                self.page.update()
+                return
+            dialog.open = False
+            self.page.update()
+            self._start_import(file_path, sheet=sheet.value, start_row=rows[0], end_row=rows[1])
+
+        def close(_):
+            dialog.open = False
+            self.page.update()
+
+        dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(f"Import {file_path.split('/')[-1]}"),
+            content=ft.Column(
+                controls=[sheet, ft.Row(controls=[start_row, end_row])],
+                tight=True,
+                width=400,
+            ),
+            actions=[
+                ft.TextButton("Cancel", on_click=close),
+                ft.ElevatedButton("Load", on_click=load),
+            ],
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+
+    def _start_import(self, file_path, columns=None, filters=None, sheet=None,
+                      start_row=None, end_row=None):
+        # The file is read in chunks on a worker thread: the session stays
+        # responsive and the preview shows as soon as the first chunk is parsed
+        if self.job is not None:
+            self.job.cancel()
+        # Callbacks get the job that fired them: a cancelled or replaced job
+        # finishing late must not touch the current import
+        job = IngestionJob(
+            file_path,
+            on_preview=lambda chunk: self._show_preview(job, chunk),
+            on_progress=lambda *progress: self._show_progress(job, *progress),
+            on_done=lambda data: self._import_done(job, data),
+            on_error=lambda error: self._import_failed(job, error),
+            columns=columns,
+            filters=filters,
+            cache=self.cache,
+            sheet=sheet,
+            start_row=start_row,
+            end_row=end_row,
+        )
+        self.job = job
+        self._set_importing(True, "Reading file...")
+        job.start()
+
+    def _set_importing(self, importing, message):
+        self.progress_bar.visible = importing
+        self.progress_bar.value = 0 if importing else None
+        self.cancel_button.visible = importing
+        self.progress_text.value = message
+        self.page.update(self.progress_bar, self.progress_text, self.cancel_button)
+
+    def _cancel_import(self, e):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+            self._set_importing(False, "Import cancelled")
+
+    def _show_preview(self, job, chunk):
+        if job is not self.job:
+            return
+        self.data = chunk
+        self._update_preview_table()
+
+    def _show_progress(self, job, rows, fraction, rows_per_second):
+        if job is not self.job:
+            return
+        # No fraction for filtered Arrow files: the bar stays indeterminate
+        self.progress_bar.value = fraction
+        done = "" if fraction is None else f" - {fraction:.0%}"
+        self.progress_text.value = f"{rows:,} rows{done} - {rows_per_second:,.0f} rows/s"
+        self.page.update(self.progress_bar, self.progress_text)
+
+    def _import_done(self, job, data):
+        if job is not self.job:
+            return
+        self.job = None
+        self.data = data
+        message = f"{len(data):,} rows loaded"
+        if job.from_cache:
+            message += " from cache"
+        elif job.memory_before:
+            message += (f" - {job.memory_after / 1e6:,.1f} MB"
+                        f" ({(job.memory_before - job.memory_after) / 1e6:,.1f} MB saved by dtype optimization)")
+        self._set_importing(False, message)
+
+        # Publish a new dataset version; views recompute when they are shown
+        self.store.publish(self.data)
+
+    def _import_failed(self, job, error):
+        if job is not self.job:
+            return
+        self.job = None
+        self._set_importing(False, "")
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(f"Error loading file: {str(error)}"))
+        )
 
     def _update_preview_table(self):
         if self.data is None:
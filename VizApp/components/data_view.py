@@ -1,11 +1,13 @@
 import flet as ft
 import pandas as pd
 import numpy as np
+from components.dataset_consumer import DatasetConsumer
 
-class DataView(ft.Control):
+class DataView(DatasetConsumer, ft.Control):
     def __init__(self, app):
         super().__init__()
         self.app = app
+        self.bind_store(app.store)
         self.df = None
 
     def _get_control_name(self):
@@ -61,7 +63,6 @@ class DataView(ft.Control):
     def update_data(self, df: pd.DataFrame):
         """Met à jour l'affichage avec un nouveau DataFrame"""
         self.df = df
-        self.app.current_data = df
 
         # Mise à jour des informations
         dimensions = f"{df.shape[0]} lignes × {df.shape[1]} colonnes"
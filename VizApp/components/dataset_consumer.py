@@ -0,0 +1,37 @@
+class DatasetConsumer:
+    """Vue alimentée par le DatasetStore de l'application.
+
+    Une nouvelle version du jeu de données marque seulement la vue comme
+    périmée ; update_data() n'est appelé qu'à l'affichage de la vue (show(),
+    appelé par Content), ou tout de suite si elle est déjà affichée.
+    """
+
+    def bind_store(self, store):
+        self.store = store
+        self.data_version = 0  # version du jeu de données affichée par la vue
+        self.shown = False
+        store.subscribe(self._dataset_changed)
+
+    @property
+    def stale(self) -> bool:
+        return self.data_version != self.store.version
+
+    def _dataset_changed(self, version):
+        if self.shown:
+            self.refresh()
+
+    def show(self):
+        self.shown = True
+        if self.stale:
+            self.refresh()
+
+    def hide(self):
+        self.shown = False
+
+    def refresh(self):
+        """Met la vue à jour avec la version courante du jeu de données"""
+        version = self.store.version
+        data = self.store.view()
+        if data is not None:
+            self.update_data(data)
+        self.data_version = version
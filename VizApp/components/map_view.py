@@ -5,12 +5,15 @@ import numpy as np
 from folium.plugins import MarkerCluster
 import tempfile
 import os
+from components.dataset_consumer import DatasetConsumer
 
-class MapView(ft.Control):
+class MapView(DatasetConsumer, ft.Control):
     def __init__(self, app):
         super().__init__()
         self.app = app
+        self.bind_store(app.store)
         self.data = None
+        self.columns = None
         self.lat_column = ft.Dropdown(label="Latitude Column", on_change=self.update_map)
         self.lon_column = ft.Dropdown(label="Longitude Column", on_change=self.update_map)
         self.color_column = ft.Dropdown(label="Color Column", on_change=self.update_map)
@@ -21,12 +24,18 @@ class MapView(ft.Control):
 
     def update_data(self, data):
         self.data = data
-        if data is not None:
-            columns = data.columns.tolist()
+        if data is None:
+            return
+        if data.columns.tolist() != self.columns:
+            columns = self.columns = data.columns.tolist()
             self.lat_column.options = [ft.dropdown.Option(col) for col in columns]
             self.lon_column.options = [ft.dropdown.Option(col) for col in columns]
             self.color_column.options = [ft.dropdown.Option(col) for col in columns]
             self.update()
+        elif self.lat_column.value is not None and self.lon_column.value is not None:
+            # Same columns as before: the selections stay, the markers are
+            # redrawn from the new rows
+            self.update_map(None)
 
     def update_map(self, e):
         if self.data is None or self.lat_column.value is None or self.lon_column.value is None:
@@ -3,11 +3,15 @@ import pandas as pd
 import numpy as np
 from scipy import stats
 import statsmodels.api as sm
+from components.dataset_consumer import DatasetConsumer
 
-class StatisticsView(ft.Control):
+class StatisticsView(DatasetConsumer, ft.Control):
     def __init__(self, app):
         super().__init__()
         self.app = app
+        self.bind_store(app.store)
+        self.df = None
+        self.computed_tabs = set()  # onglets à jour pour self.df
 
     def _get_control_name(self):
         return "StatisticsView"
@@ -30,6 +34,7 @@ class StatisticsView(ft.Control):
                     content=self._build_correlation_view()
                 )
             ],
+            on_change=lambda e: self._show_tab(self.tabs.selected_index),
             expand=True
         )
 
@@ -147,22 +152,39 @@ class StatisticsView(ft.Control):
             self.test_results.update()
 
     def update_data(self, df: pd.DataFrame):
-        """Met à jour l'affichage avec un nouveau DataFrame"""
-        # Mise à jour des statistiques descriptives
-        desc_stats = df.describe()
-        desc_stats_text = "Statistiques descriptives:\n\n" + str(desc_stats)
-        self.desc_stats_container.content = ft.Text(desc_stats_text, selectable=True)
-
-        # Mise à jour des options pour les tests statistiques
-        columns = list(df.columns)
-        numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        self.variable1.options = [ft.dropdown.Option(col) for col in numeric_columns]
-        self.variable2.options = [ft.dropdown.Option(col) for col in columns]
-
-        # Mise à jour de la matrice de corrélation
-        corr_matrix = df.select_dtypes(include=[np.number]).corr()
-        corr_text = "Matrice de corrélation:\n\n" + str(corr_matrix)
-        self.correlation_container.content = ft.Text(corr_text, selectable=True)
+        """Met à jour l'affichage avec un nouveau DataFrame.
+
+        Seul l'onglet affiché est calculé ; les autres le sont à leur
+        première ouverture.
+        """
+        self.df = df
+        self.computed_tabs = set()
+        self._show_tab(self.tabs.selected_index)
+
+    def _show_tab(self, index):
+        if self.df is None or index in self.computed_tabs:
+            return
+        self.computed_tabs.add(index)
+        df = self.df
+
+        if index == 0:
+            # Statistiques descriptives
+            desc_stats = df.describe()
+            desc_stats_text = "Statistiques descriptives:\n\n" + str(desc_stats)
+            self.desc_stats_container.content = ft.Text(desc_stats_text, selectable=True)
+
+        elif index == 1:
+            # Options pour les tests statistiques
+            columns = list(df.columns)
+            numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+
+            self.variable1.options = [ft.dropdown.Option(col) for col in numeric_columns]
+            self.variable2.options = [ft.dropdown.Option(col) for col in columns]
+
+        elif index == 2:
+            # Matrice de corrélation
+            corr_matrix = df.select_dtypes(include=[np.number]).corr()
+            corr_text = "Matrice de corrélation:\n\n" + str(corr_matrix)
+            self.correlation_container.content = ft.Text(corr_text, selectable=True)
 
         self.update() 
\ No newline at end of file
@@ -4,12 +4,15 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from plotly.subplots import make_subplots
+from components.dataset_consumer import DatasetConsumer
 
-class VisualizationView(ft.Control):
+class VisualizationView(DatasetConsumer, ft.Control):
     def __init__(self, app):
         super().__init__()
         self.app = app
+        self.bind_store(app.store)
         self.current_plot = None
+        self.columns = None  # colonnes et types des menus déroulants
 
     def _get_control_name(self):
         return "VisualizationView"
@@ -133,6 +136,14 @@ class VisualizationView(ft.Control):
 
     def update_data(self, df: pd.DataFrame):
         """Met à jour les options des menus déroulants en fonction des données"""
+        # Mêmes colonnes qu'avant : les menus et les choix faits restent, et le
+        # graphique affiché est redessiné avec les nouvelles données
+        signature = list(zip(df.columns, df.dtypes.astype(str)))
+        if signature == self.columns:
+            self._update_plot()
+            return
+        self.columns = signature
+
         columns = list(df.columns)
         numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
         categorical_columns = df.select_dtypes(exclude=[np.number]).columns.tolist()
@@ -1,6 +1,7 @@
 import flet as ft
 from components.app import App
 from components.data_import_view import DataImportView
+from components.data_view import DataView
 from components.visualization import VisualizationView
 from components.statistics import StatisticsView
 from components.map_view import MapView
@@ -19,7 +20,8 @@ def main(page: ft.Page):
     app = App()
 
     # Create views with the app instance
-    data_import_view = DataImportView()
+    data_import_view = DataImportView(app.store)
+    data_view = DataView(app)
     visualization_view = VisualizationView(app)
     statistics_view = StatisticsView(app)
     map_view = MapView(app)
@@ -27,27 +29,26 @@ def main(page: ft.Page):
     # Add views to the page
     page.add(app)
 
-    # Handle data update events
-    def handle_data_update(e):
-        data = e.data
-        visualization_view.update_data(data)
-        statistics_view.update_data(data)
-        map_view.update_data(data)
+    # Sidebar entries and the views they open; a view computes its content
+    # from the current dataset only once it is shown (see DatasetConsumer)
+    views = {
+        "data_import": data_import_view,
+        "data_overview": data_view,
+        "visualization": visualization_view,
+        "statistics": statistics_view,
+        "map": map_view,
+        "maps": map_view,
+    }
+
+    app.views = views
 
     # Handle view change events
     def handle_view_change(e):
-        view_name = e.data
-        if view_name == "data_import":
-            app.content.update_content(data_import_view)
-        elif view_name == "visualization":
-            app.content.update_content(visualization_view)
-        elif view_name == "statistics":
-            app.content.update_content(statistics_view)
-        elif view_name == "map":
-            app.content.update_content(map_view)
+        # The sidebar sends {"view": name}
+        view_name = e.data["view"] if isinstance(e.data, dict) else e.data
+        app.switch_view(view_name)
 
     # Add event handlers
-    page.event_handlers["data_update"] = handle_data_update
     page.event_handlers["view_change"] = handle_view_change
 
     # Update the page
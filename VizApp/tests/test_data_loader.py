@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+from utils.data_loader import iter_arrow_batches
+
+
+@pytest.fixture
+def parquet(tmp_path):
+    path = str(tmp_path / "data.parquet")
+    pd.DataFrame({"year": range(2000, 2100), "value": range(100)}).to_parquet(path)
+    return path
+
+
+def test_arrow_progress_from_metadata(parquet):
+    fractions = [fraction for _, fraction in iter_arrow_batches(parquet, chunk_rows=30)]
+    assert fractions[-1] == 1.0 and fractions == sorted(fractions)
+
+
+def test_filtered_arrow_progress_is_indeterminate(parquet):
+    batches = list(iter_arrow_batches(parquet, filters=[("year", ">=", "2090")], chunk_rows=30))
+    assert sum(batch.num_rows for batch, _ in batches) == 10
+    assert all(fraction is None for _, fraction in batches)
@@ -0,0 +1,27 @@
+import pandas as pd
+from utils.dataset_store import DatasetStore
+
+
+def test_publish_notifies_subscribers_with_version():
+    store = DatasetStore()
+    seen = []
+    store.subscribe(seen.append)
+    assert store.publish(pd.DataFrame({"a": [1]})) == 1
+    store.unsubscribe(seen.append)
+    store.publish(pd.DataFrame({"a": [2]}))
+    assert seen == [1]
+    assert store.version == 2
+
+
+def test_views_do_not_change_the_published_data():
+    source = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    store = DatasetStore()
+    store.publish(source)
+    view = store.view()
+    view["a"] = view["a"] * 10
+    view["c"] = 0
+    source["b"] = ["z", "z"]
+    assert store.view().columns.tolist() == ["a", "b"]
+    assert store.view()["a"].tolist() == [1, 2]
+    assert store.view()["b"].tolist() == ["x", "y"]
+
@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+from utils import ingestion_cache
+from utils.ingestion_cache import IngestionCache
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Chemins des fichiers hachés"""
+    paths = []
+    digest = ingestion_cache.content_digest
+
+    def counting_digest(path):
+        paths.append(path)
+        return digest(path)
+    monkeypatch.setattr(ingestion_cache, "content_digest", counting_digest)
+    return paths
+
+
+def write_csv(path, rows):
+    pd.DataFrame({"n": range(rows)}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_directory_created_on_first_store(tmp_path):
+    directory = tmp_path / "cache"
+    cache = IngestionCache(str(directory))
+    source = write_csv(tmp_path / "data.csv", 10)
+    assert cache.load(source) is None
+    assert not directory.exists()
+    assert cache.store(source, pd.DataFrame({"n": range(10)}))
+    assert directory.exists()
+
+
+def test_miss_does_not_hash_and_hit_reads_index(tmp_path, hashed):
+    cache = IngestionCache(str(tmp_path / "cache"))
+    source = write_csv(tmp_path / "data.csv", 10)
+    assert cache.load(source, {"optimize": True}) is None
+    assert hashed == []
+
+    cache.store(source, pd.DataFrame({"n": range(10)}), {"optimize": True})
+    assert len(hashed) == 1
+    data = cache.load(source, {"optimize": True})
+    assert data["n"].tolist() == list(range(10))
+    assert cache.load(source, {"optimize": False}) is None
+    assert len(hashed) == 1
+
+
+def test_copy_found_by_content(tmp_path, hashed):
+    cache = IngestionCache(str(tmp_path / "cache"))
+    source = write_csv(tmp_path / "data.csv", 10)
+    cache.store(source, pd.DataFrame({"n": range(10)}))
+    copy = str(tmp_path / "copy.csv")
+    shutil.copyfile(source, copy)
+    assert cache.load(copy) is not None
+    # Fichier de taille différente : inconnu sans être haché
+    hashed.clear()
+    assert cache.load(write_csv(tmp_path / "other.csv", 20)) is None
+    assert hashed == []
+
+
+def test_eviction_prunes_index(tmp_path):
+    directory = tmp_path / "cache"
+    cache = IngestionCache(str(directory), max_bytes=0)
+    for number in range(3):
+        source = write_csv(tmp_path / f"data{number}.csv", 10 + number)
+        cache.store(source, pd.DataFrame({"n": range(10 + number)}))
+    assert cache.size() == 0
+    with open(directory / "index.json", encoding="utf-8") as handle:
+        assert json.load(handle) == {}
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_store_failures_are_not_raised(tmp_path):
+    data = pd.DataFrame({"n": range(10)})
+    # Fichier source supprimé pendant l'import
+    cache = IngestionCache(str(tmp_path / "cache"))
+    source = write_csv(tmp_path / "gone.csv", 10)
+    os.remove(source)
+    assert cache.store(source, data) is False
+    # Répertoire du cache impossible à créer
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    source = write_csv(tmp_path / "data.csv", 10)
+    assert IngestionCache(str(blocked / "cache")).store(source, data) is False
+
+
+def test_job_finishes_when_cache_cannot_store(tmp_path):
+    from utils.ingestion import IngestionJob
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    source = write_csv(tmp_path / "data.csv", 10)
+    done, errors = [], []
+    job = IngestionJob(source, on_done=lambda data, *args: done.append(data),
+                       on_error=errors.append, cache=IngestionCache(str(blocked / "cache")))
+    job.run()
+    assert len(done[0]) == 10 and errors == []
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+from utils.schema import apply_schema, concat_chunks, infer_schema
+
+
+def ingest(chunks):
+    """Convertit des blocs comme IngestionJob : schéma choisi sur le premier"""
+    schema = infer_schema(chunks[0])
+    return concat_chunks([apply_schema(chunk, schema) for chunk in chunks]), schema
+
+
+def test_schema_applies_to_every_chunk():
+    chunks = [pd.DataFrame({"n": [1, 2], "city": ["Paris", "Paris"], "day": ["2024-01-01", "2024-01-02"]}),
+              pd.DataFrame({"n": [3, None], "city": ["Lyon", "Lyon"], "day": ["2024-02-01", None]})]
+    data, _ = ingest(chunks)
+    assert data["n"].tolist()[:3] == [1, 2, 3]
+    assert isinstance(data["city"].dtype, pd.CategoricalDtype)
+    assert list(data["city"]) == ["Paris", "Paris", "Lyon", "Lyon"]
+    assert pd.api.types.is_datetime64_any_dtype(data["day"])
+
+
+def test_bad_date_in_later_chunk_keeps_text(tmp_path):
+    chunks = [pd.DataFrame({"day": ["2024-01-01", "2024-01-02"]}),
+              pd.DataFrame({"day": ["2024-02-01", "pas une date"]}),
+              pd.DataFrame({"day": ["2024-03-01", None]})]
+    data, schema = ingest(chunks)
+    assert "day" not in schema
+    assert [None if pd.isna(value) else value for value in data["day"]] == [
+        "2024-01-01", "2024-01-02", "2024-02-01", "pas une date", "2024-03-01", None]
+    # Une colonne homogène passe par le cache Feather
+    pytest.importorskip("pyarrow")
+    data.to_feather(tmp_path / "data.feather")
+
+
+@pytest.mark.parametrize("first, later, expected", [
+    ([1, 2], ["3", "n/a"], ["1", "2", "3", "n/a"]),
+    ([1.0, None], ["x", "y"], ["1", None, "x", "y"]),
+    (["a", "a"], [1, 2], ["a", "a", "1", "2"]),
+])
+def test_text_after_numbers(first, later, expected, tmp_path):
+    data, _ = ingest([pd.DataFrame({"col": first}), pd.DataFrame({"col": later})])
+    assert [None if pd.isna(value) else value for value in data["col"]] == expected
+    pytest.importorskip("pyarrow")
+    data.to_feather(tmp_path / "data.feather")
+
+
+def test_integer_chunks_keep_exact_values():
+    big = 2 ** 62 + 1
+    data, _ = ingest([pd.DataFrame({"id": [big, big + 2]}), pd.DataFrame({"id": [7, -5]})])
+    assert data["id"].dtype == "int64"
+    assert data["id"].tolist() == [big, big + 2, 7, -5]
+
+
+def test_small_integer_chunks_widen_to_a_common_integer():
+    data, _ = ingest([pd.DataFrame({"n": [1, 2]}), pd.DataFrame({"n": [300, -1]})])
+    assert data["n"].dtype == "int16"
+    assert data["n"].tolist() == [1, 2, 300, -1]
+
+
+def test_ingestion_job_keeps_large_ids(tmp_path):
+    from utils.ingestion import IngestionJob
+    path = tmp_path / "ids.csv"
+    ids = [2 ** 62 + 1, 2 ** 62 + 3, 12, -5]
+    path.write_text("id\n" + "\n".join(map(str, ids)) + "\n")
+    done = []
+    IngestionJob(str(path), on_done=lambda data, *args: done.append(data), chunk_rows=2).run()
+    assert done[0]["id"].tolist() == ids
+    assert done[0]["id"].dtype.kind == "i"
@@ -0,0 +1,61 @@
+import datetime
+import openpyxl
+import pandas as pd
+import pytest
+from utils.schema import concat_chunks
+from utils.xlsx_reader import XlsxReader, read_xlsx
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "data.xlsx")
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(["day", "flag", "label", "amount"])
+    for row in range(200):
+        late = row >= 150
+        # Fin de feuille : un nombre sans format de date, un code numérique,
+        # un texte parmi des nombres
+        day = 45000 + row if late else datetime.date(2023, 3, 1) + datetime.timedelta(days=row)
+        sheet.append([day, row % 3 == 0, 100 + row if late else f"code {row % 4}",
+                      "n/a" if row == 199 else row * 1.5])
+    sheet.append([None, None, None, None])
+    book.save(path)
+    return path
+
+
+def read_chunks(path):
+    with XlsxReader(path) as reader:
+        # Petites tranches : plusieurs blocs, le type est choisi sur le premier
+        return [chunk for chunk, _ in reader.iter_chunks(block_bytes=4096)]
+
+
+def test_column_kind_fixed_by_first_chunk(workbook):
+    chunks = read_chunks(workbook)
+    assert len(chunks) > 2
+    assert all(pd.api.types.is_datetime64_any_dtype(chunk["day"]) for chunk in chunks)
+    assert all(pd.api.types.is_bool_dtype(chunk["flag"]) for chunk in chunks)
+    assert all(isinstance(chunk["label"].dtype, pd.CategoricalDtype) for chunk in chunks)
+
+
+def test_read_xlsx_types(workbook):
+    data = read_xlsx(workbook)
+    assert len(data) == 200
+    assert data["day"].iloc[0] == pd.Timestamp("2023-03-01")
+    assert data["day"].iloc[150] == pd.Timestamp("1899-12-30") + pd.Timedelta(days=45150)
+    assert data["flag"].dtype == bool and data["flag"].tolist()[:4] == [True, False, False, True]
+    assert data["label"].iloc[0] == "code 0" and data["label"].iloc[150] == "250"
+    # Texte dans le dernier bloc d'une colonne de nombres : textes partout
+    assert data["amount"].iloc[1] == "1.5" and data["amount"].iloc[199] == "n/a"
+
+
+def test_bool_column_with_gaps(tmp_path):
+    path = str(tmp_path / "bools.xlsx")
+    book = openpyxl.Workbook()
+    book.active.append(["flag"])
+    for value in (True, None, False):
+        book.active.append([value])
+    book.save(path)
+    data = concat_chunks(read_chunks(path))
+    assert data["flag"].dtype == "boolean"
+    assert data["flag"].tolist() == [True, pd.NA, False]
@@ -1,10 +1,159 @@
+import os
+import re
 import pandas as pd
-import openpyxl
+import pyarrow as pa
+import pyarrow.dataset as ds
+from utils.schema import optimize_dtypes
+from utils.xlsx_reader import XlsxReader, read_xlsx, xlsx_sheet_names
 
-def load_csv(file_path: str) -> pd.DataFrame:
-    """Charge un fichier CSV dans un DataFrame pandas"""
-    return pd.read_csv(file_path)
+# Nombre de lignes lues par bloc lors d'un import progressif
+CHUNK_ROWS = 50_000
 
-def load_excel(file_path: str) -> pd.DataFrame:
-    """Charge un fichier Excel dans un DataFrame pandas"""
-    return pd.read_excel(file_path) 
\ No newline at end of file
+# Format pyarrow.dataset de chaque extension de fichier Arrow (Feather v2 est
+# le format de fichier Arrow IPC)
+ARROW_FORMATS = {"parquet": "parquet", "feather": "feather", "arrow": "ipc", "ipc": "ipc"}
+
+_FILTER = re.compile(r"^\s*(.+?)\s*(==|!=|>=|<=|>|<|=)\s*(.+?)\s*$")
+_OPERATORS = {
+    "==": lambda field, value: field == value,
+    "=": lambda field, value: field == value,
+    "!=": lambda field, value: field != value,
+    ">=": lambda field, value: field >= value,
+    "<=": lambda field, value: field <= value,
+    ">": lambda field, value: field > value,
+    "<": lambda field, value: field < value,
+}
+
+def load_csv(file_path: str, optimize: bool = True) -> pd.DataFrame:
+    """Charge un fichier CSV dans un DataFrame pandas (types réduits, voir utils.schema)"""
+    data = pd.read_csv(file_path)
+    return optimize_dtypes(data)[0] if optimize else data
+
+def load_excel(file_path: str, optimize: bool = True, sheet=None,
+               start_row: int = None, end_row: int = None) -> pd.DataFrame:
+    """Charge une feuille d'un classeur Excel (types réduits, voir utils.schema).
+
+    `sheet` : nom ou position de la feuille, la première par défaut ;
+    start_row et end_row : numéros Excel des lignes gardées, bornes comprises.
+    """
+    if is_old_excel(file_path):
+        data = _read_xls(file_path, sheet, start_row, end_row)
+    else:
+        data = read_xlsx(file_path, sheet, start_row, end_row)
+    return optimize_dtypes(data)[0] if optimize else data
+
+def iter_csv_chunks(file_path: str, chunk_rows: int = CHUNK_ROWS):
+    """Lit un CSV par blocs : produit (DataFrame du bloc, fraction du fichier lue)"""
+    size = os.path.getsize(file_path) or 1
+    with open(file_path, "rb") as handle:
+        for chunk in pd.read_csv(handle, chunksize=chunk_rows):
+            # Position dans le fichier : approximative, le lecteur lit par tampons
+            yield chunk, min(handle.tell() / size, 1.0)
+
+def is_old_excel(file_path: str) -> bool:
+    return file_path.lower().endswith(".xls")
+
+def _read_xls(file_path, sheet=None, start_row=None, end_row=None):
+    # La ligne 1 est l'en-tête : les lignes de données commencent à 2
+    skip = range(1, start_row - 1) if start_row and start_row > 2 else None
+    rows = end_row - max(start_row or 2, 2) + 1 if end_row else None
+    return pd.read_excel(file_path, sheet_name=sheet or 0, skiprows=skip, nrows=rows)
+
+def iter_excel_chunks(file_path: str, sheet=None, start_row: int = None, end_row: int = None):
+    """Lit une feuille d'un classeur par blocs (voir utils.xlsx_reader).
+
+    Le XML de la feuille est lu en flux, par tranches, sans openpyxl ; la
+    lecture s'arrête après end_row. Les anciens fichiers .xls sont chargés
+    en un seul bloc.
+    """
+    if is_old_excel(file_path):
+        yield _read_xls(file_path, sheet, start_row, end_row), 1.0
+        return
+    with XlsxReader(file_path) as reader:
+        yield from reader.iter_chunks(sheet, start_row, end_row)
+
+def excel_sheet_names(file_path: str) -> list:
+    """Noms des feuilles d'un classeur, lus sans charger les feuilles"""
+    if is_old_excel(file_path):
+        return list(pd.ExcelFile(file_path).sheet_names)
+    return xlsx_sheet_names(file_path)
+
+def is_arrow_file(file_path: str) -> bool:
+    return file_path.split(".")[-1].lower() in ARROW_FORMATS
+
+def arrow_dataset(file_path: str) -> ds.Dataset:
+    """Ouvre un fichier Parquet, Feather ou Arrow IPC sans lire ses données"""
+    return ds.dataset(file_path, format=ARROW_FORMATS[file_path.split(".")[-1].lower()])
+
+def arrow_columns(file_path: str) -> list:
+    """Noms des colonnes d'un fichier Arrow, lus dans ses métadonnées"""
+    return arrow_dataset(file_path).schema.names
+
+def parse_filters(text: str) -> list:
+    """Interprète une saisie "annee >= 2020, pays == FR" : [(colonne, opérateur, texte)]"""
+    filters = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        match = _FILTER.match(part)
+        if match is None:
+            raise ValueError(f"Filtre invalide : {part.strip()}")
+        column, operator, value = match.groups()
+        filters.append((column, operator, value.strip("'\"")))
+    return filters
+
+def filter_expression(filters: list, schema: pa.Schema):
+    """Expression pyarrow des filtres [(colonne, opérateur, valeur)], réunis par "et".
+
+    Les valeurs saisies sont converties au type de leur colonne (nombres,
+    dates, textes) ; None si la liste est vide.
+    """
+    expression = None
+    for column, operator, value in filters:
+        if column not in schema.names:
+            raise ValueError(f"Colonne inconnue : {column}")
+        value = pa.scalar(value).cast(schema.field(column).type)
+        condition = _OPERATORS[operator](ds.field(column), value)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def iter_arrow_batches(file_path: str, columns: list = None, filters: list = None,
+                       chunk_rows: int = CHUNK_ROWS):
+    """Lit un fichier Arrow par lots : produit (RecordBatch, fraction des lignes lue).
+
+    Seules les colonnes demandées sont lues, et les filtres sont appliqués
+    par le lecteur : pour Parquet, les groupes de lignes dont les
+    statistiques excluent le filtre ne sont pas décompressés.
+
+    Le nombre de lignes vient des métadonnées du fichier ; avec des filtres,
+    le compter obligerait à lire le fichier deux fois : la fraction vaut
+    alors None (avancement indéterminé).
+    """
+    dataset = arrow_dataset(file_path)
+    expression = filter_expression(filters or [], dataset.schema)
+    total = (dataset.count_rows() or 1) if expression is None else None
+    read = 0
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=chunk_rows):
+        if batch.num_rows:
+            read += batch.num_rows
+            yield batch, None if total is None else min(read / total, 1.0)
+    if not read:
+        # Aucune ligne retenue : un lot vide donne tout de même les colonnes
+        fields = [dataset.schema.field(name) for name in columns or dataset.schema.names]
+        yield pa.RecordBatch.from_pylist([], schema=pa.schema(fields)), 1.0
+
+def arrow_to_pandas(batches: list) -> pd.DataFrame:
+    """DataFrame des lots lus, converti en une fois.
+
+    La liste est vidée : la table en est le seul propriétaire, et chaque
+    colonne Arrow est libérée dès sa conversion (self_destruct).
+    """
+    table = pa.Table.from_batches(batches)
+    batches.clear()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def load_arrow(file_path: str, columns: list = None, filters: list = None) -> pd.DataFrame:
+    """Charge un fichier Parquet, Feather ou Arrow IPC : colonnes choisies et lignes filtrées"""
+    dataset = arrow_dataset(file_path)
+    table = dataset.to_table(columns=columns, filter=filter_expression(filters or [], dataset.schema))
+    return table.to_pandas(split_blocks=True, self_destruct=True)
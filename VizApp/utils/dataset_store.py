@@ -0,0 +1,62 @@
+import threading
+import pandas as pd
+
+
+class DatasetStore:
+    """Jeu de données courant de l'application, partagé par toutes les vues.
+
+    Le store garde un seul DataFrame, remplacé en bloc par publish() : chaque
+    publication incrémente `version` et prévient les abonnés, qui n'ont rien
+    à refaire tant que la version ne change pas. view() renvoie une vue en
+    lecture seule du DataFrame (copie superficielle, sans copier les
+    données) : remplacer ou ajouter une colonne ne touche que la vue, mais
+    une vue qui modifie des valeurs en place (loc, fillna(inplace=True)...)
+    doit d'abord copier les colonnes concernées, les données étant
+    partagées avant pandas 3.
+
+    publish() peut être appelé depuis un thread d'import ; les abonnés sont
+    alors appelés depuis ce thread.
+    """
+
+    def __init__(self):
+        self._data = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def empty(self) -> bool:
+        return self._data is None
+
+    def view(self):
+        """Vue en lecture seule du jeu de données courant, ou None"""
+        data = self._data
+        return None if data is None else data.copy(deep=False)
+
+    def publish(self, data: pd.DataFrame) -> int:
+        """Remplace le jeu de données ; renvoie sa nouvelle version"""
+        with self._lock:
+            # Copie superficielle : le propriétaire du DataFrame reçu peut
+            # encore y ajouter ou remplacer des colonnes sans toucher au jeu
+            # publié
+            self._data = None if data is None else data.copy(deep=False)
+            self._version += 1
+            version = self._version
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(version)
+        return version
+
+    def subscribe(self, callback):
+        """Appelle callback(version) à chaque nouvelle version du jeu de données"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
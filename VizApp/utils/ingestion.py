@@ -0,0 +1,148 @@
+import threading
+import time
+from utils.data_loader import (CHUNK_ROWS, arrow_to_pandas, is_arrow_file, iter_arrow_batches,
+                               iter_csv_chunks, iter_excel_chunks)
+from utils.schema import SAMPLE_ROWS, apply_schema, concat_chunks, infer_schema, memory_usage
+
+
+class IngestionJob:
+    """Importe un fichier CSV, Excel, Parquet, Feather ou Arrow par blocs, hors
+    du thread de l'interface.
+
+    Les fonctions de rappel sont appelées depuis le thread de travail :
+    - on_preview(df) : dès le premier bloc, pour un aperçu immédiat ;
+    - on_progress(rows, fraction, rows_per_second) : après chaque bloc ;
+      fraction vaut None si l'avancement n'est pas connu (Arrow filtré) ;
+    - on_done(df) : DataFrame complet, si l'import n'a pas été annulé ;
+    - on_error(exception).
+    Après cancel(), plus aucune fonction n'est appelée.
+
+    Avec `optimize`, les types sont choisis sur le premier bloc (voir
+    utils.schema) et appliqués à chaque bloc dès sa lecture : la mémoire
+    occupée pendant l'import est déjà celle du résultat réduit.
+    memory_before et memory_after donnent la taille des blocs avant et
+    après conversion.
+
+    Pour les fichiers Arrow, seules les colonnes `columns` (toutes par
+    défaut) sont lues et les `filters` [(colonne, opérateur, valeur)] sont
+    appliqués par le lecteur. Les lots restent au format Arrow jusqu'à la
+    fin, convertis en une fois ; les types sont alors réduits sur le
+    résultat.
+
+    Pour un classeur Excel, `sheet` choisit la feuille (la première par
+    défaut) et start_row / end_row les lignes lues (numéros Excel).
+
+    Avec un `cache` (IngestionCache), un fichier CSV ou Excel déjà importé
+    avec les mêmes options est relu depuis le cache (from_cache vaut alors
+    True) ; sinon le résultat y est enregistré après on_done.
+    """
+
+    def __init__(self, file_path, on_preview=None, on_progress=None, on_done=None,
+                 on_error=None, chunk_rows=CHUNK_ROWS, optimize=True, arrow_strings=False,
+                 columns=None, filters=None, cache=None, sheet=None, start_row=None, end_row=None):
+        self.file_path = file_path
+        self.arrow = is_arrow_file(file_path)
+        self.columns = columns
+        self.filters = filters
+        self.sheet = sheet
+        self.start_row = start_row
+        self.end_row = end_row
+        self.cache = cache if not self.arrow else None
+        self.from_cache = False
+        self.on_preview = on_preview
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.chunk_rows = chunk_rows
+        self.optimize = optimize
+        self.arrow_strings = arrow_strings
+        self.schema = None
+        self.memory_before = 0
+        self.memory_after = 0
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Arrête l'import au prochain bloc"""
+        self._cancelled.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _chunks(self):
+        if self.arrow:
+            return iter_arrow_batches(self.file_path, self.columns, self.filters, self.chunk_rows)
+        if self.file_path.lower().endswith(".csv"):
+            return iter_csv_chunks(self.file_path, self.chunk_rows)
+        return iter_excel_chunks(self.file_path, self.sheet, self.start_row, self.end_row)
+
+    def _notify(self, callback, *args):
+        if callback is not None and not self.cancelled:
+            callback(*args)
+
+    def _optimize(self, chunk):
+        if self.schema is None:
+            self.schema = infer_schema(chunk.head(SAMPLE_ROWS), self.arrow_strings)
+        self.memory_before += memory_usage(chunk)
+        chunk = apply_schema(chunk, self.schema)
+        self.memory_after += memory_usage(chunk)
+        return chunk
+
+    def _cache_options(self):
+        return {"optimize": self.optimize, "arrow_strings": self.arrow_strings,
+                "sheet": self.sheet, "start_row": self.start_row, "end_row": self.end_row}
+
+    def run(self):
+        """Lit le fichier bloc par bloc (appelé par start() dans un thread)"""
+        chunks = []
+        rows = 0
+        start = time.perf_counter()
+        try:
+            if self.cache is not None:
+                data = self.cache.load(self.file_path, self._cache_options())
+                if data is not None:
+                    self.from_cache = True
+                    elapsed = time.perf_counter() - start
+                    self._notify(self.on_preview, data)
+                    self._notify(self.on_progress, len(data), 1.0, len(data) / elapsed if elapsed else 0.0)
+                    self._notify(self.on_done, data)
+                    return
+            for chunk, fraction in self._chunks():
+                if self.cancelled:
+                    return
+                if self.arrow:
+                    if not chunks:
+                        self._notify(self.on_preview, chunk.to_pandas())
+                else:
+                    if self.optimize:
+                        chunk = self._optimize(chunk)
+                    if not chunks:
+                        self._notify(self.on_preview, chunk)
+                chunks.append(chunk)
+                rows += len(chunk)
+                elapsed = time.perf_counter() - start
+                self._notify(self.on_progress, rows, fraction, rows / elapsed if elapsed else 0.0)
+            if self.cancelled:
+                return
+            if self.arrow:
+                data = arrow_to_pandas(chunks)
+                if self.optimize:
+                    data = self._optimize(data)
+            else:
+                data = concat_chunks(chunks)
+        except Exception as exc:
+            self._notify(self.on_error, exc)
+            return
+        self._notify(self.on_done, data)
+        if self.cache is not None and not self.cancelled:
+            self.cache.store(self.file_path, data, self._cache_options())
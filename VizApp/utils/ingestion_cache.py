@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+import pandas as pd
+
+# Taille totale maximale des fichiers du cache, en octets
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vizapp")
+
+_HASH_BLOCK = 1 << 20
+
+
+def content_digest(file_path: str) -> str:
+    """Empreinte BLAKE2 du contenu d'un fichier, lu par blocs de 1 Mio"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as handle:
+        for block in iter(lambda: handle.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionCache:
+    """Cache disque des DataFrames importés, adressé par le contenu des fichiers.
+
+    Une entrée est un fichier Feather (format colonne Arrow, relu sans
+    analyse) nommé d'après l'empreinte du fichier source et les options
+    d'import. Un index associe (chemin, date de modification, taille) à
+    l'empreinte : un fichier inchangé n'est pas relu pour être haché. Un
+    fichier inconnu de l'index n'est haché avant l'import que si un fichier
+    indexé a la même taille (copie, fichier simplement touché) ; sinon
+    l'import commence tout de suite et l'empreinte n'est calculée qu'à
+    l'enregistrement du résultat.
+
+    La date de modification d'une entrée est mise à jour à chaque lecture ;
+    au-delà de `max_bytes`, les entrées les moins récemment utilisées sont
+    supprimées et l'index ne garde que les fichiers dont une entrée existe.
+    Le répertoire n'est créé qu'au premier enregistrement.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        temporary = self._index_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(index, handle)
+        os.replace(temporary, self._index_path)
+
+    def _entries(self):
+        """Noms des fichiers Feather du cache"""
+        try:
+            return [name for name in os.listdir(self.directory) if name.endswith(".feather")]
+        except FileNotFoundError:
+            return []
+
+    def digest(self, file_path: str) -> str:
+        """Empreinte du fichier, reprise de l'index s'il n'a pas changé"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._read_index().get(path)
+        if known and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+            return known["digest"]
+        return content_digest(path)
+
+    def _lookup_digest(self, path):
+        """Empreinte sous laquelle chercher un fichier, ou None s'il ne peut pas être en cache"""
+        stat = os.stat(path)
+        with self._lock:
+            index = self._read_index()
+        known = index.get(path)
+        if known and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+            return known["digest"]
+        if any(other["size"] == stat.st_size for other in index.values()):
+            # Peut-être la copie d'un fichier importé : seul le contenu le dira
+            return content_digest(path)
+        return None
+
+    def _remember(self, path, digest):
+        """Associe (chemin, date de modification, taille) à l'empreinte dans l'index"""
+        stat = os.stat(path)
+        known = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "digest": digest}
+        with self._lock:
+            index = self._read_index()
+            if index.get(path) != known:
+                index[path] = known
+                self._write_index(index)
+
+    def _entry_path(self, digest, options):
+        # Les options d'import (réduction des types...) changent le résultat
+        key = hashlib.blake2b(json.dumps(options, sort_keys=True, default=str).encode(),
+                              digest_size=8).hexdigest()
+        return os.path.join(self.directory, f"{digest}-{key}.feather")
+
+    def load(self, file_path: str, options=None):
+        """DataFrame en cache pour ce fichier et ces options, ou None"""
+        path = os.path.abspath(file_path)
+        digest = self._lookup_digest(path)
+        if digest is None:
+            return None
+        entry = self._entry_path(digest, options or {})
+        try:
+            data = pd.read_feather(entry)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self._remember(path, digest)
+        return data
+
+    def store(self, file_path: str, data: pd.DataFrame, options=None):
+        """Enregistre un DataFrame importé ; renvoie False s'il ne peut pas l'être.
+
+        Feather exige un index par défaut, des noms de colonnes textuels et
+        des colonnes d'un seul type : un DataFrame qui ne s'y prête pas n'est
+        simplement pas gardé. Le cache étant facultatif, une erreur d'accès
+        (fichier source supprimé pendant l'import, répertoire en lecture
+        seule...) donne aussi False.
+        """
+        try:
+            return self._store(os.path.abspath(file_path), data, options)
+        except OSError:
+            return False
+
+    def _store(self, path, data, options):
+        digest = self.digest(path)
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self._entry_path(digest, options or {})
+        temporary = entry + ".tmp"
+        try:
+            data.to_feather(temporary)
+            os.replace(temporary, entry)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return False
+        self._remember(path, digest)
+        self.evict()
+        return True
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes.
+
+        Les fichiers de l'index dont plus aucune entrée n'existe en sont
+        retirés, pour que l'index ne grossisse pas sans fin.
+        """
+        with self._lock:
+            entries = []
+            for name in self._entries():
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            kept = {name.split("-")[0] for name in self._entries()}
+            index = self._read_index()
+            pruned = {path: known for path, known in index.items() if known["digest"] in kept}
+            if len(pruned) != len(index):
+                self._write_index(pruned)
+
+    def size(self) -> int:
+        """Taille totale des entrées, en octets"""
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in self._entries())
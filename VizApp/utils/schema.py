@@ -0,0 +1,214 @@
+import importlib.util
+import warnings
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Lignes examinées pour choisir le type de chaque colonne
+SAMPLE_ROWS = 10_000
+
+# Une colonne de textes devient `category` si ses valeurs distinctes ne
+# dépassent pas cette proportion des valeurs renseignées de l'échantillon
+CATEGORY_RATIO = 0.5
+
+# Proportion minimale de textes de l'échantillon lus comme des dates pour
+# convertir la colonne ; seules DATE_PROBE valeurs sont essayées, la lecture
+# d'un texte qui n'est pas une date étant lente
+DATE_RATIO = 0.95
+DATE_PROBE = 200
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Mémoire occupée par un DataFrame, chaînes comprises, en octets"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _is_text(series: pd.Series) -> bool:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        # pandas signale les formats qu'il doit deviner valeur par valeur
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(series, errors="coerce")
+
+
+def infer_schema(sample: pd.DataFrame, arrow_strings: bool = False) -> dict:
+    """Choisit un type pour chaque colonne d'après un échantillon.
+
+    Renvoie {colonne: type} avec les types "integer", "float", "category",
+    "datetime" ou "string" (chaînes Arrow, si pyarrow est installé et
+    `arrow_strings` demandé). Les colonnes absentes restent telles quelles.
+    """
+    schema = {}
+    for name, series in sample.items():
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            schema[name] = "integer"
+        elif pd.api.types.is_float_dtype(series):
+            schema[name] = "float"
+        elif _is_text(series):
+            values = series.dropna()
+            if values.empty or not all(isinstance(value, str) for value in values.head(100)):
+                continue
+            if _parse_dates(values.head(DATE_PROBE)).notna().mean() >= DATE_RATIO:
+                schema[name] = "datetime"
+            elif values.nunique() <= CATEGORY_RATIO * len(values):
+                schema[name] = "category"
+            elif arrow_strings and HAS_PYARROW:
+                schema[name] = "string"
+    return schema
+
+
+def _narrow_float(series: pd.Series) -> pd.Series:
+    # float32 seulement si aucune valeur n'est modifiée (entiers, demis...)
+    narrowed = series.astype(np.float32)
+    if np.array_equal(narrowed.to_numpy(np.float64), series.to_numpy(np.float64), equal_nan=True):
+        return narrowed
+    return series
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Convertit les colonnes d'un DataFrame (ou d'un bloc) selon infer_schema.
+
+    Une conversion qui perdrait des valeurs est abandonnée pour la colonne :
+    textes qui ne sont pas des dates ou des nombres, nombres dans une colonne
+    de textes. La colonne est alors retirée de `schema`, pour que les blocs
+    suivants la gardent aussi telle quelle ; concat_chunks ramène les blocs
+    déjà convertis au même type.
+    """
+    columns = {}
+    abandoned = []
+    for name, kind in schema.items():
+        if name not in df.columns:
+            continue
+        series = df[name]
+        if kind == "integer" and pd.api.types.is_integer_dtype(series):
+            unsigned = len(series) and series.min() >= 0
+            columns[name] = pd.to_numeric(series, downcast="unsigned" if unsigned else "integer")
+        elif kind in ("integer", "float") and pd.api.types.is_float_dtype(series):
+            # Une colonne d'entiers devient flottante dans un bloc qui a des vides
+            columns[name] = _narrow_float(series)
+        elif kind == "category" and _is_text(series):
+            columns[name] = series.astype("category")
+        elif kind == "datetime" and _is_text(series):
+            dates = _parse_dates(series)
+            if dates.notna().sum() == series.notna().sum():
+                columns[name] = dates
+        elif kind == "string" and _is_text(series):
+            columns[name] = series.astype("string[pyarrow]")
+        if name not in columns:
+            # Textes parmi des nombres ou des dates, nombres parmi des textes
+            expects_text = kind in ("category", "datetime", "string")
+            if kind == "datetime" or _is_text(series) != expects_text:
+                abandoned.append(name)
+    for name in abandoned:
+        del schema[name]
+    if not columns:
+        return df
+    df = df.copy(deep=False)
+    for name, values in columns.items():
+        df[name] = values
+    return df
+
+
+def _family(series: pd.Series) -> str:
+    """Famille de types d'une colonne ; deux blocs de familles différentes ne se concatènent pas"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return "category"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "text"
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """Valeurs d'une colonne en textes, comme lues sans conversion ; les vides restent vides"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        dates = series.dropna()
+        date_only = (dates == dates.dt.normalize()).all()
+        text = series.dt.strftime("%Y-%m-%d" if date_only else "%Y-%m-%d %H:%M:%S").astype(object)
+        return text.where(series.notna(), None)
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if np.array_equal(values, np.floor(values)):
+            # Entiers devenus flottants à cause des vides : 3 et non 3.0
+            series = series.astype("Int64")
+    text = series.astype(object).map(str, na_action="ignore")
+    return text.where(series.notna(), None)
+
+
+_UNSIGNED = (np.uint8, np.uint16, np.uint32, np.uint64)
+_SIGNED = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _common_integer(columns: list):
+    """Plus petit type entier contenant toutes les valeurs des colonnes, ou object.
+
+    pandas passe en float64 des blocs uint64 et int64 (ids positifs puis -1),
+    ce qui arrondit les grands entiers.
+    """
+    present = [column for column in columns if len(column)]
+    if not present:
+        return columns[0].dtype
+    low = min(int(column.min()) for column in present)
+    high = max(int(column.max()) for column in present)
+    for dtype in _UNSIGNED if low >= 0 else _SIGNED:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    # Négatifs et entiers au-delà de int64 : entiers Python
+    return np.dtype(object)
+
+
+def concat_chunks(chunks: list) -> pd.DataFrame:
+    """Concatène des blocs convertis par apply_schema.
+
+    pandas ramène à `object` des catégories différentes d'un bloc à l'autre :
+    chaque bloc reçoit d'abord l'union des catégories (union_categoricals),
+    sans passer par des chaînes Python. Les entiers et flottants réduits bloc
+    par bloc prennent le type le plus large des blocs.
+
+    Une colonne de types différents d'un bloc à l'autre (conversion
+    abandonnée, textes apparus après des nombres) est en textes dans tous les
+    blocs : la colonne ne mélange jamais textes et dates ou nombres. Des
+    entiers réduits différemment d'un bloc à l'autre prennent un type entier
+    commun à tous les blocs, jamais float64.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    chunks = [chunk.copy(deep=False) for chunk in chunks]
+    for name in chunks[0].columns:
+        if len({_family(chunk[name]) for chunk in chunks}) > 1:
+            for chunk in chunks:
+                chunk[name] = _as_text(chunk[name])
+        columns = [chunk[name] for chunk in chunks]
+        if (all(isinstance(column.dtype, np.dtype) and column.dtype.kind in "iu" for column in columns)
+                and len({column.dtype for column in columns}) > 1):
+            dtype = _common_integer(columns)
+            for chunk in chunks:
+                chunk[name] = chunk[name].astype(dtype)
+    for name, dtype in chunks[0].dtypes.items():
+        if not all(isinstance(chunk[name].dtype, pd.CategoricalDtype) for chunk in chunks):
+            continue
+        categories = union_categoricals([chunk[name] for chunk in chunks]).categories
+        for chunk in chunks:
+            chunk[name] = chunk[name].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def optimize_dtypes(df: pd.DataFrame, sample_rows: int = SAMPLE_ROWS, arrow_strings: bool = False):
+    """Réduit les types d'un DataFrame chargé : renvoie (DataFrame, octets économisés)"""
+    before = memory_usage(df)
+    optimized = apply_schema(df, infer_schema(df.head(sample_rows), arrow_strings))
+    return optimized, before - memory_usage(optimized)
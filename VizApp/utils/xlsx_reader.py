@@ -0,0 +1,446 @@
+import re
+import zipfile
+import posixpath
+from html import unescape
+from xml.etree.ElementTree import fromstring, iterparse, parse
+import numpy as np
+import pandas as pd
+from utils.schema import concat_chunks
+
+# Octets de XML de feuille décompressés et analysés à la fois ; chaque
+# tranche, coupée après une fin de ligne, donne un bloc du résultat
+BLOCK_BYTES = 8 << 20
+
+# Formats de nombre prédéfinis d'Excel qui affichent une date ou une heure
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+
+# Parties d'un format personnalisé sans effet sur le type : textes entre
+# guillemets, couleurs et conditions entre crochets, caractères échappés
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.|_.|\*.')
+
+_OFFICE_RELATIONSHIPS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+# Cellule telle qu'écrite par Excel, LibreOffice, openpyxl ou XlsxWriter :
+# attributs r, s, t dans cet ordre, formule éventuelle, puis valeur ou texte
+# en ligne. Une tranche dont une cellule est écrite autrement est lue par
+# ElementTree.
+_CELL = re.compile(
+    rb'<c r="([A-Z]+)(\d+)"(?: s="(\d+)")?(?: t="(\w+)")?'
+    rb'(?:/>|>(?:<f[^>]*/>|<f[^>]*>[^<]*</f>)?'
+    rb'(?:<v>([^<]*)</v>|<is><t[^>]*>([^<]*)</t></is>)?</c>)'
+)
+
+# Types de cellule : nombre, texte partagé, texte (en ligne ou résultat de
+# formule), booléen, date ISO, erreur
+_NUMBER, _SHARED, _TEXT, _BOOL, _DATE, _ERROR = range(6)
+_KINDS = {"": _NUMBER, "n": _NUMBER, "s": _SHARED, "inlineStr": _TEXT, "str": _TEXT,
+          "b": _BOOL, "d": _DATE, "e": _ERROR}
+
+
+def _is_date_format(code: str) -> bool:
+    return re.search(r"[dmyhs]", _FORMAT_LITERALS.sub("", code).lower()) is not None
+
+
+def _column_index(letters) -> int:
+    """Index d'une colonne : "A" -> 0, "AA" -> 26"""
+    index = 0
+    for letter in letters.decode() if isinstance(letters, bytes) else letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _mangle(names):
+    """Noms de colonnes uniques, comme pandas : "a", "a.1", "a.2"..."""
+    seen = {}
+    result = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        result.append(name if not count else f"{name}.{count}")
+    return result
+
+
+def _filled(columns, rows, styles, kinds, values, texts):
+    """Cellules qui ont une valeur : sans la mise en forme seule ni les erreurs"""
+    keep = (kinds != _ERROR) & ((values != b"") & (values != "") | (kinds == _TEXT))
+    if keep.all():
+        return columns, rows, styles, kinds, values, texts
+    return columns[keep], rows[keep], styles[keep], kinds[keep], values[keep], texts[keep]
+
+
+def _empty_cells():
+    empty = np.empty(0, dtype=object)
+    return (np.empty(0, dtype=np.int16), np.empty(0, dtype=np.int64), empty,
+            np.empty(0, dtype=np.int8), empty, empty)
+
+
+class XlsxReader:
+    """Lecteur de classeur .xlsx en flux, sans openpyxl.
+
+    Le XML de la feuille est décompressé par tranches de BLOCK_BYTES. Les
+    cellules d'une tranche sont relevées en une passe d'expression régulière
+    puis converties colonne par colonne en tableaux NumPy typés : nombres,
+    dates (nombres au format date) et codes de textes. Les textes partagés
+    sont lus une seule fois ; une colonne de textes devient une `category`
+    construite directement sur leurs codes. La mémoire de travail ne dépend
+    que de la taille d'une tranche.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._zip = zipfile.ZipFile(file_path)
+        root = parse(self._zip.open("xl/workbook.xml")).getroot()
+        self._ns = root.tag[1:root.tag.index("}")] if root.tag.startswith("{") else ""
+        properties = root.find(self._tag("workbookPr"))
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        self._epoch = pd.Timestamp("1904-01-01" if date1904 else "1899-12-30")
+        targets = {}
+        for relation in parse(self._zip.open("xl/_rels/workbook.xml.rels")).getroot():
+            target = relation.get("Target")
+            targets[relation.get("Id")] = (target.lstrip("/") if target.startswith("/")
+                                           else posixpath.normpath(posixpath.join("xl", target)))
+        self.sheets = {}  # nom -> chemin de la feuille dans l'archive
+        for sheet in root.iter(self._tag("sheet")):
+            relation = sheet.get(f"{{{_OFFICE_RELATIONSHIPS}}}id") or sheet.get("id")
+            self.sheets[sheet.get("name")] = targets[relation]
+        self._strings = None
+        self._date_styles = None
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _tag(self, name):
+        return f"{{{self._ns}}}{name}" if self._ns else name
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets)
+
+    def _load_strings(self):
+        """Table des textes partagés ; les doublons reçoivent un même code"""
+        self._strings = []
+        self._codes = {}
+        shared = []
+        if "xl/sharedStrings.xml" in self._zip.namelist():
+            si_tag, t_tag, r_tag = self._tag("si"), self._tag("t"), self._tag("r")
+            for _, element in iterparse(self._zip.open("xl/sharedStrings.xml")):
+                if element.tag != si_tag:
+                    continue
+                # Texte simple <t> ou texte enrichi <r><t> ; les annotations
+                # phonétiques <rPh> sont ignorées
+                text = "".join(part.text or "" for child in element if child.tag in (t_tag, r_tag)
+                               for part in ([child] if child.tag == t_tag else child.iter(t_tag)))
+                shared.append(self._code(text))
+                element.clear()
+        self._shared = np.array(shared, dtype=np.int64)  # index dans sharedStrings -> code
+
+    def _code(self, text):
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self._strings)
+            self._strings.append(text)
+        return code
+
+    def _load_styles(self):
+        """Indices (en texte, comme dans le XML) des styles de cellule au format date"""
+        self._date_styles = set()
+        if "xl/styles.xml" not in self._zip.namelist():
+            return
+        root = parse(self._zip.open("xl/styles.xml")).getroot()
+        custom = {int(fmt.get("numFmtId")): fmt.get("formatCode", "")
+                  for fmt in root.iter(self._tag("numFmt"))}
+        cell_formats = root.find(self._tag("cellXfs"))
+        if cell_formats is None:
+            return
+        for index, xf in enumerate(cell_formats):
+            fmt = int(xf.get("numFmtId", 0))
+            if _is_date_format(custom[fmt]) if fmt in custom else fmt in _BUILTIN_DATE_FORMATS:
+                self._date_styles.add(str(index))
+
+    def _sheet_path(self, sheet):
+        if sheet is None:
+            sheet = 0
+        if isinstance(sheet, int):
+            sheet = self.sheet_names[sheet]
+        return self.sheets[sheet]
+
+    def iter_chunks(self, sheet=None, start_row=None, end_row=None, block_bytes=BLOCK_BYTES):
+        """Produit (DataFrame, fraction lue) par tranche du XML de la feuille.
+
+        `sheet` : nom ou position, la première feuille par défaut. La première
+        ligne de la feuille donne les noms de colonnes ; seules les lignes
+        start_row à end_row (numéros Excel, bornes comprises, toute la
+        feuille par défaut) sont gardées, et la lecture s'arrête après end_row.
+        """
+        if self._strings is None:
+            self._load_strings()
+            self._load_styles()
+        path = self._sheet_path(sheet)
+        size = self._zip.getinfo(path).file_size or 1
+        names = None
+        kinds = {}  # colonne -> type de ses valeurs, gardé d'un bloc à l'autre
+        base = None  # numéro de la première ligne du bloc suivant
+        self._row = 0
+        with self._zip.open(path) as stream:
+            text = b""
+            while True:
+                data = stream.read(block_bytes)
+                text += data
+                match = re.search(rb"<(\w+:)?sheetData\b[^>]*?(/?)>", text)
+                if match or not data:
+                    break
+            if match is None or match.group(2):
+                yield pd.DataFrame(), 1.0
+                return
+            # Enveloppe des tranches lues par ElementTree : reprend le préfixe
+            # de <sheetData> et les espaces de noms déclarés par la feuille
+            prefix = match.group(1) or b""
+            declarations = b" ".join(re.findall(rb'xmlns(?::\w+)?="[^"]*"', text[:match.start()]))
+            self._envelope = (b"<" + prefix + b"sheetData " + declarations + b">",
+                              b"</" + prefix + b"sheetData>")
+            row_end = b"</" + prefix + b"row>"
+            text = text[match.end():]
+            finished = exhausted = False
+            while not finished:
+                if (len(text) < block_bytes or row_end not in text) and self._envelope[1] not in text:
+                    data = stream.read(block_bytes)
+                    text += data
+                    exhausted = not data
+                stop = text.find(self._envelope[1])
+                if stop >= 0 or exhausted:
+                    part, text, finished = text[:stop] if stop >= 0 else text, b"", True
+                else:
+                    cut = text.rfind(row_end) + len(row_end)
+                    if cut < len(row_end):
+                        continue
+                    part, text = text[:cut], text[cut:]
+                cells = self._cells(part, prefix)
+                if not len(cells[0]):
+                    continue
+                if names is None:
+                    header = int(cells[1].min())
+                    names = self._header(cells, header)
+                    if start_row is None or start_row <= header:
+                        start_row = header + 1
+                    base = start_row
+                # Les lignes vides en fin de feuille ne sont pas gardées
+                rows = cells[1]
+                last = int(rows.max())
+                keep = rows >= start_row
+                if end_row is not None:
+                    finished = finished or last >= end_row
+                    last = min(last, end_row)
+                    keep &= rows <= end_row
+                if not keep.all():
+                    cells = tuple(values[keep] for values in cells)
+                if last >= base:
+                    yield (self._frame(cells, names, kinds, base, last - base + 1),
+                           min(stream.tell() / size, 1.0))
+                    base = last + 1
+        if names is None:
+            yield pd.DataFrame(), 1.0
+        elif base == start_row:
+            yield self._frame(_empty_cells(), names, kinds, base, 0), 1.0
+
+    def _cells(self, part, prefix):
+        """Cellules d'une tranche : tableaux (colonne, ligne, style, type, valeur, texte en ligne)"""
+        found = _CELL.findall(part) if not prefix else None
+        if found is None or len(found) != part.count(b"<c"):
+            return self._parse_cells(part)
+        if not found:
+            return _empty_cells()
+        letters, rows, styles, types, values, texts = np.array(found, dtype=object).T
+        unique, inverse = np.unique(np.array(letters.tolist()), return_inverse=True)
+        columns = np.array([_column_index(name) for name in unique.tolist()], dtype=np.int16)[inverse]
+        unique, inverse = np.unique(np.array(types.tolist()), return_inverse=True)
+        kinds = np.array([_KINDS.get(kind.decode(), _ERROR) for kind in unique.tolist()],
+                         dtype=np.int8)[inverse]
+        return _filled(columns, np.array(rows.tolist()).astype(np.int64), styles, kinds, values, texts)
+
+    def _parse_cells(self, part):
+        """Variante ElementTree de _cells, pour les cellules écrites autrement"""
+        start, end = self._envelope
+        c_tag, v_tag, is_tag, t_tag = self._tag("c"), self._tag("v"), self._tag("is"), self._tag("t")
+        columns, rows, styles, kinds, values, texts = [], [], [], [], [], []
+        for row in fromstring(start + part + end):
+            number = row.get("r")
+            self._row = int(number) if number else self._row + 1
+            col = -1
+            for cell in row.iter(c_tag):
+                ref = cell.get("r")
+                col = col + 1 if ref is None else _column_index(ref.rstrip("0123456789"))
+                value = cell.find(v_tag)
+                inline = cell.find(is_tag)
+                columns.append(col)
+                rows.append(self._row)
+                styles.append(cell.get("s", ""))
+                kinds.append(_KINDS.get(cell.get("t", "n"), _ERROR))
+                values.append("" if value is None else value.text or "")
+                texts.append("" if inline is None else "".join(t.text or "" for t in inline.iter(t_tag)))
+        if not columns:
+            return _empty_cells()
+        return _filled(np.array(columns, dtype=np.int16), np.array(rows, dtype=np.int64),
+                       np.array(styles, dtype=object), np.array(kinds, dtype=np.int8),
+                       np.array(values, dtype=object), np.array(texts, dtype=object))
+
+    @staticmethod
+    def _text(value):
+        # Les textes relevés par l'expression régulière restent échappés
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+            if "&" in value:
+                value = unescape(value)
+        return value
+
+    def _value(self, kind, value, text, date):
+        """Valeur Python d'une cellule (en-tête, colonnes de types mélangés)"""
+        if kind == _NUMBER:
+            number = float(value)
+            if date:
+                return self._epoch + pd.to_timedelta(number, unit="D")
+            return int(number) if number.is_integer() else number
+        if kind == _SHARED:
+            return self._strings[self._shared[int(value)]]
+        if kind == _TEXT:
+            return self._text(text or value)
+        if kind == _BOOL:
+            return value in (b"1", "1")
+        if kind == _DATE:
+            return pd.Timestamp(self._text(value))
+        return None
+
+    def _dates(self, styles):
+        """Masque des cellules dont le style est un format de date"""
+        unique, inverse = np.unique(np.array(styles.tolist()), return_inverse=True)
+        return np.array([self._text(style) in self._date_styles for style in unique.tolist()],
+                        dtype=bool)[inverse]
+
+    def _header(self, cells, header):
+        """Noms de colonnes lus dans la ligne `header`"""
+        columns, rows, styles, kinds, values, texts = cells
+        names = []
+        for i in np.flatnonzero(rows == header):
+            value = self._value(kinds[i], values[i], texts[i], False)
+            names.extend([None] * (columns[i] + 1 - len(names)))
+            names[columns[i]] = str(value)
+        return names
+
+    def _frame(self, cells, names, kinds, base, rows):
+        """DataFrame des lignes base à base + rows - 1, à partir des cellules d'une tranche"""
+        columns, numbers, styles, cell_kinds, values, texts = cells
+        dates = self._dates(styles) if len(styles) else np.empty(0, dtype=bool)
+        positions = numbers - base
+        order = np.argsort(columns, kind="stable")
+        count = max(len(names), int(columns.max()) + 1 if len(columns) else 0, max(kinds, default=-1) + 1)
+        bounds = np.searchsorted(columns[order], np.arange(count + 1))
+        labels = _mangle([names[col] if col < len(names) and names[col] is not None
+                          else f"Unnamed: {col}" for col in range(count)])
+        data = {}
+        for col in range(count):
+            group = order[bounds[col]:bounds[col + 1]]
+            data[labels[col]] = self._column(kinds, col, rows, positions[group], dates[group],
+                                             cell_kinds[group], values[group], texts[group])
+        return pd.DataFrame(data, index=pd.RangeIndex(rows))
+
+    @staticmethod
+    def _kind(present, dates):
+        """Type d'une colonne d'après les cellules de son premier bloc non vide"""
+        if present == {_NUMBER}:
+            # Dates si la plupart des nombres ont un format de date
+            return "date" if dates.mean() >= 0.5 else "number"
+        if present <= {_SHARED, _TEXT, _NUMBER}:
+            # Textes et nombres : les nombres sont gardés comme textes
+            return "text"
+        if present == {_BOOL}:
+            return "bool"
+        return "object"
+
+    def _column(self, kinds, col, rows, positions, dates, cell_kinds, values, texts):
+        """Colonne typée d'un bloc.
+
+        Le type est choisi au premier bloc où la colonne a des valeurs et
+        retenu dans `kinds` : les blocs suivants le gardent (un nombre sans
+        format de date reste une date dans une colonne de dates, un nombre
+        devient texte dans une colonne de textes). Seul un bloc dont les
+        cellules ne s'y prêtent pas (texte parmi des nombres) est en valeurs
+        Python ; concat_chunks ramène alors la colonne à des textes.
+        """
+        kind = kinds.get(col)
+        if not len(positions):
+            if kind == "text":
+                return pd.Categorical.from_codes(np.full(rows, -1, dtype=np.int32), categories=[])
+            if kind == "date":
+                return np.full(rows, np.datetime64("NaT"), dtype="datetime64[ns]")
+            if kind == "bool":
+                return pd.array(np.full(rows, None), dtype="boolean")
+            if kind == "object":
+                return np.full(rows, None, dtype=object)
+            return np.full(rows, np.nan)
+        present = set(np.unique(cell_kinds).tolist())
+        if kind is None:
+            kind = kinds[col] = self._kind(present, dates)
+        if kind in ("number", "date") and present == {_NUMBER}:
+            numbers = np.full(rows, np.nan)
+            numbers[positions] = np.array(values.tolist()).astype(np.float64)
+            if kind == "date":
+                return pd.to_datetime(numbers, unit="D", origin=self._epoch).round("ms")
+            # Colonne d'entiers sans vide : int64, comme pandas
+            if len(positions) == rows and (numbers == np.round(numbers)).all() \
+                    and np.abs(numbers).max() < 2 ** 53:
+                return numbers.astype(np.int64)
+            return numbers
+        if kind == "bool" and present == {_BOOL}:
+            flags = np.array(values.tolist()).astype(np.int8).astype(bool)
+            if len(positions) == rows:
+                return flags
+            column = pd.array(np.full(rows, None), dtype="boolean")
+            column[positions] = flags
+            return column
+        if kind == "text" and present <= {_SHARED, _TEXT, _NUMBER}:
+            codes = np.full(rows, -1, dtype=np.int64)
+            shared = cell_kinds == _SHARED
+            if shared.any():
+                codes[positions[shared]] = self._shared[np.array(values[shared].tolist()).astype(np.int64)]
+            inline = cell_kinds == _TEXT
+            if inline.any():
+                # Textes en ligne : chaque texte distinct du bloc est décodé une fois
+                raw = np.where((texts[inline] != b"") & (texts[inline] != ""), texts[inline], values[inline])
+                unique, inverse = np.unique(np.array(raw.tolist()), return_inverse=True)
+                codes[positions[inline]] = np.array([self._code(self._text(text))
+                                                     for text in unique.tolist()], dtype=np.int64)[inverse]
+            number = cell_kinds == _NUMBER
+            if number.any():
+                # Nombres d'une colonne de textes : écrits comme affichés (3 et non 3.0)
+                unique, inverse = np.unique(np.array(values[number].tolist()), return_inverse=True)
+                codes[positions[number]] = np.array([self._code(str(self._value(_NUMBER, value, "", False)))
+                                                     for value in unique.tolist()], dtype=np.int64)[inverse]
+            # Catégories limitées aux textes présents dans le bloc
+            used, codes = np.unique(codes, return_inverse=True)
+            if used[0] < 0:
+                used, codes = used[1:], codes - 1
+            return pd.Categorical.from_codes(codes.astype(np.int32),
+                                             categories=[self._strings[code] for code in used.tolist()])
+        # Types mélangés : valeurs Python
+        column = np.full(rows, None, dtype=object)
+        for position, cell in zip(positions.tolist(),
+                                  zip(cell_kinds.tolist(), values, texts, dates)):
+            column[position] = self._value(*cell)
+        return column
+
+
+def xlsx_sheet_names(file_path: str) -> list:
+    """Noms des feuilles d'un classeur .xlsx, lus sans ouvrir les feuilles"""
+    with XlsxReader(file_path) as reader:
+        return reader.sheet_names
+
+
+def read_xlsx(file_path: str, sheet=None, start_row=None, end_row=None) -> pd.DataFrame:
+    """Charge une feuille .xlsx (voir XlsxReader.iter_chunks) en un DataFrame"""
+    with XlsxReader(file_path) as reader:
+        return concat_chunks([chunk for chunk, _ in reader.iter_chunks(sheet, start_row, end_row)])